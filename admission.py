@@ -0,0 +1,220 @@
+"""Admission control for /chat: token buckets per key, an in-flight limit and a new-session budget.
+
+Every check is a dictionary lookup and a little arithmetic under a lock, so
+the cost per request stays constant however many clients there are. A
+rejected request is answered before it touches the session store or the
+pipeline.
+"""
+from collections import OrderedDict
+import math
+import threading
+import time
+
+
+class TokenBuckets:
+    """A token bucket per key (client IP, session id): `rate` tokens a second, holding at most `burst`.
+
+    Buckets are kept in least-recently-used order and the oldest is dropped
+    past `max_keys`. A bucket idle for burst / rate seconds is full again
+    anyway, so dropping it only forgets anything when more than `max_keys`
+    keys are active at once.
+    """
+
+    def __init__(self, rate, burst, max_keys=65536, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()  # key -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key, cost=1):
+        """0 if `cost` tokens were taken, else the seconds until they will be there"""
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0
+            return (cost - bucket[0]) / self.rate
+
+    def refund(self, key, cost=1):
+        """Give back tokens taken for a request that a later check turned away"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + cost)
+
+
+class WindowBudget:
+    """At most `limit` events per `window` seconds, over a sliding window.
+
+    The count is estimated from the current and the previous fixed window
+    (the previous one weighted by how much of it still overlaps), so it needs
+    two counters instead of a timestamp per event.
+    """
+
+    def __init__(self, limit, window, clock=time.monotonic):
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self._start = clock()
+        self._current = 0
+        self._previous = 0
+        self._lock = threading.Lock()
+
+    def take(self, cost=1):
+        """0 if `cost` events fit in the budget (and counts them), else the seconds to wait"""
+        now = self.clock()
+        with self._lock:
+            elapsed = now - self._start
+            if elapsed >= self.window:
+                windows = int(elapsed // self.window)
+                self._previous = self._current if windows == 1 else 0
+                self._current = 0
+                self._start += windows * self.window
+                elapsed -= windows * self.window
+            overlap = 1 - elapsed / self.window
+            if self._previous * overlap + self._current + cost <= self.limit:
+                self._current += cost
+                return 0
+            return self.window - elapsed
+
+    def refund(self, cost=1):
+        with self._lock:
+            self._current = max(0, self._current - cost)
+
+
+class InFlightLimit:
+    """At most `limit` requests at a time; acquire() never waits"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.current = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.current >= self.limit:
+                return False
+            self.current += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.current -= 1
+
+
+class AdmissionControl:
+    """The checks in front of /chat, cheapest and broadest first; a limit of 0 turns a check off.
+
+    admit() returns None when the request may go ahead, or (status,
+    retry_after seconds, reason) to answer with: 503 while `max_in_flight`
+    requests are already running, 429 when the client IP, the session or the
+    budget for new sessions is out of tokens. Checks are all-or-nothing: a
+    rejected request gives back whatever the earlier checks took. An
+    admitted request must call release() when it is done.
+
+    A batch (many users' turns relayed by one client) gets no way around
+    the limits a single turn is held to: every session is charged as many
+    tokens as it has turns, the sessions it creates count against the
+    global new-session budget, and each item costs `batch_item_cost` of an
+    IP token (at least one token per batch). Only the per-IP new-session
+    limit, sized for one person's /chat traffic, is replaced by its own
+    bucket: `batch_new_sessions_per_ip` a second, holding
+    `batch_new_session_ip_burst`.
+    """
+
+    REASONS = ('admitted', 'overloaded', 'ip_rate', 'session_rate', 'new_sessions')
+
+    def __init__(self, max_in_flight=0, ip_rate=0, ip_burst=0, session_rate=0, session_burst=0,
+                 new_sessions_per_ip=0, new_session_ip_burst=0, new_sessions=0, new_session_window=60,
+                 batch_new_sessions_per_ip=0, batch_new_session_ip_burst=0, batch_item_cost=1,
+                 max_keys=65536, clock=time.monotonic):
+        self.in_flight = InFlightLimit(max_in_flight) if max_in_flight else None
+        self.ips = TokenBuckets(ip_rate, ip_burst, max_keys, clock) if ip_rate else None
+        self.sessions = TokenBuckets(session_rate, session_burst, max_keys, clock) if session_rate else None
+        self.new_by_ip = (TokenBuckets(new_sessions_per_ip, new_session_ip_burst, max_keys, clock)
+                          if new_sessions_per_ip else None)
+        self.new_sessions = WindowBudget(new_sessions, new_session_window, clock) if new_sessions else None
+        self.batch_new_by_ip = (TokenBuckets(batch_new_sessions_per_ip, batch_new_session_ip_burst, max_keys, clock)
+                                if batch_new_sessions_per_ip else None)
+        self.batch_item_cost = batch_item_cost
+        self.counts = dict.fromkeys(self.REASONS, 0)
+
+    def _reject(self, status, retry_after, reason):
+        self.counts[reason] += 1
+        return status, max(1, math.ceil(retry_after)), reason
+
+    def admit(self, ip, turns, is_new, items=1, batch=False):
+        """Check one request from `ip` of `items` items; `turns` maps each session id to its turns.
+
+        is_new(session_id) says if a session would be created.
+        """
+        if self.in_flight is not None and not self.in_flight.acquire():
+            return self._reject(503, 1, 'overloaded')
+        taken = []  # (limit, key, cost) charged so far
+        try:
+            rejected = self._check(ip, turns, is_new, items, batch, taken)
+        except BaseException:
+            self._refund(taken)
+            self.release()
+            raise
+        if rejected is not None:
+            self._refund(taken)
+            self.release()
+            return rejected
+        self.counts['admitted'] += 1
+        return None
+
+    def _refund(self, taken):
+        for limit, key, cost in taken:
+            if key is None:
+                limit.refund(cost)
+            else:
+                limit.refund(key, cost)
+
+    def _check(self, ip, turns, is_new, items, batch, taken):
+        if self.ips is not None:
+            cost = max(1, items * self.batch_item_cost) if batch else 1
+            wait = self.ips.take(ip, cost)
+            if wait:
+                return self._reject(429, wait, 'ip_rate')
+            taken.append((self.ips, ip, cost))
+        # New sessions before session buckets: a flood of fresh ids is turned
+        # away without filling the session buckets with them
+        per_ip = self.batch_new_by_ip if batch else self.new_by_ip
+        if per_ip is not None or self.new_sessions is not None:
+            new = sum(1 for session_id in turns if is_new(session_id))
+            if new and per_ip is not None:
+                wait = per_ip.take(ip, new)
+                if wait:
+                    return self._reject(429, wait, 'new_sessions')
+                taken.append((per_ip, ip, new))
+            if new and self.new_sessions is not None:
+                wait = self.new_sessions.take(new)
+                if wait:
+                    return self._reject(429, wait, 'new_sessions')
+                taken.append((self.new_sessions, None, new))
+        if self.sessions is not None:
+            for session_id, cost in turns.items():
+                wait = self.sessions.take(session_id, cost)
+                if wait:
+                    return self._reject(429, wait, 'session_rate')
+                taken.append((self.sessions, session_id, cost))
+        return None
+
+    def release(self):
+        if self.in_flight is not None:
+            self.in_flight.release()
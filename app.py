@@ -1,29 +1,157 @@
-from flask import Flask, request, jsonify, render_template, session
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-from langdetect import detect
+from werkzeug.middleware.proxy_fix import ProxyFix
+from admission import AdmissionControl
+from keyword_matcher import KeywordGroupIndex, KeywordMatcher, MatchResult
+from language_detector import ENGLISH_FILLER_WORDS, LanguageDetector
+from session_store import SessionStore
+from session_state import StateCodec, Vocabulary
+from sqlite_session_store import SqliteSessionStore
+from intent_engine import FeatureIndex, IntentRule, IntentTable, ResponseRule, ResponseTable, intent_names
+from response_catalog import ResponseCatalog
+from response_cache import ResponseCache
+from static_assets import CONTENT_TYPES, IMMUTABLE, REVALIDATE, StaticAsset, load_static
+from image_catalog import ImageCatalog, pair_key
+from knowledge_base import STOPWORDS as KNOWLEDGE_STOPWORDS, KnowledgeBase
+from spelling import TOKEN as SPELLING_TOKEN, SpellingCorrector, WordList
+from event_log import EventLog
+from metrics import MetricsRegistry
+import rule_snapshot
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+import atexit
+import itertools
+import json
+import os
 import re
 import secrets
-
+import tempfile
+import threading
 import time
+import zlib
 
-app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)
+# static/ is served from memory by static_file() below
+app = Flask(__name__, static_folder=None)
+# Every worker process must share the key; a random one only suits a single process
+app.secret_key = os.environ.get('SECRET_KEY') or secrets.token_hex(16)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_REQUEST_BYTES', 256 * 1024))
 CORS(app)
 
-conversation_memory = {}
-conversation_context = {}  # Stores last topic/intent/keywords
-shown_images = {}
-session_timestamps = {}  # Track session activity
-
 # Enhanced memory capacity with instance-level boosting
 MAX_MEMORY_SIZE = 15000  # Increased from 10000
 CONTEXT_WINDOW = 300  # Increased from 200
 MAX_KEYWORDS = 75  # Increased from 50
+KEYWORD_LINK_WINDOW = 15  # Previous keywords compared against the current message
+CONTINUATION_RECENT = 5  # Previous keywords a short follow-up can refer back to
 MAX_SESSIONS = 1000  # Maximum concurrent sessions
 
 # Memory optimization settings
-MEMORY_CLEANUP_THRESHOLD = 0.8  # Cleanup when 80% full
 INACTIVE_SESSION_TIMEOUT = 3600  # 1 hour in seconds
+SESSION_SWEEP_INTERVAL = 30  # Seconds between background expiry sweeps
+SESSION_SHARDS = 16  # Independently locked slices of the in-process session store
+
+# Per-stage latency histograms and counters served at /metrics; METRICS=0 turns
+# instrumentation off (the undecorated functions are used, so it costs nothing)
+METRICS_ENABLED = os.environ.get('METRICS', '1') != '0'
+metrics = MetricsRegistry(enabled=METRICS_ENABLED)
+# Only stages that do real work are timed: a timer costs about a microsecond,
+# more than set lookups such as is_greeting take
+STAGE_SECONDS = metrics.histogram('fashionbot_stage_seconds', 'Time spent in each /chat pipeline stage', 'stage')
+INTENT_COUNTS = metrics.counter('fashionbot_intents_total', 'Turns answered, by intent (or greeting/gratitude/out_of_scope)', 'intent')
+
+# Conversation history, context and shown images per session_id. Set SESSION_DB to a
+# file path to share sessions between worker processes through SQLite.
+SESSION_DB = os.environ.get('SESSION_DB')
+# SESSION_WRITE_BEHIND=1 answers before the turn is in SESSION_DB (saves are
+# batched by a background thread); only safe when one process uses the file
+SESSION_WRITE_BEHIND = os.environ.get('SESSION_WRITE_BEHIND') == '1'
+
+def create_session_backend():
+    if SESSION_DB:
+        return SqliteSessionStore(SESSION_DB, MAX_SESSIONS, INACTIVE_SESSION_TIMEOUT, MAX_MEMORY_SIZE, CONTEXT_WINDOW,
+                                  write_through=not SESSION_WRITE_BEHIND, context_codec=STATE_CODEC)
+    return SessionStore(MAX_SESSIONS, INACTIVE_SESSION_TIMEOUT, MAX_MEMORY_SIZE, CONTEXT_WINDOW,
+                        context_codec=STATE_CODEC, shards=SESSION_SHARDS)
+
+# /chat/batch limits; sessions within a batch are processed on this many threads
+MAX_BATCH_SIZE = 1000
+BATCH_WORKERS = 4
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='chat-batch')
+atexit.register(batch_executor.shutdown)
+
+# Every turn (session, message, language, intent, latency) is appended to JSONL
+# files under EVENT_LOG_DIR for analytics and replay (see event_log.py). The
+# request only queues the event; a full queue drops it rather than wait
+EVENT_LOG_DIR = os.environ.get('EVENT_LOG_DIR')
+EVENT_LOG_FSYNC = os.environ.get('EVENT_LOG_FSYNC', 'rotate')
+EVENT_LOG_MAX_BYTES = int(os.environ.get('EVENT_LOG_MAX_BYTES', 64 * 1024 * 1024))
+EVENT_LOG_ROTATE_SECONDS = int(os.environ.get('EVENT_LOG_ROTATE_SECONDS', 3600))
+event_log = None
+if EVENT_LOG_DIR:
+    event_log = EventLog(EVENT_LOG_DIR, max_bytes=EVENT_LOG_MAX_BYTES, max_age=EVENT_LOG_ROTATE_SECONDS,
+                         fsync=EVENT_LOG_FSYNC)
+    atexit.register(event_log.close)
+
+# Admission control in front of /chat and /chat/batch (see admission.py), per
+# worker process. Rates are per second; 0 turns a limit off, and
+# ADMISSION_CONTROL=0 turns them all off. Behind a reverse proxy, set
+# TRUSTED_PROXIES to the number of proxies so limits apply to the client IP
+# from X-Forwarded-For rather than to the proxy
+ADMISSION_ENABLED = os.environ.get('ADMISSION_CONTROL', '1') != '0'
+
+def admission_setting(name, default):
+    return float(os.environ.get(name, default)) if ADMISSION_ENABLED else 0
+
+admission = AdmissionControl(
+    max_in_flight=int(admission_setting('MAX_IN_FLIGHT', 64)),
+    ip_rate=admission_setting('IP_RATE', 20), ip_burst=admission_setting('IP_BURST', 40),
+    session_rate=admission_setting('SESSION_RATE', 1), session_burst=admission_setting('SESSION_BURST', 5),
+    new_sessions_per_ip=admission_setting('NEW_SESSIONS_PER_IP_RATE', 0.2),
+    new_session_ip_burst=admission_setting('NEW_SESSIONS_PER_IP_BURST', 10),
+    new_sessions=int(admission_setting('NEW_SESSIONS_PER_MINUTE', 600)), new_session_window=60,
+    batch_new_sessions_per_ip=admission_setting('BATCH_NEW_SESSIONS_PER_IP_RATE', 20),
+    batch_new_session_ip_burst=admission_setting('BATCH_NEW_SESSIONS_PER_IP_BURST', MAX_BATCH_SIZE),
+    batch_item_cost=admission_setting('BATCH_ITEM_IP_COST', 0.02))
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+# Analysed turns keyed on (lowercased message, language, context fingerprint)
+# Optional path of a compiled keyword-structure snapshot (see rule_snapshot.py)
+RULES_SNAPSHOT = os.environ.get('RULES_SNAPSHOT')
+# WARMUP=0 leaves langdetect to load its profiles on the first message that needs them
+WARMUP_ENABLED = os.environ.get('WARMUP', '1') != '0'
+
+# Outfit images for replies, built with `python image_catalog.py build images/`;
+# without a built catalog replies carry no images
+IMAGE_DIR = os.environ.get('IMAGE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images')
+IMAGES_PER_RESPONSE = 3
+image_catalog = ImageCatalog(IMAGE_DIR)
+
+# Style tips retrieved when no response rule fires (see knowledge_base.py). The
+# tokenised files are cached in KNOWLEDGE_CACHE so restarts only re-read edits
+KNOWLEDGE_DIR = os.environ.get('KNOWLEDGE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knowledge')
+KNOWLEDGE_CACHE = os.environ.get('KNOWLEDGE_CACHE') or os.path.join(
+    tempfile.gettempdir(), 'fashionbot-knowledge-%08x' % zlib.crc32(os.path.abspath(KNOWLEDGE_DIR).encode('utf-8')))
+KNOWLEDGE_BASE = KnowledgeBase(KNOWLEDGE_DIR, KNOWLEDGE_CACHE).build()
+
+# Reply texts, one catalog per language under locales/ (see response_catalog.py).
+# A language is compiled into RESPONSE_CATALOG_CACHE and memory-mapped the first
+# time a message needs it; ids a language lacks come from English
+LOCALE_DIR = os.environ.get('LOCALE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'locales')
+RESPONSE_CATALOG_CACHE = os.environ.get('RESPONSE_CATALOG_CACHE') or os.path.join(
+    tempfile.gettempdir(), 'fashionbot-responses-%08x' % zlib.crc32(os.path.abspath(LOCALE_DIR).encode('utf-8')))
+RESPONSES = ResponseCatalog(LOCALE_DIR, RESPONSE_CATALOG_CACHE)
+KEYWORD_LANGUAGES = ('en', 'kn')  # Languages of the keyword vocabularies
+
+# English words the spelling corrector must leave alone ("weeding", "bridge");
+# SPELLING_DICTIONARY= (empty) turns the check off
+SPELLING_DICTIONARY = os.environ.get(
+    'SPELLING_DICTIONARY', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dictionary', 'en.txt'))
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 4096))
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE)
 
 FASHION_KEYWORDS = {
     # English keywords - Clothing & Outfits
@@ -96,554 +224,827 @@ GRATITUDE_KEYWORDS = {
     'धन्यवाद', 'ಧನ್ಯವಾದ', 'ಧನ್ಯವಾದಗಳು'
 }
 
-OUT_OF_SCOPE_RESPONSES = {
-    'en': "Sorry, I am a fashion agent and I can only answer questions related to fashion, makeup, and beauty trends.",
-    'kn': "ಕ್ಷಮಿಸಿ, ನಾನು ಫ್ಯಾಷನ್ ಏಜೆಂಟ್ ಮತ್ತು ನಾನು ಫ್ಯಾಷನ್, ಮೇಕಪ್ ಮತ್ತು ಸೌಂದರ್ಯ ಟ್ರೆಂಡ್ಗಳಿಗೆ ಸಂಬಂಧಿಸಿದ ಪ್ರಶ್ನೆಗಳಿಗೆ ಮಾತ್ರ ಉತ್ತರಿಸಬಲ್ಲೆ."
+# Intent vocabularies (compiled into KEYWORD_MATCHER below)
+GENDER_WORDS = ('men', 'man', 'male', 'groom', 'boy', 'guy', 'gentleman')
+OFFICE_COLOR_WORDS = ('red', 'black', 'white', 'blue', 'green', 'grey', 'navy', 'burgundy', 'pink', 'yellow')
+SAREE_COLOR_WORDS = ('red', 'green', 'blue', 'yellow', 'pink', 'purple', 'orange', 'black', 'white', 'gold', 'silver', 'maroon', 'navy')
+CONTINUATION_WORDS = ('yes', 'yeah', 'ok', 'sure', 'need', 'want', 'tell', 'show', 'give', 'something', 'anything', 'more', 'also', 'ನೀಡ್', 'ಸಂಥಿಂಗ್', 'ಐ', 'ಫಾರ್')
+FALLBACK_CONTINUATION_WORDS = ('yes', 'yeah', 'ok', 'sure', 'need', 'want', 'tell', 'show', 'give', 'something', 'anything', 'ನೀಡ್', 'ಸಂಥಿಂಗ್')
+WEDDING_WORDS = ('wedding', 'bridal', 'ಮದುವೆ', 'ವೆಡ್ಡಿಂಗ್')
+WEDDING_MAKEUP_WORDS = ('wedding', 'bridal', 'traditional', 'settled', 'ಮದುವೆ', 'ವೆಡ್ಡಿಂಗ್')
+OFFICE_WORDS = ('office', 'work', 'professional')
+FORMAL_WORDS = ('formal', 'professional')
+FORMAL_OUTFIT_WORDS = ('outfit', 'dress', 'wear', 'look')
+MAKEUP_WORDS = ('makeup', 'cosmetic', 'foundation', 'lipstick', 'eyeshadow', 'ಮೇಕಪ್')
+NIGHT_WORDS = ('party', 'evening', 'night')
+KANCHIPURAM_WORDS = ('kanchipuram', 'kanchi', 'kanjivaram')
+COMPLETE_WORDS = ('overall', 'complete', 'full', 'entire', 'whole')
+LOOK_WORDS = ('look', 'style', 'outfit')
+CASUAL_OFFICE_WORDS = ('casual', 'office', 'work')
+SMART_CASUAL_WORDS = ('casual', 'smart')
+PARTY_WORDS = ('party', 'celebration', 'event')
+FESTIVAL_WORDS = ('festival', 'festive', 'ಹಬ್ಬ', 'ಉತ್ಸವ')
+VACATION_WORDS = ('vacation', 'holiday', 'travel', 'trip', 'beach', 'resort')
+SAREE_WORDS = ('saree', 'sari', 'ಸೀರೆ')
+OUTFIT_WORDS = ('outfit', 'dress', 'wear', 'ವಸ್ತ್ರ', 'clothes')
+
+# Topics that keep a conversation "in scope" for short follow-ups
+CONTEXT_TOPIC_WORDS = ('outfit', 'wear', 'style', 'dress', 'fashion', 'makeup', 'beauty', 'wedding', 'party', 'office', 'saree', 'ಮದುವೆ', 'ವಸ್ತ್ರ', 'ಮೇಕಪ್')
+# One bit per topic word; each session keeps a running count per bit (see ConversationHistory)
+TOPIC_FEATURES = FeatureIndex({word: (word,) for word in CONTEXT_TOPIC_WORDS})
+
+# Words worth remembering across turns (see extract_keywords)
+IMPORTANT_WORDS = (
+    # Occasions
+    'wedding', 'party', 'office', 'casual', 'formal', 'bridal', 'reception', 'engagement',
+    'festival', 'ceremony', 'function', 'date', 'dinner', 'cocktail', 'business',
+    # Clothing
+    'saree', 'lehenga', 'dress', 'outfit', 'kurta', 'kurti', 'salwar', 'palazzo',
+    'blazer', 'jacket', 'shirt', 'pants', 'jeans', 'skirt', 'gown', 'jumpsuit',
+    # Makeup & Beauty
+    'makeup', 'cosmetic', 'beauty', 'lipstick', 'foundation', 'eyeshadow', 'mascara',
+    'hairstyle', 'haircut', 'skincare', 'perfume', 'nail', 'manicure',
+    # Accessories
+    'jewelry', 'necklace', 'earrings', 'bracelet', 'bangles', 'ring', 'watch',
+    'shoes', 'heels', 'flats', 'sandals', 'boots', 'bag', 'clutch', 'purse',
+    # Styles
+    'traditional', 'modern', 'ethnic', 'western', 'fusion', 'vintage', 'chic',
+    'elegant', 'glamorous', 'minimalist', 'trendy', 'classic', 'contemporary',
+    # Attributes
+    'work', 'professional', 'smart', 'style', 'look', 'complete', 'overall', 'full',
+    # Colors
+    'red', 'green', 'blue', 'yellow', 'pink', 'purple', 'orange', 'black', 'white',
+    'gold', 'silver', 'maroon', 'navy', 'burgundy', 'beige', 'brown', 'grey',
+    # Fabrics
+    'silk', 'cotton', 'chiffon', 'georgette', 'velvet', 'satin', 'denim', 'lace',
+    # Kannada
+    'ಮದುವೆ', 'ಪಾರ್ಟಿ', 'ಆಫೀಸ್', 'ಸೀರೆ', 'ಮೇಕಪ್', 'ವಸ್ತ್ರ', 'ವೆಡ್ಡಿಂಗ್',
+    'ಬಣ್ಣ', 'ಕೆಂಪು', 'ನೀಲಿ', 'ಹಸಿರು', 'ಶೈಲಿ', 'ಆಭರಣ', 'ಕೂದಲು',
+    # Brands
+    'kanchipuram', 'banarasi', 'kanchi', 'designer', 'brand'
+)
+
+# Expanded keyword relationships (see find_keyword_links)
+KEYWORD_GROUPS = {
+    'office': ['office', 'work', 'professional', 'formal', 'casual', 'smart', 'business', 'ಆಫೀಸ್', 'ಕಾರ್ಯ'],
+    'wedding': ['wedding', 'bridal', 'marriage', 'bride', 'groom', 'reception', 'engagement', 'ಮದುವೆ', 'ವೆಡ್ಡಿಂಗ್', 'traditional'],
+    'party': ['party', 'celebration', 'event', 'cocktail', 'ಪಾರ್ಟಿ', 'evening', 'night', 'function', 'gathering'],
+    'saree': ['saree', 'sari', 'ಸೀರೆ', 'kanchipuram', 'silk', 'kanchi', 'banarasi', 'georgette', 'chiffon'],
+    'lehenga': ['lehenga', 'choli', 'ghagra', 'chaniya'],
+    'kurta': ['kurta', 'kurti', 'salwar', 'kameez', 'churidar', 'palazzo', 'ethnic'],
+    'makeup': ['makeup', 'cosmetic', 'ಮೇಕಪ್', 'beauty', 'lipstick', 'foundation', 'eyeshadow', 'mascara', 'kajal'],
+    'hair': ['hair', 'hairstyle', 'haircut', 'ಕೂದಲು', 'bun', 'ponytail', 'braid', 'hairdo'],
+    'jewelry': ['jewelry', 'jewellery', 'ಆಭರಣ', 'necklace', 'earrings', 'bracelet', 'bangles', 'ring', 'ಬಳೆ'],
+    'outfit': ['outfit', 'dress', 'wear', 'clothes', 'ವಸ್ತ್ರ', 'ಬಟ್ಟೆ', 'look', 'style', 'attire', 'ensemble'],
+    'shoes': ['shoes', 'heels', 'flats', 'sandals', 'boots', 'sneakers', 'footwear', 'ಚಪ್ಪಲಿ', 'ಬೂಟು'],
+    'accessories': ['accessories', 'bag', 'clutch', 'purse', 'handbag', 'scarf', 'belt', 'watch', 'ಕೈಚೀಲ'],
+    'color': ['red', 'green', 'blue', 'yellow', 'pink', 'purple', 'color', 'colour', 'ಬಣ್ಣ', 'ಕೆಂಪು', 'ನೀಲಿ', 'ಹಸಿರು',
+              'orange', 'black', 'white', 'gold', 'silver', 'maroon', 'navy', 'burgundy', 'beige'],
+    'style': ['traditional', 'modern', 'ethnic', 'western', 'fusion', 'vintage', 'chic', 'elegant', 'trendy', 'ಶೈಲಿ']
+}
+
+# Extra vocabularies read only by the response rules
+MEN_WORDS = ('men', 'man', 'male', 'groom', 'guy')
+PARTY_MEN_WORDS = ('men', 'man', 'male', 'guy')
+SWATCH_COLORS = ('green', 'blue', 'pink', 'yellow', 'purple', 'maroon', 'gold', 'orange')
+BRIDAL_WORDS = ('wedding', 'bridal', 'traditional', 'settled', 'ಮದುವೆ')
+MAKEUP_REPLY_WORDS = ('makeup', 'cosmetic', 'foundation', 'lipstick', 'eyeshadow', 'mascara', 'ಮೇಕಪ್')
+
+# Feature groups: each message gets one bitmask with a bit per group it hits
+INTENT_FEATURES = FeatureIndex({
+    'gender': GENDER_WORDS,
+    'office_colour': OFFICE_COLOR_WORDS,
+    'saree_colour': SAREE_COLOR_WORDS,
+    'continuation': CONTINUATION_WORDS,
+    'fallback_continuation': FALLBACK_CONTINUATION_WORDS,
+    'wedding': WEDDING_WORDS,
+    'wedding_makeup': WEDDING_MAKEUP_WORDS,
+    'office': OFFICE_WORDS,
+    'formal': FORMAL_WORDS,
+    'formal_outfit': FORMAL_OUTFIT_WORDS,
+    'makeup': MAKEUP_WORDS,
+    'night': NIGHT_WORDS,
+    'kanchipuram': KANCHIPURAM_WORDS,
+    'complete': COMPLETE_WORDS,
+    'look': LOOK_WORDS,
+    'casual_office': CASUAL_OFFICE_WORDS,
+    'smart_casual': SMART_CASUAL_WORDS,
+    'party': PARTY_WORDS,
+    'festival': FESTIVAL_WORDS,
+    'vacation': VACATION_WORDS,
+    'casual': ('casual',),
+    'wear': ('wear',),
+    'saree': SAREE_WORDS,
+    'outfit': OUTFIT_WORDS,
+    # Response rules
+    'men': MEN_WORDS,
+    'party_men': PARTY_MEN_WORDS,
+    'casual_reply': ('casual', 'smart casual'),
+    'makeup_reply': MAKEUP_REPLY_WORDS,
+    'bridal': BRIDAL_WORDS,
+    'look_style': ('look', 'style'),
+    'red': ('red',),
+    'red_kn': ('red', 'ಕೆಂಪು'),
+    'saree_reply': ('saree', 'ಸೀರೆ'),
+    'outfit_reply': ('outfit', 'ಉಡುಪು'),
+    **{'colour_' + color: (color,) for color in SWATCH_COLORS},
+})
+
+# One automaton for every vocabulary above; each /chat message is scanned once.
+# Words containing Kannada script are additionally tagged 'kannada'.
+MATCHER_VOCABULARIES = {
+    'fashion': FASHION_KEYWORDS,
+    'occasion': WEDDING_WORDS + OFFICE_WORDS + PARTY_WORDS + FESTIVAL_WORDS + VACATION_WORDS + NIGHT_WORDS,
+    'colour': OFFICE_COLOR_WORDS + SAREE_COLOR_WORDS,
+    'gender': GENDER_WORDS,
+    'continuation': CONTINUATION_WORDS + FALLBACK_CONTINUATION_WORDS,
+    'greeting': GREETING_KEYWORDS,
+    'gratitude': GRATITUDE_KEYWORDS,
+    'topic': CONTEXT_TOPIC_WORDS,
+    'keyword': IMPORTANT_WORDS,
+    'intent': INTENT_FEATURES.words,
 }
 
+def build_keyword_structures():
+    """Compile the keyword automata"""
+    return {
+        'matcher': KeywordMatcher(MATCHER_VOCABULARIES),
+        # Exact group words and IMPORTANT_WORDS are looked up directly, other
+        # keyword tokens ("weddings") are matched by substring and memoized
+        'groups': KeywordGroupIndex(KEYWORD_GROUPS, known=IMPORTANT_WORDS),
+    }
+
+def load_keyword_structures(path=None):
+    """build_keyword_structures(), read from (and saved to) the snapshot at `path` if given"""
+    if not path:
+        return build_keyword_structures()
+    digest = rule_snapshot.fingerprint(MATCHER_VOCABULARIES, KEYWORD_GROUPS, IMPORTANT_WORDS)
+    structures = rule_snapshot.load(path, digest)
+    if structures is None:
+        structures = build_keyword_structures()
+        try:
+            rule_snapshot.save(path, digest, structures)
+        except OSError as e:
+            app.logger.warning('Could not write rules snapshot %s: %s', path, e)
+    return structures
+
+_keyword_structures = load_keyword_structures(RULES_SNAPSHOT)
+KEYWORD_MATCHER = _keyword_structures['matcher']
+KEYWORD_GROUP_INDEX = _keyword_structures['groups']
+
+def keyword_group_mask(keyword):
+    """Bit i is set when the keyword contains a word of the i-th KEYWORD_GROUPS group"""
+    return KEYWORD_GROUP_INDEX.mask(keyword)
+
+# Keywords are kept per session as small integer IDs when they are one of these
+# words; any other token ("red1", "weddings") is kept as text next to the IDs
+# (see session_state.py)
+KEYWORD_IDS = Vocabulary(itertools.chain(IMPORTANT_WORDS, *KEYWORD_GROUPS.values()), annotate=keyword_group_mask)
+
+@STAGE_SECONDS.timed('scan')
+def scan_message(text):
+    """Scan a message once against every keyword vocabulary, with typos of its words corrected"""
+    return KEYWORD_MATCHER.scan(correct_spelling(text.lower()))
+
+@STAGE_SECONDS.timed('spelling')
+def correct_spelling(text_lower):
+    return SPELLING_CORRECTOR.correct(text_lower)
+
+def _continuation_intent(features, text_lower, last_intent, state):
+    """Short follow-ups ("yes", "need something") that continue the last topic"""
+    recent = state.recent_keywords(CONTINUATION_RECENT)
+    # Check if it relates to previous topic
+    if any(kw in text_lower for kw in recent):
+        return last_intent + '_continue'
+    # Check for wedding/party/office context
+    if 'wedding' in last_intent or 'ಮದುವೆ' in ' '.join(recent):
+        if features & INTENT_FEATURES.bits['wedding']:
+            return 'wedding'
+    if 'office' in last_intent:
+        if features & INTENT_FEATURES.bits['office']:
+            return last_intent
+    return None
+
+OFFICE_CONTEXT = ('formal_office', 'casual_office', 'office', 'outfit_general')
+
+# extract_intent rules, first match wins. Context rows fire when last_intent is in
+# last_intents or the link group is in this turn's keyword links.
+INTENT_RULES = (
+    # Gender specification with context
+    IntentRule('men_office', ('gender',), OFFICE_CONTEXT, 'office'),
+    IntentRule('men_wedding', ('gender',), ('wedding',), 'wedding'),
+    IntentRule('men_party', ('gender',), ('party',), 'party'),
+    IntentRule('men_casual', ('gender',), ('casual_wear',), 'casual'),
+    # If just "men" or "for men" after any fashion context
+    IntentRule('men_{last_intent}', ('gender',), ('formal_office', 'casual_office', 'office', 'wedding', 'party', 'outfit_general')),
+    # Color combination queries with office context
+    IntentRule('color_styling_office', ('office_colour',), OFFICE_CONTEXT, 'office', max_words=15),
+    # Single-word formal/casual queries with office context
+    IntentRule('formal_office', (), OFFICE_CONTEXT, 'office', exact=('formal', 'professional')),
+    IntentRule('casual_office', (), OFFICE_CONTEXT, 'office', exact=('casual', 'smart casual', 'smart')),
+    # Single-word queries with wedding context
+    IntentRule('wedding_makeup', (), ('wedding', 'wedding_makeup'), 'wedding', exact=('makeup', 'ಮೇಕಪ್', 'cosmetic', 'beauty')),
+    IntentRule('wedding', (), ('wedding', 'wedding_makeup'), 'wedding', exact=('outfit', 'dress', 'wear', 'clothes', 'ವಸ್ತ್ರ')),
+    # Single-word queries with party context
+    IntentRule('party_makeup', (), ('party', 'party_makeup'), 'party', exact=('makeup', 'ಮೇಕಪ್', 'cosmetic', 'beauty')),
+    IntentRule('party', (), ('party', 'party_makeup'), 'party', exact=('outfit', 'dress', 'wear', 'clothes')),
+    # Color-only queries with saree context
+    IntentRule('saree_color_change', ('saree_colour',), ('saree', 'kanchipuram_saree'), 'saree', max_words=3),
+    # Smart continuation detection - if previous context exists
+    IntentRule(_continuation_intent, ('continuation',), max_words=10, needs_last_intent=True),
+    # Formal/casual outfit queries
+    IntentRule('formal_office', ('formal', 'formal_outfit')),
+    # Specific intents
+    IntentRule('wedding_makeup', ('makeup', 'wedding_makeup')),
+    IntentRule('party_makeup', ('makeup', 'night')),
+    IntentRule('makeup', ('makeup',)),
+    IntentRule('kanchipuram_saree', ('kanchipuram',)),
+    IntentRule('complete_office_look', ('complete', 'look', 'casual_office')),
+    IntentRule('complete_wedding_look', ('complete', 'look', 'wedding')),
+    IntentRule('complete_look', ('complete', 'look')),
+    IntentRule('casual_office', ('office', 'smart_casual')),
+    IntentRule('formal_office', ('office',)),
+    IntentRule('wedding', ('wedding',)),
+    IntentRule('party', ('party',)),
+    IntentRule('festival', ('festival',)),
+    IntentRule('vacation', ('vacation',)),
+    IntentRule('casual_wear', ('casual', 'wear')),
+    IntentRule('saree', ('saree',)),
+    IntentRule('outfit_general', ('outfit',)),
+    # Context for continuation
+    IntentRule('{last_intent}_continue', ('fallback_continuation',), needs_last_intent=True),
+)
+
+def _is_makeup_followup(intent):
+    return intent == 'wedding_makeup' or (intent.endswith('_continue') and 'makeup' in intent)
+
+# generate_fashion_response rules, first match wins: (response id, intents, feature groups
+# that must all be hit, intent to remember instead, context update)
+FASHION_RULES = (
+    # Color change for sarees
+    *(ResponseRule('kanchipuram_' + color, ('saree_color_change',), ('colour_' + color,), 'kanchipuram_saree', 'keywords')
+      for color in SWATCH_COLORS),
+    # Color styling advice for office
+    ResponseRule('office_red_black', ('color_styling_office',), ('red',)),
+    # Office/Work outfit queries
+    ResponseRule('men_office', ('men_office',)),
+    ResponseRule('men_office', None, ('office', 'men')),
+    ResponseRule('casual_office', None, ('office', 'casual_reply')),
+    ResponseRule('formal_office', None, ('office',)),
+    # Casual wear queries
+    ResponseRule('casual_wear', None, ('casual', 'wear')),
+    # Party outfit queries
+    ResponseRule('men_party', ('men_party',)),
+    ResponseRule('men_party', ('party',), ('party_men',)),
+    ResponseRule('party', None, ('party',)),
+    # Festival and vacation outfit queries
+    ResponseRule('festival', ('festival',)),
+    ResponseRule('festival', None, ('festival',)),
+    ResponseRule('vacation', ('vacation',)),
+    ResponseRule('vacation', None, ('vacation',)),
+    # Kanchipuram saree queries
+    ResponseRule('kanchipuram_red', ('kanchipuram_saree',), ('red_kn',), 'kanchipuram_saree'),
+    ResponseRule('kanchipuram', ('kanchipuram_saree',), (), 'kanchipuram_saree'),
+    ResponseRule('kanchipuram_red', None, ('kanchipuram', 'red_kn'), 'kanchipuram_saree'),
+    ResponseRule('kanchipuram', None, ('kanchipuram',), 'kanchipuram_saree'),
+    # Saree queries
+    ResponseRule('saree', None, ('saree_reply',), 'saree'),
+    # Makeup follow-ups
+    ResponseRule('wedding_makeup', _is_makeup_followup, ('bridal',)),
+    ResponseRule('party_makeup', _is_makeup_followup, ('night',)),
+    ResponseRule('everyday_makeup', _is_makeup_followup),
+    # Makeup queries
+    ResponseRule('bridal_makeup', ('makeup',), ('bridal',)),
+    ResponseRule('bridal_makeup', None, ('makeup_reply', 'bridal')),
+    # Wedding outfit queries
+    ResponseRule('men_wedding', ('men_wedding',)),
+    ResponseRule('men_wedding', ('wedding',), ('men',)),
+    ResponseRule('wedding', ('wedding', 'wedding_continue')),
+    ResponseRule('wedding', None, ('wedding',)),
+    # Overall look queries
+    ResponseRule('complete_office_look', ('complete_office_look',), ('casual_office',)),
+    ResponseRule('complete_office_look', None, ('complete', 'look_style', 'casual_office')),
+    ResponseRule('complete_office_look', ('casual_office', 'formal_office'), ('complete', 'look_style')),
+    # Outfit queries
+    ResponseRule('outfit_prompt', None, ('outfit_reply',)),
+)
+
+# Sessions keep the last intent as an ID among these plus a "_continue" count
+INTENT_IDS = Vocabulary(intent_names(INTENT_RULES, FASHION_RULES, 'general'))
+STATE_CODEC = StateCodec(KEYWORD_IDS, INTENT_IDS, KEYWORD_GROUPS, MAX_KEYWORDS)
+
+sessions = create_session_backend()
+sessions.start_sweeper(SESSION_SWEEP_INTERVAL)
+atexit.register(sessions.close)
+
+INTENT_TABLE = IntentTable(INTENT_RULES, INTENT_FEATURES, STATE_CODEC.link_bits, default='general')
+FASHION_TABLE = ResponseTable(FASHION_RULES, INTENT_FEATURES, default='default')
+
+# Kanchipuram colour replies share one catalog template ({color} / {Color})
+SWATCH_RESPONSES = {'kanchipuram_' + color: color for color in SWATCH_COLORS}
+
+def get_response(key, lang):
+    color = SWATCH_RESPONSES.get(key)
+    if color is None:
+        return RESPONSES.get(key, lang)
+    return RESPONSES.get('kanchipuram_swatch', lang).format(color=color, Color=color.title())
+
+# Other spellings of vocabulary words, too far from them to be caught as typos
+SPELLING_VARIANTS = {
+    'kanjeevaram': 'kanchipuram', 'kanjivaram': 'kanchipuram', 'conjeevaram': 'kanchipuram',
+    'lengha': 'lehenga', 'lahanga': 'lehenga',
+}
+
+def _contains_keyword(token):
+    # "weddings" already matches "wedding"; hits of 4 letters or less ("ring" in
+    # "earings") are too short to say the token is spelt right
+    return any(len(word) > 4 for word in KEYWORD_MATCHER.scan(token).hits)
+
+def spelling_known_words():
+    """Ordinary words from the replies and tips, never corrected even when close to a keyword"""
+    texts = []
+    for lang in KEYWORD_LANGUAGES:
+        texts.extend(RESPONSES.catalog(lang).texts())
+    for index in KNOWLEDGE_BASE.indexes.values():
+        texts.extend(index.texts)
+    return set(SPELLING_TOKEN.findall(' '.join(texts).lower())) | ENGLISH_FILLER_WORDS | KNOWLEDGE_STOPWORDS
+
+SPELLING_CORRECTOR = SpellingCorrector(KEYWORD_MATCHER.vocabulary, known=spelling_known_words(),
+                                       aliases=SPELLING_VARIANTS, contains_word=_contains_keyword,
+                                       dictionary=WordList(SPELLING_DICTIONARY) if SPELLING_DICTIONARY else None)
+
+LANGUAGE_DETECTOR = LanguageDetector(KEYWORD_MATCHER.vocabulary)
+
+@STAGE_SECONDS.timed('detect_language')
 def detect_language(text):
-    try:
-        lang = detect(text)
-        return lang
-    except:
-        return 'en'
+    return LANGUAGE_DETECTOR.detect(text)
 
-def is_greeting(text):
-    text_lower = text.lower().strip()
-    return any(greeting in text_lower for greeting in GREETING_KEYWORDS)
+def is_greeting(text, match=None):
+    match = match or scan_message(text)
+    return match.has('greeting')
 
-def is_gratitude(text):
-    text_lower = text.lower().strip()
-    return any(gratitude in text_lower for gratitude in GRATITUDE_KEYWORDS)
+def is_gratitude(text, match=None):
+    match = match or scan_message(text)
+    return match.has('gratitude')
 
-def extract_intent(text, context_data):
+@STAGE_SECONDS.timed('extract_intent')
+def extract_intent(text, state, match=None, keyword_links=None):
     """Extract user intent from message and context"""
-    text_lower = text.lower()
-    
-    # Enhanced context checking - look at previous keywords
-    prev_keywords = context_data.get('keywords', [])
-    last_intent = context_data.get('last_intent', '')
+    match = match or scan_message(text)
     
     # Extract current keywords and find links
-    current_keywords = extract_keywords(text)
-    keyword_links = find_keyword_links(current_keywords, prev_keywords)
-    
-    # Check for gender specification with context
-    if any(word in text_lower for word in ['men', 'man', 'male', 'groom', 'boy', 'guy', 'gentleman']):
-        if last_intent in ['formal_office', 'casual_office', 'office', 'outfit_general'] or 'office' in keyword_links:
-            return 'men_office'
-        if last_intent in ['wedding'] or 'wedding' in keyword_links:
-            return 'men_wedding'
-        if last_intent in ['party'] or 'party' in keyword_links:
-            return 'men_party'
-        if last_intent in ['casual_wear'] or 'casual' in keyword_links:
-            return 'men_casual'
-        # If just "men" or "for men" after any fashion context
-        if last_intent in ['formal_office', 'casual_office', 'office', 'wedding', 'party', 'outfit_general']:
-            return 'men_' + last_intent.replace('_office', '_office')
-    
-    # Check for color combination queries with office context
-    if last_intent in ['formal_office', 'casual_office', 'office', 'outfit_general'] or 'office' in keyword_links:
-        color_words = ['red', 'black', 'white', 'blue', 'green', 'grey', 'navy', 'burgundy', 'pink', 'yellow']
-        if any(color in text_lower for color in color_words) and len(text_lower.split()) <= 15:
-            return 'color_styling_office'
-    
-    # Check for single-word formal/casual queries with office context
-    if last_intent in ['formal_office', 'casual_office', 'office', 'outfit_general'] or 'office' in keyword_links:
-        if text_lower.strip() in ['formal', 'casual', 'smart casual', 'professional', 'smart']:
-            if 'formal' in text_lower or 'professional' in text_lower:
-                return 'formal_office'
-            elif 'casual' in text_lower or 'smart' in text_lower:
-                return 'casual_office'
-    
-    # Check for single-word queries with wedding context
-    if last_intent in ['wedding', 'wedding_makeup'] or 'wedding' in keyword_links:
-        if text_lower.strip() in ['makeup', 'ಮೇಕಪ್', 'cosmetic', 'beauty']:
-            return 'wedding_makeup'
-        if text_lower.strip() in ['outfit', 'dress', 'wear', 'clothes', 'ವಸ್ತ್ರ']:
-            return 'wedding'
-    
-    # Check for single-word queries with party context
-    if last_intent in ['party', 'party_makeup'] or 'party' in keyword_links:
-        if text_lower.strip() in ['makeup', 'ಮೇಕಪ್', 'cosmetic', 'beauty']:
-            return 'party_makeup'
-        if text_lower.strip() in ['outfit', 'dress', 'wear', 'clothes']:
-            return 'party'
+    if keyword_links is None:
+        keyword_ids = tuple(map(KEYWORD_IDS.key, extract_keywords(text, match)))
+        keyword_links = find_keyword_links(keyword_ids, state.keywords.last(KEYWORD_LINK_WINDOW))
     
-    # Check for color-only queries with saree context
-    if last_intent in ['saree', 'kanchipuram_saree'] or 'saree' in keyword_links:
-        color_keywords = ['red', 'green', 'blue', 'yellow', 'pink', 'purple', 'orange', 'black', 'white', 'gold', 'silver', 'maroon', 'navy']
-        if any(color in text_lower for color in color_keywords) and len(text_lower.split()) <= 3:
-            return 'saree_color_change'
-    
-    # Smart continuation detection - if previous context exists
-    if last_intent and len(text_lower.split()) <= 10:
-        continuation_words = ['yes', 'yeah', 'ok', 'sure', 'need', 'want', 'tell', 'show', 'give', 'something', 'anything', 'more', 'also', 'ನೀಡ್', 'ಸಂಥಿಂಗ್', 'ಐ', 'ಫಾರ್']
-        if any(word in text_lower for word in continuation_words):
-            # Check if it relates to previous topic
-            if any(kw in text_lower for kw in prev_keywords[-5:]):
-                return last_intent + '_continue'
-            # Check for wedding/party/office context
-            if 'wedding' in last_intent or 'ಮದುವೆ' in ' '.join(prev_keywords[-5:]):
-                if any(word in text_lower for word in ['wedding', 'bridal', 'ಮದುವೆ', 'ವೆಡ್ಡಿಂಗ್']):
-                    return 'wedding'
-            if 'office' in last_intent:
-                if any(word in text_lower for word in ['office', 'work', 'professional']):
-                    return last_intent
-    
-    # Check for formal/casual outfit queries
-    if any(word in text_lower for word in ['formal', 'professional']) and any(word in text_lower for word in ['outfit', 'dress', 'wear', 'look']):
-        return 'formal_office'
-    
-    # Check for specific intents
-    if any(word in text_lower for word in ['makeup', 'cosmetic', 'foundation', 'lipstick', 'eyeshadow', 'ಮೇಕಪ್']):
-        if any(word in text_lower for word in ['wedding', 'bridal', 'traditional', 'settled', 'ಮದುವೆ', 'ವೆಡ್ಡಿಂಗ್']):
-            return 'wedding_makeup'
-        elif any(word in text_lower for word in ['party', 'evening', 'night']):
-            return 'party_makeup'
-        else:
-            return 'makeup'
-    
-    if any(word in text_lower for word in ['kanchipuram', 'kanchi', 'kanjivaram']):
-        return 'kanchipuram_saree'
-    
-    if any(word in text_lower for word in ['overall', 'complete', 'full', 'entire', 'whole']):
-        if any(word in text_lower for word in ['look', 'style', 'outfit']):
-            if any(word in text_lower for word in ['casual', 'office', 'work']):
-                return 'complete_office_look'
-            elif any(word in text_lower for word in ['wedding', 'bridal', 'ಮದುವೆ', 'ವೆಡ್ಡಿಂಗ್']):
-                return 'complete_wedding_look'
-            return 'complete_look'
-    
-    if any(word in text_lower for word in ['office', 'work', 'professional']):
-        if any(word in text_lower for word in ['casual', 'smart']):
-            return 'casual_office'
-        return 'formal_office'
-    
-    if any(word in text_lower for word in ['wedding', 'bridal', 'ಮದುವೆ', 'ವೆಡ್ಡಿಂಗ್']):
-        return 'wedding'
-    
-    if any(word in text_lower for word in ['party', 'celebration', 'event']):
-        return 'party'
-    
-    if any(word in text_lower for word in ['festival', 'festive', 'ಹಬ್ಬ', 'ಉತ್ಸವ']):
-        return 'festival'
-    
-    if any(word in text_lower for word in ['vacation', 'holiday', 'travel', 'trip', 'beach', 'resort']):
-        return 'vacation'
-    
-    if 'casual' in text_lower and 'wear' in text_lower:
-        return 'casual_wear'
-    
-    if any(word in text_lower for word in ['saree', 'sari', 'ಸೀರೆ']):
-        return 'saree'
-    
-    if any(word in text_lower for word in ['outfit', 'dress', 'wear', 'ವಸ್ತ್ರ', 'clothes']):
-        return 'outfit_general'
-    
-    # Check context for continuation
-    if last_intent:
-        if any(word in text_lower for word in ['yes', 'yeah', 'ok', 'sure', 'need', 'want', 'tell', 'show', 'give', 'something', 'anything', 'ನೀಡ್', 'ಸಂಥಿಂಗ್']):
-            return last_intent + '_continue'
-    
-    return 'general'
+    return INTENT_TABLE.resolve(INTENT_FEATURES.mask(match.hits), match.text, match.word_count,
+                                state.last_intent, keyword_links, state)
 
-def extract_keywords(text):
+def extract_keywords(text, match=None):
     """Extract important keywords from user message"""
-    text_lower = text.lower()
-    keywords = []
-    
-    # Expanded important words list
-    important_words = [
-        # Occasions
-        'wedding', 'party', 'office', 'casual', 'formal', 'bridal', 'reception', 'engagement',
-        'festival', 'ceremony', 'function', 'date', 'dinner', 'cocktail', 'business',
-        # Clothing
-        'saree', 'lehenga', 'dress', 'outfit', 'kurta', 'kurti', 'salwar', 'palazzo',
-        'blazer', 'jacket', 'shirt', 'pants', 'jeans', 'skirt', 'gown', 'jumpsuit',
-        # Makeup & Beauty
-        'makeup', 'cosmetic', 'beauty', 'lipstick', 'foundation', 'eyeshadow', 'mascara',
-        'hairstyle', 'haircut', 'skincare', 'perfume', 'nail', 'manicure',
-        # Accessories
-        'jewelry', 'necklace', 'earrings', 'bracelet', 'bangles', 'ring', 'watch',
-        'shoes', 'heels', 'flats', 'sandals', 'boots', 'bag', 'clutch', 'purse',
-        # Styles
-        'traditional', 'modern', 'ethnic', 'western', 'fusion', 'vintage', 'chic',
-        'elegant', 'glamorous', 'minimalist', 'trendy', 'classic', 'contemporary',
-        # Attributes
-        'work', 'professional', 'smart', 'style', 'look', 'complete', 'overall', 'full',
-        # Colors
-        'red', 'green', 'blue', 'yellow', 'pink', 'purple', 'orange', 'black', 'white',
-        'gold', 'silver', 'maroon', 'navy', 'burgundy', 'beige', 'brown', 'grey',
-        # Fabrics
-        'silk', 'cotton', 'chiffon', 'georgette', 'velvet', 'satin', 'denim', 'lace',
-        # Kannada
-        'ಮದುವೆ', 'ಪಾರ್ಟಿ', 'ಆಫೀಸ್', 'ಸೀರೆ', 'ಮೇಕಪ್', 'ವಸ್ತ್ರ', 'ವೆಡ್ಡಿಂಗ್',
-        'ಬಣ್ಣ', 'ಕೆಂಪು', 'ನೀಲಿ', 'ಹಸಿರು', 'ಶೈಲಿ', 'ಆಭರಣ', 'ಕೂದಲು',
-        # Brands
-        'kanchipuram', 'banarasi', 'kanchi', 'designer', 'brand'
-    ]
-    
-    for word in text_lower.split():
-        if word in important_words or any(kw in word for kw in important_words):
-            keywords.append(word)
-    
-    return keywords
+    match = match or scan_message(text)
+    return match.tokens_containing('keyword')
 
-def find_keyword_links(current_keywords, prev_keywords):
-    """Find connections between current and previous keywords"""
-    links = []
-    
-    # Expanded keyword relationships
-    keyword_groups = {
-        'office': ['office', 'work', 'professional', 'formal', 'casual', 'smart', 'business', 'ಆಫೀಸ್', 'ಕಾರ್ಯ'],
-        'wedding': ['wedding', 'bridal', 'marriage', 'bride', 'groom', 'reception', 'engagement', 'ಮದುವೆ', 'ವೆಡ್ಡಿಂಗ್', 'traditional'],
-        'party': ['party', 'celebration', 'event', 'cocktail', 'ಪಾರ್ಟಿ', 'evening', 'night', 'function', 'gathering'],
-        'saree': ['saree', 'sari', 'ಸೀರೆ', 'kanchipuram', 'silk', 'kanchi', 'banarasi', 'georgette', 'chiffon'],
-        'lehenga': ['lehenga', 'choli', 'ghagra', 'chaniya'],
-        'kurta': ['kurta', 'kurti', 'salwar', 'kameez', 'churidar', 'palazzo', 'ethnic'],
-        'makeup': ['makeup', 'cosmetic', 'ಮೇಕಪ್', 'beauty', 'lipstick', 'foundation', 'eyeshadow', 'mascara', 'kajal'],
-        'hair': ['hair', 'hairstyle', 'haircut', 'ಕೂದಲು', 'bun', 'ponytail', 'braid', 'hairdo'],
-        'jewelry': ['jewelry', 'jewellery', 'ಆಭರಣ', 'necklace', 'earrings', 'bracelet', 'bangles', 'ring', 'ಬಳೆ'],
-        'outfit': ['outfit', 'dress', 'wear', 'clothes', 'ವಸ್ತ್ರ', 'ಬಟ್ಟೆ', 'look', 'style', 'attire', 'ensemble'],
-        'shoes': ['shoes', 'heels', 'flats', 'sandals', 'boots', 'sneakers', 'footwear', 'ಚಪ್ಪಲಿ', 'ಬೂಟು'],
-        'accessories': ['accessories', 'bag', 'clutch', 'purse', 'handbag', 'scarf', 'belt', 'watch', 'ಕೈಚೀಲ'],
-        'color': ['red', 'green', 'blue', 'yellow', 'pink', 'purple', 'color', 'colour', 'ಬಣ್ಣ', 'ಕೆಂಪು', 'ನೀಲಿ', 'ಹಸಿರು',
-                  'orange', 'black', 'white', 'gold', 'silver', 'maroon', 'navy', 'burgundy', 'beige'],
-        'style': ['traditional', 'modern', 'ethnic', 'western', 'fusion', 'vintage', 'chic', 'elegant', 'trendy', 'ಶೈಲಿ']
-    }
-    
-    # Find which groups current and previous keywords belong to
-    for current_kw in current_keywords:
-        for prev_kw in prev_keywords[-15:]:  # Check last 15 keywords (increased from 10)
-            for group_name, group_words in keyword_groups.items():
-                if any(gw in current_kw for gw in group_words) and any(gw in prev_kw for gw in group_words):
-                    links.append(group_name)
-                    break
-    
-    return list(set(links))  # Remove duplicates
+def find_keyword_links(current_ids, prev_ids):
+    """Find connections between current and previous keywords, as a KEYWORD_GROUPS bitmask"""
+    mask = KEYWORD_IDS.annotation
+    prev_masks = set(map(mask, prev_ids))
+    prev_masks.discard(0)
+    links = 0
+    
+    # Each (current, previous) pair links through the first group both belong to
+    for keyword_id in current_ids:
+        current = mask(keyword_id)
+        if current:
+            for prev in prev_masks:
+                shared = current & prev
+                links |= shared & -shared
+    
+    return links
 
-def is_fashion_related(text, context=[]):
-    text_lower = text.lower()
+def is_fashion_related(text, history=None, match=None):
+    match = match or scan_message(text)
     
-    # Enhanced context checking with keyword memory
-    if context:
-        last_messages = ' '.join(context[-CONTEXT_WINDOW:]).lower()
-        if any(keyword in last_messages for keyword in ['outfit', 'wear', 'style', 'dress', 'fashion', 'makeup', 'beauty', 'wedding', 'party', 'office', 'saree', 'ಮದುವೆ', 'ವಸ್ತ್ರ', 'ಮೇಕಪ್']):
-            if len(text_lower.split()) <= 30:
-                return True
+    # Enhanced context checking with keyword memory (topic words in the last CONTEXT_WINDOW messages)
+    if history is not None and history.has_topic():
+        if match.word_count <= 30:
+            return True
     
-    return any(keyword in text_lower for keyword in FASHION_KEYWORDS)
+    return match.has('fashion')
 
-def cleanup_inactive_sessions():
-    """Remove inactive sessions to free memory"""
-    current_time = time.time()
-    inactive_sessions = []
-    
-    for session_id, last_active in session_timestamps.items():
-        if current_time - last_active > INACTIVE_SESSION_TIMEOUT:
-            inactive_sessions.append(session_id)
-    
-    for session_id in inactive_sessions:
-        if session_id in conversation_memory:
-            del conversation_memory[session_id]
-        if session_id in conversation_context:
-            del conversation_context[session_id]
-        if session_id in session_timestamps:
-            del session_timestamps[session_id]
-    
-    return len(inactive_sessions)
+@dataclass(frozen=True)
+class MessageAnalysis:
+    """Everything derived from one user message, computed once per turn"""
+    text: str
+    text_lower: str
+    match: MatchResult
+    features: int
+    word_count: int
+    lang: str
+    greeting: bool
+    gratitude: bool
+    keyword_ids: tuple
+    keyword_links: int
+    intent: str
 
-def optimize_memory():
-    """Optimize memory usage when threshold reached"""
-    total_sessions = len(conversation_memory)
-    
-    if total_sessions > MAX_SESSIONS * MEMORY_CLEANUP_THRESHOLD:
-        cleanup_inactive_sessions()
-        
-        # If still over threshold, remove oldest sessions
-        if len(conversation_memory) > MAX_SESSIONS:
-            sorted_sessions = sorted(session_timestamps.items(), key=lambda x: x[1])
-            sessions_to_remove = sorted_sessions[:len(sorted_sessions) // 4]  # Remove oldest 25%
-            
-            for session_id, _ in sessions_to_remove:
-                if session_id in conversation_memory:
-                    del conversation_memory[session_id]
-                if session_id in conversation_context:
-                    del conversation_context[session_id]
-                if session_id in session_timestamps:
-                    del session_timestamps[session_id]
+def analyze_message(text, state, lang=None, corrected=None):
+    """Tokenize, detect language, extract keywords, links and intent once.
+
+    `corrected` is the lowercased text with typos already corrected, if known.
+    """
+    match = scan_message(text) if corrected is None else KEYWORD_MATCHER.scan(corrected)
+    keyword_ids = tuple(map(KEYWORD_IDS.key, extract_keywords(text, match)))
+    keyword_links = find_keyword_links(keyword_ids, state.keywords.last(KEYWORD_LINK_WINDOW))
+    return MessageAnalysis(
+        text=text,
+        text_lower=match.text,
+        match=match,
+        features=INTENT_FEATURES.mask(match.hits),
+        word_count=match.word_count,
+        lang=lang or detect_language(text),
+        greeting=is_greeting(text, match),
+        gratitude=is_gratitude(text, match),
+        keyword_ids=keyword_ids,
+        keyword_links=keyword_links,
+        intent=extract_intent(text, state, match, keyword_links),
+    )
+
+def context_fingerprint(state, text_lower):
+    """The context extract_intent reads, reduced to what can change its result.
+
+    Keyword links only depend on which groups the last KEYWORD_LINK_WINDOW
+    keywords fall into, and _continuation_intent only asks two yes/no questions
+    of the last CONTINUATION_RECENT, so sessions with different keyword
+    histories still share entries.
+    """
+    groups = frozenset(mask for mask in map(KEYWORD_IDS.annotation, state.keywords.last(KEYWORD_LINK_WINDOW)) if mask)
+    recent = state.recent_keywords(CONTINUATION_RECENT)
+    return (state.last_intent, groups,
+            any(kw in text_lower for kw in recent), 'ಮದುವೆ' in ' '.join(recent))
+
+@STAGE_SECONDS.timed('analyze')
+def analyze_turn(text, state):
+    """analyze_message, served from response_cache when the same turn was seen in the same context"""
+    lang = detect_language(text)
+    # The rules read the corrected text ("need weding" continues a wedding), so
+    # the key and the context fingerprint must be built from it too
+    corrected = correct_spelling(text.lower())
+    key = (corrected, lang, context_fingerprint(state, corrected))
+    analysis = response_cache.get(key)
+    if analysis is None:
+        analysis = analyze_message(text, state, lang, corrected)
+        response_cache.put(key, analysis)
+    elif analysis.text != text:
+        analysis = replace(analysis, text=text)
+    return analysis
 
 def get_out_of_scope_message(lang):
-    return OUT_OF_SCOPE_RESPONSES.get(lang, OUT_OF_SCOPE_RESPONSES['en'])
+    return get_response('out_of_scope', lang)
 
 def get_greeting_response(lang):
-    responses = {
-        'en': "Hello! 👋 I'm your fashion consultant. How can I help you with fashion, styling, or beauty today?",
-        'kn': "ನಮಸ್ಕಾರ! 👋 ನಾನು ನಿಮ್ಮ ಫ್ಯಾಷನ್ ಸಲಹೆಗಾರ. ಇಂದು ಫ್ಯಾಷನ್, ಸ್ಟೈಲಿಂಗ್ ಅಥವಾ ಸೌಂದರ್ಯದಲ್ಲಿ ನಾನು ನಿಮಗೆ ಹೇಗೆ ಸಹಾಯ ಮಾಡಬಹುದು?"
-    }
-    return responses.get(lang, responses['en'])
+    return get_response('greeting', lang)
 
 def get_gratitude_response(lang):
-    responses = {
-        'en': "You're welcome! 😊 Feel free to ask if you need more fashion advice, styling tips, or beauty recommendations. Happy to help!",
-        'kn': "ನಿಮಗೆ ಸ್ವಾಗತ! 😊 ಹೆಚ್ಚಿನ ಫ್ಯಾಷನ್ ಸಲಹೆ, ಸ್ಟೈಲಿಂಗ್ ಸಲಹೆಗಳು ಅಥವಾ ಸೌಂದರ್ಯ ಶಿಫಾರಸುಗಳು ಬೇಕಾದರೆ ಕೇಳಲು ಮುಕ್ತವಾಗಿರಿ. ಸಹಾಯ ಮಾಡಲು ಸಂತೋಷ!"
-    }
-    return responses.get(lang, responses['en'])
+    return get_response('gratitude', lang)
 
-def generate_fashion_response(query, lang, session_id):
-    query_lower = query.lower()
-    context = conversation_memory.get(session_id, [])
-    context_data = conversation_context.get(session_id, {})
-    
-    # Extract keywords from current query
-    current_keywords = extract_keywords(query)
-    
-    # Extract intent with enhanced context
-    intent = extract_intent(query, context_data)
-    
-    # Handle color change for sarees
-    if intent == 'saree_color_change':
-        color = None
-        for c in ['green', 'blue', 'pink', 'yellow', 'purple', 'maroon', 'gold', 'orange']:
-            if c in query_lower:
-                color = c
-                break
-        
-        if color:
-            responses = {
-                'en': f"**{color.title()} Kanchipuram Saree - Beautiful Choice!** ✨\n\n**About:**\n• Pure silk from Kanchipuram, Tamil Nadu\n• Rich {color} color with gold zari work\n• Traditional temple borders and pallu designs\n• Perfect for weddings, festivals\n\n**Styling:**\n• Jewelry: Gold temple jewelry, antique gold necklace, jhumkas, gold bangles (6-8)\n• Blouse: Gold, contrast color, or matching\n• Makeup: Complement the {color} saree with matching tones\n• Hair: Traditional bun with gajra\n\n**Where to Buy:**\n• Nalli, Pothys, RMKV (Chennai)\n• Taneira, FabIndia\n• Price: ₹5,000 - ₹50,000+\n\nYou'll look absolutely stunning! 👑",
-                'kn': f"**{color.title()} ಕಾಂಚೀಪುರಂ ಸೀರೆ - ಸುಂದರ ಆಯ್ಕೆ!** ✨\n\n**ಬಗ್ಗೆ:**\n• ಕಾಂಚೀಪುರಂ, ತಮಿಳುನಾಡಿನಿಂದ ಶುದ್ಧ ರೇಷ್ಮೆ\n• ಚಿನ್ನದ ಜರಿ ಕೆಲಸದೊಂದಿಗೆ ಶ್ರೀಮಂತ {color} ಬಣ್ಣ\n• ಸಾಂಪ್ರದಾಯಿಕ ದೇವಾಲಯ ಗಡಿಗಳು ಮತ್ತು ಪಲ್ಲು ವಿನ್ಯಾಸಗಳು\n• ಮದುವೆಗಳು, ಹಬ್ಬಗಳಿಗೆ ಪರಿಪೂರ್ಣ\n\n**ಸ್ಟೈಲಿಂಗ್:**\n• ಆಭರಣಗಳು: ಚಿನ್ನದ ದೇವಾಲಯ ಆಭರಣಗಳು, ಪುರಾತನ ಚಿನ್ನದ ಹಾರ, ಝುಮ್ಕಾಗಳು, ಚಿನ್ನದ ಬಳೆಗಳು\n• ಬ್ಲೌಸ್: ಚಿನ್ನ, ಕಾಂಟ್ರಾಸ್ಟ್ ಬಣ್ಣ, ಅಥವಾ ಹೊಂದಾಣಿಕೆ\n• ಮೇಕಪ್: ಸೀರೆಯೊಂದಿಗೆ ಹೊಂದಾಣಿಕೆಯ ಟೋನ್ಗಳು\n• ಹೇರ್: ಗಜ್ರಾದೊಂದಿಗೆ ಸಾಂಪ್ರದಾಯಿಕ ಬನ್\n\n**ಎಲ್ಲಿ ಖರೀದಿಸಬೇಕು:**\n• ನಲ್ಲಿ, ಪೋತೀಸ್, RMKV (ಚೆನ್ನೈ)\n• ತನೀರಾ, ಫ್ಯಾಬ್ಇಂಡಿಯಾ\n• ಬೆಲೆ: ₹5,000 - ₹50,000+\n\nನೀವು ಸಂಪೂರ್ಣವಾಗಿ ಅದ್ಭುತವಾಗಿ ಕಾಣುತ್ತೀರಿ! 👑"
-            }
-            # Update context with keywords
-            if session_id not in conversation_context:
-                conversation_context[session_id] = {}
-            conversation_context[session_id]['last_intent'] = 'kanchipuram_saree'
-            conversation_context[session_id]['keywords'] = context_data.get('keywords', []) + current_keywords
-            conversation_context[session_id]['keywords'] = conversation_context[session_id]['keywords'][-MAX_KEYWORDS:]  # Keep last 50 keywords
-            return responses.get(lang, responses['en'])
-    
-    # Store intent and keywords for next interaction
-    if session_id not in conversation_context:
-        conversation_context[session_id] = {}
-    conversation_context[session_id]['last_intent'] = intent
-    conversation_context[session_id]['last_query'] = query_lower
-    # Accumulate keywords and find links
-    prev_keywords = context_data.get('keywords', [])
-    all_keywords = (prev_keywords + current_keywords)[-MAX_KEYWORDS:]  # Keep last 50 keywords (increased from 20)
-    conversation_context[session_id]['keywords'] = all_keywords
-    conversation_context[session_id]['keyword_links'] = find_keyword_links(current_keywords, prev_keywords)
-    
-    # Color styling advice for office
-    if intent == 'color_styling_office':
-        if 'red' in query_lower and ('black' in query_lower or 'red' in query_lower):
-            responses = {
-                'en': "**Red & Black Office Styling:** 🔴⚫✨\n\n**Great choice! Here's how to style it professionally:**\n\n**Option 1: Red Top + Black Bottom**\n• Red blouse/shirt with black trousers\n• Black blazer (optional for formal look)\n• Black heels or flats\n• Minimal gold or silver jewelry\n• Keep makeup subtle (nude lips, light eyes)\n\n**Option 2: Black Top + Red Bottom**\n• Black blouse with red trousers/skirt\n• Red should be deep/burgundy for office\n• Black accessories\n\n**Pro Tips:**\n• Choose muted/deep red (burgundy, maroon) over bright red\n• Keep one color dominant, other as accent\n• Avoid all-red outfit for office\n• Add neutral blazer if too bold\n\n**Accessories:** Black bag, watch, simple earrings\n\nPowerful and professional! 💼",
-                'kn': "**ಕೆಂಪು & ಕಪ್ಪು ಆಫೀಸ್ ಸ್ಟೈಲಿಂಗ್:** 🔴⚫✨\n\n**ಉತ್ತಮ ಆಯ್ಕೆ! ಇದನ್ನು ವೃತ್ತಿಪರವಾಗಿ ಹೇಗೆ ಸ್ಟೈಲ್ ಮಾಡುವುದು:**\n\n**ಆಯ್ಕೆ 1: ಕೆಂಪು ಟಾಪ್ + ಕಪ್ಪು ಬಾಟಮ್**\n• ಕಪ್ಪು ಪ್ಯಾಂಟ್ಸ್ನೊಂದಿಗೆ ಕೆಂಪು ಬ್ಲೌಸ್/ಶರ್ಟ್\n• ಕಪ್ಪು ಬ್ಲೇಜರ್ (ಫಾರ್ಮಲ್ ಲುಕ್ಗಾಗಿ)\n• ಕಪ್ಪು ಹೀಲ್ಸ್ ಅಥವಾ ಫ್ಲಾಟ್ಸ್\n• ಮಿನಿಮಲ್ ಚಿನ್ನ ಅಥವಾ ಬೆಳ್ಳಿ ಆಭರಣಗಳು\n\n**ಆಯ್ಕೆ 2: ಕಪ್ಪು ಟಾಪ್ + ಕೆಂಪು ಬಾಟಮ್**\n• ಕೆಂಪು ಪ್ಯಾಂಟ್ಸ್/ಸ್ಕರ್ಟ್ನೊಂದಿಗೆ ಕಪ್ಪು ಬ್ಲೌಸ್\n• ಆಫೀಸ್ಗಾಗಿ ಡೀಪ್/ಬರ್ಗಂಡಿ ಕೆಂಪು\n\n**ಪ್ರೊ ಟಿಪ್ಸ್:**\n• ಪ್ರಕಾಶಮಾನ ಕೆಂಪಿಗಿಂತ ಮ್ಯೂಟೆಡ್/ಡೀಪ್ ಕೆಂಪು\n• ಒಂದು ಬಣ್ಣ ಪ್ರಧಾನ, ಇನ್ನೊಂದು ಆಕ್ಸೆಂಟ್\n\n**ಆಕ್ಸೆಸರೀಸ್:** ಕಪ್ಪು ಬ್ಯಾಗ್, ವಾಚ್\n\nಪವರ್ಫುಲ್ ಮತ್ತು ಪ್ರೊಫೆಷನಲ್! 💼"
-            }
-            return responses.get(lang, responses['en'])
-    
-    # Office/Work outfit queries
-    if intent == 'men_office' or (any(word in query_lower for word in ['office', 'work', 'professional']) and any(word in query_lower for word in ['men', 'man', 'male', 'groom', 'guy'])):
-        responses = {
-            'en': "**Professional Office Look for Men:** 💼✨\n\n**Formal Office:**\n• Tailored suit (navy, charcoal, black)\n• Dress shirt (white, light blue, striped)\n• Formal trousers with belt\n• Tie (solid or subtle pattern)\n• Blazer with dress pants\n\n**Smart Casual:**\n• Chinos with button-down shirt\n• Blazer with jeans (dark wash)\n• Polo shirt with trousers\n• Oxford shoes or loafers\n\n**Footwear:** Oxford shoes, brogues, loafers, formal shoes\n**Accessories:** Watch, leather belt, tie, cufflinks, laptop bag\n**Grooming:** Clean shave or well-trimmed beard, neat haircut\n\n**Brands:** Van Heusen, Allen Solly, Peter England, Raymond, Louis Philippe\n\nSharp and professional!",
-            'kn': "**ಪುರುಷರಿಗೆ ಪ್ರೊಫೆಷನಲ್ ಆಫೀಸ್ ಲುಕ್:** 💼✨\n\n**ಫಾರ್ಮಲ್ ಆಫೀಸ್:**\n• ಟೈಲರ್ಡ್ ಸೂಟ್ (ನೇವಿ, ಚಾರ್ಕೋಲ್, ಕಪ್ಪು)\n• ಡ್ರೆಸ್ ಶರ್ಟ್ (ಬಿಳಿ, ಹಗುರ ನೀಲಿ, ಸ್ಟ್ರೈಪ್ಡ್)\n• ಬೆಲ್ಟ್ನೊಂದಿಗೆ ಫಾರ್ಮಲ್ ಪ್ಯಾಂಟ್ಸ್\n• ಟೈ (ಸಾಲಿಡ್ ಅಥವಾ ಸಬ್ಟಲ್ ಪ್ಯಾಟರ್ನ್)\n• ಡ್ರೆಸ್ ಪ್ಯಾಂಟ್ಸ್ನೊಂದಿಗೆ ಬ್ಲೇಜರ್\n\n**ಸ್ಮಾರ್ಟ್ ಕ್ಯಾಶುಯಲ್:**\n• ಬಟನ್-ಡೌನ್ ಶರ್ಟ್ನೊಂದಿಗೆ ಚಿನೋಸ್\n• ಜೀನ್ಸ್ನೊಂದಿಗೆ ಬ್ಲೇಜರ್\n• ಪ್ಯಾಂಟ್ಸ್ನೊಂದಿಗೆ ಪೋಲೋ ಶರ್ಟ್\n• ಆಕ್ಸ್ಫರ್ಡ್ ಶೂಸ್ ಅಥವಾ ಲೋಫರ್ಸ್\n\n**ಪಾದರಕ್ಷೆ:** ಆಕ್ಸ್ಫರ್ಡ್ ಶೂಸ್, ಬ್ರೋಗ್ಸ್, ಲೋಫರ್ಸ್\n**ಆಕ್ಸೆಸರೀಸ್:** ವಾಚ್, ಲೆದರ್ ಬೆಲ್ಟ್, ಟೈ, ಕಫ್ಲಿಂಕ್ಸ್\n**ಗ್ರೂಮಿಂಗ್:** ಕ್ಲೀನ್ ಶೇವ್ ಅಥವಾ ಟ್ರಿಮ್ಡ್ ಬಿಯರ್ಡ್\n\n**ಬ್ರಾಂಡ್ಗಳು:** Van Heusen, Allen Solly, Peter England, Raymond\n\nಶಾರ್ಪ್ ಮತ್ತು ಪ್ರೊಫೆಷನಲ್!"
-        }
-        return responses.get(lang, responses['en'])
-    
-    if any(word in query_lower for word in ['office', 'work', 'professional']):
-        if any(word in query_lower for word in ['casual', 'smart casual']):
-            responses = {
-                'en': "**Smart Casual Office Look:** 💼✨\n\n**For Women:**\n• Well-fitted trousers or chinos with blouse\n• Midi skirt with tucked-in shirt\n• Blazer with jeans (dark wash)\n• Sheath dress with cardigan\n• Colors: Navy, black, grey, white, pastels\n\n**Footwear:** Loafers, ballet flats, low heels, ankle boots\n**Accessories:** Simple watch, small earrings, tote bag\n**Makeup:** Natural, professional (nude lips, light eyes)\n**Hair:** Neat bun, ponytail, or loose waves\n\n**Brands:** Zara, H&M, Marks & Spencer, Westside\n\nProfessional yet comfortable!",
-                'kn': "**ಸ್ಮಾರ್ಟ್ ಕ್ಯಾಶುಯಲ್ ಆಫೀಸ್ ಲುಕ್:** 💼✨\n\n**ಮಹಿಳೆಯರಿಗೆ:**\n• ಬ್ಲೌಸ್ನೊಂದಿಗೆ ಚೆನ್ನಾಗಿ ಹೊಂದಿಕೊಂಡ ಪ್ಯಾಂಟ್ಸ್ ಅಥವಾ ಚಿನೋಸ್\n• ಶರ್ಟ್ನೊಂದಿಗೆ ಮಿಡಿ ಸ್ಕರ್ಟ್\n• ಜೀನ್ಸ್ನೊಂದಿಗೆ ಬ್ಲೇಜರ್ (ಡಾರ್ಕ್ ವಾಶ್)\n• ಕಾರ್ಡಿಗನ್ನೊಂದಿಗೆ ಶೀತ್ ಡ್ರೆಸ್\n• ಬಣ್ಣಗಳು: ನೇವಿ, ಕಪ್ಪು, ಬೂದು, ಬಿಳಿ, ಪೇಸ್ಟಲ್ಸ್\n\n**ಪಾದರಕ್ಷೆ:** ಲೋಫರ್ಸ್, ಬ್ಯಾಲೆ ಫ್ಲಾಟ್ಸ್, ಲೋ ಹೀಲ್ಸ್, ಆಂಕಲ್ ಬೂಟ್ಸ್\n**ಆಕ್ಸೆಸರೀಸ್:** ಸಿಂಪಲ್ ವಾಚ್, ಸ್ಮಾಲ್ ಇಯರ್ರಿಂಗ್ಸ್, ಟೋಟ್ ಬ್ಯಾಗ್\n**ಮೇಕಪ್:** ನ್ಯಾಚುರಲ್, ಪ್ರೊಫೆಷನಲ್ (ನ್ಯೂಡ್ ಲಿಪ್ಸ್, ಲೈಟ್ ಐಸ್)\n**ಹೇರ್:** ನೀಟ್ ಬನ್, ಪೋನಿಟೇಲ್, ಅಥವಾ ಲೂಸ್ ವೇವ್ಸ್\n\n**ಬ್ರಾಂಡ್ಗಳು:** Zara, H&M, Marks & Spencer, Westside\n\nಪ್ರೊಫೆಷನಲ್ ಆದರೂ ಆರಾಮದಾಯಕ!"
-            }
-            return responses.get(lang, responses['en'])
-        else:
-            responses = {
-                'en': "**Professional Office Look:** 💼✨\n\n**For Women:**\n• Tailored blazer with dress pants\n• Pencil skirt with button-down shirt\n• Formal sheath dress\n• Pantsuit (matching blazer & trousers)\n• Colors: Navy, black, grey, white, burgundy\n\n**Footwear:** Closed-toe heels, pumps, formal flats\n**Accessories:** Minimal jewelry (studs, simple watch), structured bag\n**Makeup:** Professional (nude/pink lips, subtle eyes)\n**Hair:** Neat bun, low ponytail, sleek straight\n\n**Brands:** Van Heusen, Allen Solly, Marks & Spencer\n\nConfident and professional!",
-                'kn': "**ಪ್ರೊಫೆಷನಲ್ ಆಫೀಸ್ ಲುಕ್:** 💼✨\n\n**ಮಹಿಳೆಯರಿಗೆ:**\n• ಡ್ರೆಸ್ ಪ್ಯಾಂಟ್ಸ್ನೊಂದಿಗೆ ಟೈಲರ್ಡ್ ಬ್ಲೇಜರ್\n• ಬಟನ್-ಡೌನ್ ಶರ್ಟ್ನೊಂದಿಗೆ ಪೆನ್ಸಿಲ್ ಸ್ಕರ್ಟ್\n• ಫಾರ್ಮಲ್ ಶೀತ್ ಡ್ರೆಸ್\n• ಪ್ಯಾಂಟ್ಸೂಟ್ (ಮ್ಯಾಚಿಂಗ್ ಬ್ಲೇಜರ್ & ಟ್ರೌಸರ್ಸ್)\n• ಬಣ್ಣಗಳು: ನೇವಿ, ಕಪ್ಪು, ಬೂದು, ಬಿಳಿ, ಬರ್ಗಂಡಿ\n\n**ಪಾದರಕ್ಷೆ:** ಕ್ಲೋಸ್ಡ್-ಟೋ ಹೀಲ್ಸ್, ಪಂಪ್ಸ್, ಫಾರ್ಮಲ್ ಫ್ಲಾಟ್ಸ್\n**ಆಕ್ಸೆಸರೀಸ್:** ಮಿನಿಮಲ್ ಜ್ಯುವೆಲರಿ (ಸ್ಟಡ್ಸ್, ಸಿಂಪಲ್ ವಾಚ್), ಸ್ಟ್ರಕ್ಚರ್ಡ್ ಬ್ಯಾಗ್\n**ಮೇಕಪ್:** ಪ್ರೊಫೆಷನಲ್ (ನ್ಯೂಡ್/ಪಿಂಕ್ ಲಿಪ್ಸ್, ಸಬ್ಟಲ್ ಐಸ್)\n**ಹೇರ್:** ನೀಟ್ ಬನ್, ಲೋ ಪೋನಿಟೇಲ್, ಸ್ಲೀಕ್ ಸ್ಟ್ರೈಟ್\n\n**ಬ್ರಾಂಡ್ಗಳು:** Van Heusen, Allen Solly, Marks & Spencer\n\nಆತ್ಮವಿಶ್ವಾಸ ಮತ್ತು ಪ್ರೊಫೆಷನಲ್!"
-            }
-            return responses.get(lang, responses['en'])
-    
-    # Casual wear queries
-    if 'casual' in query_lower and 'wear' in query_lower:
-        responses = {
-            'en': "**Casual Wear Guide:** 👕✨\n\n**For Women:**\n• Jeans with stylish top/t-shirt\n• Casual dress or maxi dress\n• Shorts with tank top (summer)\n• Leggings with long tunic\n• Denim jacket or cardigan\n\n**Footwear:** Sneakers, flats, sandals, ankle boots\n**Accessories:** Crossbody bag, sunglasses, simple jewelry\n**Makeup:** Natural, minimal (tinted lip balm, mascara)\n**Hair:** Loose, ponytail, messy bun\n\n**Brands:** Zara, H&M, Forever 21, Westside\n\nComfortable and stylish!",
-            'kn': "**ಕ್ಯಾಶುಯಲ್ ವೇರ್ ಗೈಡ್:** 👕✨\n\n**ಮಹಿಳೆಯರಿಗೆ:**\n• ಸ್ಟೈಲಿಶ್ ಟಾಪ್/ಟಿ-ಶರ್ಟ್ನೊಂದಿಗೆ ಜೀನ್ಸ್\n• ಕ್ಯಾಶುಯಲ್ ಡ್ರೆಸ್ ಅಥವಾ ಮ್ಯಾಕ್ಸಿ ಡ್ರೆಸ್\n• ಟ್ಯಾಂಕ್ ಟಾಪ್ನೊಂದಿಗೆ ಶಾರ್ಟ್ಸ್ (ಬೇಸಿಗೆ)\n• ಲಾಂಗ್ ಟ್ಯೂನಿಕ್ನೊಂದಿಗೆ ಲೆಗ್ಗಿಂಗ್ಸ್\n• ಡೆನಿಮ್ ಜಾಕೆಟ್ ಅಥವಾ ಕಾರ್ಡಿಗನ್\n\n**ಪಾದರಕ್ಷೆ:** ಸ್ನೀಕರ್ಸ್, ಫ್ಲಾಟ್ಸ್, ಸ್ಯಾಂಡಲ್ಸ್, ಆಂಕಲ್ ಬೂಟ್ಸ್\n**ಆಕ್ಸೆಸರೀಸ್:** ಕ್ರಾಸ್ಬಾಡಿ ಬ್ಯಾಗ್, ಸನ್ಗ್ಲಾಸ್, ಸಿಂಪಲ್ ಜ್ಯುವೆಲರಿ\n**ಮೇಕಪ್:** ನ್ಯಾಚುರಲ್, ಮಿನಿಮಲ್ (ಟಿಂಟೆಡ್ ಲಿಪ್ ಬಾಮ್, ಮಸ್ಕಾರಾ)\n**ಹೇರ್:** ಲೂಸ್, ಪೋನಿಟೇಲ್, ಮೆಸ್ಸಿ ಬನ್\n\n**ಬ್ರಾಂಡ್ಗಳು:** Zara, H&M, Forever 21, Westside\n\nಆರಾಮದಾಯಕ ಮತ್ತು ಸ್ಟೈಲಿಶ್!"
-        }
-        return responses.get(lang, responses['en'])
-    
-    # Men's party outfit queries
-    if intent == 'men_party' or (intent == 'party' and any(word in query_lower for word in ['men', 'man', 'male', 'guy'])):
-        responses = {
-            'en': "**Party Outfit Ideas for Men:** 🎉✨\n\n**Casual Party:**\n• Fitted shirt with chinos\n• Polo shirt with jeans\n• Casual blazer with t-shirt and jeans\n• Henley shirt with trousers\n\n**Formal Party:**\n• Suit without tie (open collar)\n• Blazer with dress shirt and trousers\n• Waistcoat with dress pants\n• Tuxedo (for black-tie events)\n\n**Footwear:** Loafers, brogues, Chelsea boots, dress shoes\n**Accessories:** Watch, leather bracelet, sunglasses, cologne\n**Grooming:** Styled hair, trimmed beard, fresh look\n\n**Colors:** Navy, black, grey, burgundy, white\n**Brands:** Zara, H&M, Jack & Jones, Levi's\n\nBe the life of the party! 🎊",
-            'kn': "**ಪುರುಷರಿಗೆ ಪಾರ್ಟಿ ಉಡುಪು ಐಡಿಯಾಗಳು:** 🎉✨\n\n**ಕ್ಯಾಶುಯಲ್ ಪಾರ್ಟಿ:**\n• ಚಿನೋಸ್ನೊಂದಿಗೆ ಫಿಟ್ಟೆಡ್ ಶರ್ಟ್\n• ಜೀನ್ಸ್ನೊಂದಿಗೆ ಪೋಲೋ ಶರ್ಟ್\n• ಟಿ-ಶರ್ಟ್ ಮತ್ತು ಜೀನ್ಸ್ನೊಂದಿಗೆ ಕ್ಯಾಶುಯಲ್ ಬ್ಲೇಜರ್\n• ಪ್ಯಾಂಟ್ಸ್ನೊಂದಿಗೆ ಹೆನ್ಲಿ ಶರ್ಟ್\n\n**ಫಾರ್ಮಲ್ ಪಾರ್ಟಿ:**\n• ಟೈ ಇಲ್ಲದೆ ಸೂಟ್ (ಓಪನ್ ಕಾಲರ್)\n• ಡ್ರೆಸ್ ಶರ್ಟ್ ಮತ್ತು ಪ್ಯಾಂಟ್ಸ್ನೊಂದಿಗೆ ಬ್ಲೇಜರ್\n• ಡ್ರೆಸ್ ಪ್ಯಾಂಟ್ಸ್ನೊಂದಿಗೆ ವೇಸ್ಟ್ಕೋಟ್\n• ಟಕ್ಸೆಡೋ (ಬ್ಲ್ಯಾಕ್-ಟೈ ಈವೆಂಟ್ಸ್ಗೆ)\n\n**ಪಾದರಕ್ಷೆ:** ಲೋಫರ್ಸ್, ಬ್ರೋಗ್ಸ್, ಚೆಲ್ಸಿಯಾ ಬೂಟ್ಸ್\n**ಆಕ್ಸೆಸರೀಸ್:** ವಾಚ್, ಲೆದರ್ ಬ್ರೇಸ್ಲೆಟ್, ಸನ್ಗ್ಲಾಸ್\n**ಗ್ರೂಮಿಂಗ್:** ಸ್ಟೈಲ್ಡ್ ಹೇರ್, ಟ್ರಿಮ್ಡ್ ಬಿಯರ್ಡ್\n\n**ಬಣ್ಣಗಳು:** ನೇವಿ, ಕಪ್ಪು, ಬೂದು, ಬರ್ಗಂಡಿ, ಬಿಳಿ\n**ಬ್ರಾಂಡ್ಗಳು:** Zara, H&M, Jack & Jones, Levi's\n\nಪಾರ್ಟಿಯ ಲೈಫ್ ಆಗಿರಿ! 🎊"
-        }
-        return responses.get(lang, responses['en'])
-    
-    # Party outfit queries
-    if any(word in query_lower for word in ['party', 'event', 'celebration']):
-        responses = {
-            'en': "**Party Outfit Ideas:** 💃✨\n\n**For Women:**\n• Statement dress (sequined, silk, velvet)\n• Chic jumpsuit or palazzo set\n• Crop top with high-waisted skirt\n• Indo-western fusion outfit\n• Colors: Jewel tones, metallics, black\n\n**Styling:**\n• Heels: Strappy or platform (4-5 inches)\n• Jewelry: Bold earrings, statement necklace\n• Clutch: Metallic or embellished\n• Makeup: Smoky eyes or bold lips, highlighter\n\n**Brands:** Zara, H&M, FabIndia, Biba\n\nYou'll be the star of the party!",
-            'kn': "**ಪಾರ್ಟಿ ಉಡುಪು ಐಡಿಯಾಗಳು:** 💃✨\n\n**ಮಹಿಳೆಯರಿಗೆ:**\n• ಸ್ಟೇಟ್ಮೆಂಟ್ ಡ್ರೆಸ್ (ಸೀಕ್ವಿನ್ಡ್, ಸಿಲ್ಕ್, ವೆಲ್ವೆಟ್)\n• ಶಿಕ್ ಜಂಪ್ಸೂಟ್ ಅಥವಾ ಪಲಾಝೊ ಸೆಟ್\n• ಕ್ರಾಪ್ ಟಾಪ್ ವಿತ್ ಹೈ-ವೇಸ್ಟೆಡ್ ಸ್ಕರ್ಟ್\n• ಇಂಡೋ-ವೆಸ್ಟರ್ನ್ ಫ್ಯೂಷನ್ ಉಡುಪು\n• ಬಣ್ಣಗಳು: ಜ್ಯುವೆಲ್ ಟೋನ್ಸ್, ಮೆಟಾಲಿಕ್ಸ್, ಕಪ್ಪು\n\n**ಸ್ಟೈಲಿಂಗ್:**\n• ಹೀಲ್ಸ್: ಸ್ಟ್ರಾಪಿ ಅಥವಾ ಪ್ಲಾಟ್ಫಾರ್ಮ್\n• ಆಭರಣಗಳು: ಬೋಲ್ಡ್ ಇಯರ್ರಿಂಗ್ಸ್, ಸ್ಟೇಟ್ಮೆಂಟ್ ನೆಕ್ಲೇಸ್\n• ಕ್ಲಚ್: ಮೆಟಾಲಿಕ್ ಅಥವಾ ಎಂಬೆಲಿಶ್ಡ್\n• ಮೇಕಪ್: ಸ್ಮೋಕಿ ಐಸ್ ಅಥವಾ ಬೋಲ್ಡ್ ಲಿಪ್ಸ್\n\n**ಬ್ರಾಂಡ್ಗಳು:** Zara, H&M, FabIndia, Biba\n\nನೀವು ಪಾರ್ಟಿಯ ಸ್ಟಾರ್ ಆಗುತ್ತೀರಿ!"
-        }
-        return responses.get(lang, responses['en'])
-    
-    # Festival outfit queries
-    if intent == 'festival' or any(word in query_lower for word in ['festival', 'festive', 'ಹಬ್ಬ', 'ಉತ್ಸವ']):
-        responses = {
-            'en': "**Festival Outfit Ideas:** 🎊✨\n\n**For Women:**\n• Silk saree (traditional festivals)\n• Lehenga or half-saree\n• Anarkali suit or salwar kameez\n• Kurti with palazzo or churidar\n• Colors: Bright colors, gold, red, green, yellow\n\n**For Men:**\n• Kurta pajama (cotton or silk)\n• Dhoti with kurta\n• Nehru jacket with kurta\n• Pathani suit\n• Colors: White, cream, gold, maroon\n\n**Accessories:**\n• Women: Traditional jewelry, bangles, bindi, flowers in hair\n• Men: Mojari, watch, stole\n\n**Makeup (Women):** Traditional, colorful, festive look\n\n**Brands:** FabIndia, Biba, Manyavar, Soch, W\n\nCelebrate in style! 🪔✨",
-            'kn': "**ಹಬ್ಬದ ಉಡುಪು ಐಡಿಯಾಗಳು:** 🎊✨\n\n**ಮಹಿಳೆಯರಿಗೆ:**\n• ರೇಷ್ಮೆ ಸೀರೆ (ಸಾಂಪ್ರದಾಯಿಕ ಹಬ್ಬಗಳು)\n• ಲೆಹೆಂಗಾ ಅಥವಾ ಹಾಫ್-ಸೀರೆ\n• ಅನಾರ್ಕಲಿ ಸೂಟ್ ಅಥವಾ ಸಲ್ವಾರ್ ಕಮೀಜ್\n• ಪಲಾಝೊ ಅಥವಾ ಚುರಿದಾರ್ನೊಂದಿಗೆ ಕುರ್ತಿ\n• ಬಣ್ಣಗಳು: ಪ್ರಕಾಶಮಾನ ಬಣ್ಣಗಳು, ಚಿನ್ನ, ಕೆಂಪು, ಹಸಿರು, ಹಳದಿ\n\n**ಪುರುಷರಿಗೆ:**\n• ಕುರ್ತಾ ಪಜಾಮಾ (ಹತ್ತಿ ಅಥವಾ ರೇಷ್ಮೆ)\n• ಕುರ್ತಾದೊಂದಿಗೆ ಧೋತಿ\n• ಕುರ್ತಾದೊಂದಿಗೆ ನೆಹರೂ ಜಾಕೆಟ್\n• ಪಠಾಣಿ ಸೂಟ್\n• ಬಣ್ಣಗಳು: ಬಿಳಿ, ಕ್ರೀಮ್, ಚಿನ್ನ, ಮರೂನ್\n\n**ಆಕ್ಸೆಸರೀಸ್:**\n• ಮಹಿಳೆಯರು: ಸಾಂಪ್ರದಾಯಿಕ ಆಭರಣಗಳು, ಬಳೆಗಳು, ಬಿಂದಿ, ಕೂದಲಿನಲ್ಲಿ ಹೂವುಗಳು\n• ಪುರುಷರು: ಮೊಜರಿ, ವಾಚ್, ಸ್ಟೋಲ್\n\n**ಮೇಕಪ್ (ಮಹಿಳೆಯರು):** ಸಾಂಪ್ರದಾಯಿಕ, ವರ್ಣರಂಜಿತ, ಹಬ್ಬದ ಲುಕ್\n\n**ಬ್ರಾಂಡ್ಗಳು:** FabIndia, Biba, Manyavar, Soch, W\n\nಸ್ಟೈಲ್ನಲ್ಲಿ ಆಚರಿಸಿ! 🪔✨"
-        }
-        return responses.get(lang, responses['en'])
-    
-    # Vacation outfit queries
-    if intent == 'vacation' or any(word in query_lower for word in ['vacation', 'holiday', 'travel', 'trip', 'beach', 'resort']):
-        responses = {
-            'en': "**Vacation Outfit Ideas:** ✈️🏖️✨\n\n**For Women:**\n• Maxi dresses or sundresses\n• Shorts with tank tops/t-shirts\n• Swimwear with cover-ups\n• Comfortable rompers or jumpsuits\n• Light cardigan or denim jacket\n• Colors: Bright, tropical, pastels\n\n**For Men:**\n• Casual shorts with polo/t-shirts\n• Linen shirts with chinos\n• Swim trunks with casual shirts\n• Comfortable joggers\n• Light jacket or hoodie\n• Colors: Neutrals, blues, whites\n\n**Footwear:**\n• Women: Sandals, flip-flops, sneakers, espadrilles\n• Men: Sneakers, loafers, flip-flops, boat shoes\n\n**Accessories:**\n• Sunglasses, sun hat, beach bag\n• Sunscreen, light scarf\n• Crossbody bag or backpack\n\n**Pro Tips:**\n• Pack light, breathable fabrics\n• Bring layers for evening\n• Comfortable walking shoes essential\n\n**Brands:** Zara, H&M, Uniqlo, Gap, Old Navy\n\nEnjoy your vacation! 🌴☀️",
-            'kn': "**ರಜೆಯ ಉಡುಪು ಐಡಿಯಾಗಳು:** ✈️🏖️✨\n\n**ಮಹಿಳೆಯರಿಗೆ:**\n• ಮ್ಯಾಕ್ಸಿ ಡ್ರೆಸ್ಸೆಸ್ ಅಥವಾ ಸನ್ಡ್ರೆಸ್ಸೆಸ್\n• ಟ್ಯಾಂಕ್ ಟಾಪ್ಸ್/ಟಿ-ಶರ್ಟ್ಸ್ನೊಂದಿಗೆ ಶಾರ್ಟ್ಸ್\n• ಕವರ್-ಅಪ್ಸ್ನೊಂದಿಗೆ ಸ್ವಿಮ್ವೇರ್\n• ಆರಾಮದಾಯಕ ರೋಂಪರ್ಸ್ ಅಥವಾ ಜಂಪ್ಸೂಟ್ಸ್\n• ಲೈಟ್ ಕಾರ್ಡಿಗನ್ ಅಥವಾ ಡೆನಿಮ್ ಜಾಕೆಟ್\n• ಬಣ್ಣಗಳು: ಪ್ರಕಾಶಮಾನ, ಟ್ರಾಪಿಕಲ್, ಪೇಸ್ಟಲ್ಸ್\n\n**ಪುರುಷರಿಗೆ:**\n• ಪೋಲೋ/ಟಿ-ಶರ್ಟ್ಸ್ನೊಂದಿಗೆ ಕ್ಯಾಶುಯಲ್ ಶಾರ್ಟ್ಸ್\n• ಚಿನೋಸ್ನೊಂದಿಗೆ ಲಿನೆನ್ ಶರ್ಟ್ಸ್\n• ಕ್ಯಾಶುಯಲ್ ಶರ್ಟ್ಸ್ನೊಂದಿಗೆ ಸ್ವಿಮ್ ಟ್ರಂಕ್ಸ್\n• ಆರಾಮದಾಯಕ ಜಾಗರ್ಸ್\n• ಲೈಟ್ ಜಾಕೆಟ್ ಅಥವಾ ಹೂಡಿ\n• ಬಣ್ಣಗಳು: ನ್ಯೂಟ್ರಲ್ಸ್, ಬ್ಲೂಸ್, ವೈಟ್ಸ್\n\n**ಪಾದರಕ್ಷೆ:**\n• ಮಹಿಳೆಯರು: ಸ್ಯಾಂಡಲ್ಸ್, ಫ್ಲಿಪ್-ಫ್ಲಾಪ್ಸ್, ಸ್ನೀಕರ್ಸ್\n• ಪುರುಷರು: ಸ್ನೀಕರ್ಸ್, ಲೋಫರ್ಸ್, ಫ್ಲಿಪ್-ಫ್ಲಾಪ್ಸ್\n\n**ಆಕ್ಸೆಸರೀಸ್:**\n• ಸನ್ಗ್ಲಾಸ್, ಸನ್ ಹ್ಯಾಟ್, ಬೀಚ್ ಬ್ಯಾಗ್\n• ಸನ್ಸ್ಕ್ರೀನ್, ಲೈಟ್ ಸ್ಕಾರ್ಫ್\n• ಕ್ರಾಸ್ಬಾಡಿ ಬ್ಯಾಗ್ ಅಥವಾ ಬ್ಯಾಕ್ಪ್ಯಾಕ್\n\n**ಪ್ರೊ ಟಿಪ್ಸ್:**\n• ಲೈಟ್, ಉಸಿರಾಡುವ ಬಟ್ಟೆಗಳನ್ನು ಪ್ಯಾಕ್ ಮಾಡಿ\n• ಸಂಜೆಗೆ ಲೇಯರ್ಸ್ ತನ್ನಿ\n• ಆರಾಮದಾಯಕ ವಾಕಿಂಗ್ ಶೂಸ್ ಅತ್ಯಗತ್ಯ\n\n**ಬ್ರಾಂಡ್ಗಳು:** Zara, H&M, Uniqlo, Gap, Old Navy\n\nನಿಮ್ಮ ರಜೆಯನ್ನು ಆನಂದಿಸಿ! 🌴☀️"
-        }
-        return responses.get(lang, responses['en'])
-    
-    # Kanchipuram saree queries
-    if intent == 'kanchipuram_saree' or any(word in query_lower for word in ['kanchipuram', 'kanchi', 'kanjivaram']):
-        conversation_context[session_id]['last_intent'] = 'kanchipuram_saree'
-        if 'red' in query_lower or 'ಕೆಂಪು' in query_lower:
-            responses = {
-                'en': "**Red Kanchipuram Saree - Stunning Choice!** 🔴✨\n\n**About:**\n• Pure silk from Kanchipuram, Tamil Nadu\n• Rich texture, vibrant red color, gold zari work\n• Traditional temple borders and pallu designs\n• Perfect for weddings, festivals\n\n**Styling:**\n• Jewelry: Gold temple jewelry, antique gold necklace, jhumkas, gold bangles (6-8)\n• Blouse: Gold, green, or maroon contrast\n• Makeup: Bold red/maroon lips, winged eyeliner, bindi, gajra\n\n**Where to Buy:**\n• Nalli, Pothys, RMKV (Chennai)\n• Taneira, FabIndia\n• Price: ₹5,000 - ₹50,000+\n\nYou'll look absolutely regal! 👑",
-                'kn': "**ಕೆಂಪು ಕಾಂಚೀಪುರಂ ಸೀರೆ - ಅದ್ಭುತ ಆಯ್ಕೆ!** 🔴✨\n\n**ಬಗ್ಗೆ:**\n• ಕಾಂಚೀಪುರಂ, ತಮಿಳುನಾಡಿನಿಂದ ಶುದ್ಧ ರೇಷ್ಮೆ\n• ಶ್ರೀಮಂತ ವಿನ್ಯಾಸ, ಉತ್ಸಾಹಭರಿತ ಕೆಂಪು ಬಣ್ಣ, ಚಿನ್ನದ ಜರಿ ಕೆಲಸ\n• ಸಾಂಪ್ರದಾಯಿಕ ದೇವಾಲಯ ಗಡಿಗಳು ಮತ್ತು ಪಲ್ಲು ವಿನ್ಯಾಸಗಳು\n• ಮದುವೆಗಳು, ಹಬ್ಬಗಳಿಗೆ ಪರಿಪೂರ್ಣ\n\n**ಸ್ಟೈಲಿಂಗ್:**\n• ಆಭರಣಗಳು: ಚಿನ್ನದ ದೇವಾಲಯ ಆಭರಣಗಳು, ಪುರಾತನ ಚಿನ್ನದ ಹಾರ, ಝುಮ್ಕಾಗಳು, ಚಿನ್ನದ ಬಳೆಗಳು (6-8)\n• ಬ್ಲೌಸ್: ಚಿನ್ನ, ಹಸಿರು, ಅಥವಾ ಮರೂನ್ ಕಾಂಟ್ರಾಸ್ಟ್\n• ಮೇಕಪ್: ಬೋಲ್ಡ್ ಕೆಂಪು/ಮರೂನ್ ತುಟಿಗಳು, ವಿಂಗ್ಡ್ ಐಲೈನರ್, ಬಿಂದಿ, ಗಜ್ರಾ\n\n**ಎಲ್ಲಿ ಖರೀದಿಸಬೇಕು:**\n• ನಲ್ಲಿ, ಪೋತೀಸ್, RMKV (ಚೆನ್ನೈ)\n• ತನೀರಾ, ಫ್ಯಾಬ್ಇಂಡಿಯಾ\n• ಬೆಲೆ: ₹5,000 - ₹50,000+\n\nನೀವು ಸಂಪೂರ್ಣವಾಗಿ ರಾಜಮನೆತನದಂತೆ ಕಾಣುತ್ತೀರಿ! 👑"
-            }
-            return responses.get(lang, responses['en'])
-        else:
-            responses = {
-                'en': "**Kanchipuram Saree - The Queen of Silk!** 👑✨\n\n**About:**\n• Handwoven pure silk from Kanchipuram\n• 400+ year old tradition\n• Known for durability, rich colors, heavy zari borders\n• Traditional motifs: peacocks, parrots, temples\n\n**Popular Colors:**\n• Red, maroon, green, blue, purple, gold\n• Contrast borders (e.g., red with green border)\n\n**Styling Tips:**\n• Pair with gold temple jewelry\n• Traditional blouse with zari work\n• Gajra in hair, bold makeup\n\n**Top Brands:** Nalli, Pothys, RMKV, Chennai Silks\n**Price:** ₹5,000 - ₹50,000+\n\nA timeless investment!",
-                'kn': "**ಕಾಂಚೀಪುರಂ ಸೀರೆ - ರೇಷ್ಮೆಯ ರಾಣಿ!** 👑✨\n\n**ಬಗ್ಗೆ:**\n• ಕಾಂಚೀಪುರಂದಿಂದ ಕೈಯಿಂದ ನೇಯ್ದ ಶುದ್ಧ ರೇಷ್ಮೆ\n• 400+ ವರ್ಷಗಳ ಹಳೆಯ ಸಂಪ್ರದಾಯ\n• ಬಾಳಿಕೆ, ಶ್ರೀಮಂತ ಬಣ್ಣಗಳು, ಭಾರೀ ಜರಿ ಗಡಿಗಳಿಗೆ ಹೆಸರುವಾಸಿ\n• ಸಾಂಪ್ರದಾಯಿಕ ಮೋಟಿಫ್ಗಳು: ನವಿಲುಗಳು, ಗಿಳಿಗಳು, ದೇವಾಲಯಗಳು\n\n**ಜನಪ್ರಿಯ ಬಣ್ಣಗಳು:**\n• ಕೆಂಪು, ಮರೂನ್, ಹಸಿರು, ನೀಲಿ, ನೇರಳೆ, ಚಿನ್ನ\n• ಕಾಂಟ್ರಾಸ್ಟ್ ಗಡಿಗಳು\n\n**ಸ್ಟೈಲಿಂಗ್ ಸಲಹೆಗಳು:**\n• ಚಿನ್ನದ ದೇವಾಲಯ ಆಭರಣಗಳೊಂದಿಗೆ ಜೋಡಿಸಿ\n• ಜರಿ ಕೆಲಸದೊಂದಿಗೆ ಸಾಂಪ್ರದಾಯಿಕ ಬ್ಲೌಸ್\n• ಕೂದಲಿನಲ್ಲಿ ಗಜ್ರಾ, ಬೋಲ್ಡ್ ಮೇಕಪ್\n\n**ಟಾಪ್ ಬ್ರಾಂಡ್ಗಳು:** ನಲ್ಲಿ, ಪೋತೀಸ್, RMKV, ಚೆನ್ನೈ ಸಿಲ್ಕ್ಸ್\n**ಬೆಲೆ:** ₹5,000 - ₹50,000+\n\nಕಾಲಾತೀತ ಹೂಡಿಕೆ!"
-            }
-            return responses.get(lang, responses['en'])
-    
-    # Saree queries
-    if 'saree' in query_lower or 'ಸೀರೆ' in query_lower:
-        conversation_context[session_id]['last_intent'] = 'saree'
-        responses = {
-            'en': "**Saree Styling Guide:**\n\n**Popular Types:**\n• Silk: Kanchipuram, Banarasi (weddings, festivals)\n• Georgette: Flowy, party wear\n• Chiffon: Lightweight, elegant\n• Cotton: Casual, comfortable\n\n**Styling Tips:**\n• Match jewelry with saree style\n• Contrast or matching blouse\n• Appropriate footwear (heels for parties)\n\n**Occasions:**\n• Wedding: Silk, heavy embroidery\n• Party: Georgette, sequins\n• Festival: Traditional silk\n\n**Brands:** Nalli, Pothys, FabIndia, Taneira\n\nWhat color interests you?",
-            'kn': "**ಸೀರೆ ಸ್ಟೈಲಿಂಗ್ ಮಾರ್ಗದರ್ಶಿ:**\n\n**ಜನಪ್ರಿಯ ಪ್ರಕಾರಗಳು:**\n• ರೇಷ್ಮೆ: ಕಾಂಚೀಪುರಂ, ಬನಾರಸಿ (ಮದುವೆಗಳು, ಹಬ್ಬಗಳು)\n• ಜಾರ್ಜೆಟ್: ಹರಿಯುವ, ಪಾರ್ಟಿ ವೇರ್\n• ಶಿಫಾನ್: ಹಗುರ, ಸೊಗಸಾದ\n• ಹತ್ತಿ: ಕ್ಯಾಶುಯಲ್, ಆರಾಮದಾಯಕ\n\n**ಸ್ಟೈಲಿಂಗ್ ಸಲಹೆಗಳು:**\n• ಸೀರೆ ಶೈಲಿಯೊಂದಿಗೆ ಆಭರಣಗಳನ್ನು ಹೊಂದಿಸಿ\n• ಕಾಂಟ್ರಾಸ್ಟ್ ಅಥವಾ ಹೊಂದಾಣಿಕೆಯ ಬ್ಲೌಸ್\n• ಸೂಕ್ತ ಪಾದರಕ್ಷೆ (ಪಾರ್ಟಿಗಳಿಗೆ ಹೀಲ್ಸ್)\n\n**ಸಂದರ್ಭಗಳು:**\n• ಮದುವೆ: ರೇಷ್ಮೆ, ಭಾರೀ ಕಸೂತಿ\n• ಪಾರ್ಟಿ: ಜಾರ್ಜೆಟ್, ಸೀಕ್ವಿನ್ಸ್\n• ಹಬ್ಬ: ಸಾಂಪ್ರದಾಯಿಕ ರೇಷ್ಮೆ\n\n**ಬ್ರಾಂಡ್ಗಳು:** ನಲ್ಲಿ, ಪೋತೀಸ್, ಫ್ಯಾಬ್ಇಂಡಿಯಾ, ತನೀರಾ\n\nಯಾವ ಬಣ್ಣ ನಿಮಗೆ ಆಸಕ್ತಿ?"
-        }
-        return responses.get(lang, responses['en'])
-    
-    # Handle based on intent
-    if intent == 'wedding_makeup' or (intent.endswith('_continue') and 'makeup' in context_data.get('last_intent', '')):
-        if any(word in query_lower for word in ['wedding', 'bridal', 'traditional', 'settled', 'ಮದುವೆ']):
-            responses = {
-                'en': "**Traditional Wedding Makeup Guide:** 💄✨\n\n**Base:**\n• Primer for long-lasting makeup\n• Full-coverage foundation (match skin tone)\n• Concealer for dark circles\n• Setting powder (translucent)\n• Contour & highlight for definition\n\n**Eyes:**\n• Bold eyeshadow (gold, bronze, maroon)\n• Winged eyeliner (black/brown)\n• False lashes or mascara (2-3 coats)\n• Kajal on waterline\n• Fill & define eyebrows\n\n**Lips:**\n• Red, maroon, or pink lipstick\n• Lip liner to prevent bleeding\n• Gloss for shine (optional)\n\n**Finishing:**\n• Blush (peach/pink)\n• Bindi (traditional)\n• Setting spray for 12+ hour wear\n\n**Brands:** MAC, Huda Beauty, Lakme, Maybelline\n\nYou'll look absolutely stunning! 👰✨",
-                'kn': "**ಸಾಂಪ್ರದಾಯಿಕ ಮದುವೆಯ ಮೇಕಪ್ ಮಾರ್ಗದರ್ಶಿ:** 💄✨\n\n**ಬೇಸ್:**\n• ದೀರ್ಘಕಾಲೀನ ಮೇಕಪ್ಗಾಗಿ ಪ್ರೈಮರ್\n• ಫುಲ್-ಕವರೇಜ್ ಫೌಂಡೇಶನ್\n• ಡಾರ್ಕ್ ಸರ್ಕಲ್ಸ್ಗಾಗಿ ಕನ್ಸೀಲರ್\n• ಸೆಟ್ಟಿಂಗ್ ಪೌಡರ್\n• ಕಾಂಟೂರ್ & ಹೈಲೈಟ್\n\n**ಕಣ್ಣುಗಳು:**\n• ಬೋಲ್ಡ್ ಐಶಾಡೋ (ಚಿನ್ನ, ಕಂಚು, ಮರೂನ್)\n• ವಿಂಗ್ಡ್ ಐಲೈನರ್\n• ಫಾಲ್ಸ್ ಲ್ಯಾಶಸ್ ಅಥವಾ ಮಸ್ಕಾರಾ\n• ವಾಟರ್ಲೈನ್ನಲ್ಲಿ ಕಾಜಲ್\n• ಹುಬ್ಬುಗಳನ್ನು ತುಂಬಿಸಿ\n\n**ತುಟಿಗಳು:**\n• ಕೆಂಪು, ಮರೂನ್, ಅಥವಾ ಗುಲಾಬಿ ಲಿಪ್ಸ್ಟಿಕ್\n• ಲಿಪ್ ಲೈನರ್\n• ಹೊಳಪಿಗಾಗಿ ಗ್ಲಾಸ್\n\n**ಫಿನಿಶಿಂಗ್:**\n• ಬ್ಲಶ್ (ಪೀಚ್/ಪಿಂಕ್)\n• ಬಿಂದಿ (ಸಾಂಪ್ರದಾಯಿಕ)\n• ಸೆಟ್ಟಿಂಗ್ ಸ್ಪ್ರೇ\n\n**ಬ್ರಾಂಡ್ಗಳು:** MAC, Huda Beauty, Lakme, Maybelline\n\nನೀವು ಸಂಪೂರ್ಣವಾಗಿ ಅದ್ಭುತವಾಗಿ ಕಾಣುತ್ತೀರಿ! 👰✨"
-            }
-            return responses.get(lang, responses['en'])
-        elif any(word in query_lower for word in ['party', 'evening', 'night']):
-            responses = {
-                'en': "**Party Makeup Guide:** 💃✨\n\n**Base:**\n• Primer + full-coverage foundation\n• Concealer & setting powder\n• Heavy contour & highlight\n\n**Eyes:**\n• Smoky eyes (black, grey, purple)\n• Glitter eyeshadow\n• Dramatic winged liner\n• False lashes\n\n**Lips:**\n• Bold red or nude lips\n• Matte or glossy finish\n\n**Finishing:**\n• Blush & bronzer\n• Setting spray\n\n**Brands:** Urban Decay, NYX, MAC\n\nGlamorous and party-ready!",
-                'kn': "**ಪಾರ್ಟಿ ಮೇಕಪ್ ಮಾರ್ಗದರ್ಶಿ:** 💃✨\n\n**ಬೇಸ್:**\n• ಪ್ರೈಮರ್ + ಫುಲ್-ಕವರೇಜ್ ಫೌಂಡೇಶನ್\n• ಕನ್ಸೀಲರ್ & ಸೆಟ್ಟಿಂಗ್ ಪೌಡರ್\n• ಹೆವಿ ಕಾಂಟೂರ್ & ಹೈಲೈಟ್\n\n**ಕಣ್ಣುಗಳು:**\n• ಸ್ಮೋಕಿ ಐಸ್\n• ಗ್ಲಿಟ್ಟರ್ ಐಶಾಡೋ\n• ಡ್ರಾಮಾಟಿಕ್ ವಿಂಗ್ಡ್ ಲೈನರ್\n• ಫಾಲ್ಸ್ ಲ್ಯಾಶಸ್\n\n**ತುಟಿಗಳು:**\n• ಬೋಲ್ಡ್ ಕೆಂಪು ಅಥವಾ ನ್ಯೂಡ್ ತುಟಿಗಳು\n• ಮ್ಯಾಟ್ ಅಥವಾ ಗ್ಲಾಸಿ ಫಿನಿಶ್\n\n**ಫಿನಿಶಿಂಗ್:**\n• ಬ್ಲಶ್ & ಬ್ರಾಂಜರ್\n• ಸೆಟ್ಟಿಂಗ್ ಸ್ಪ್ರೇ\n\n**ಬ್ರಾಂಡ್ಗಳು:** Urban Decay, NYX, MAC\n\nಗ್ಲಾಮರಸ್ ಮತ್ತು ಪಾರ್ಟಿ-ರೆಡಿ!"
-            }
-            return responses.get(lang, responses['en'])
-        else:
-            responses = {
-                'en': "**Everyday Makeup Guide:** 💄\n\n**Base:**\n• Moisturizer + primer\n• Light/medium coverage foundation\n• Concealer for blemishes\n• Loose powder\n\n**Eyes:**\n• Neutral eyeshadow (brown, beige)\n• Light eyeliner\n• Mascara (1-2 coats)\n• Fill eyebrows naturally\n\n**Lips:**\n• Nude, pink, or coral lipstick\n• Tinted lip balm\n\n**Finishing:**\n• Light blush\n• Optional: light highlighter\n\n**Brands:** Maybelline, Lakme, L'Oreal\n\nFresh and natural look!",
-                'kn': "**ದೈನಂದಿನ ಮೇಕಪ್ ಮಾರ್ಗದರ್ಶಿ:** 💄\n\n**ಬೇಸ್:**\n• ಮಾಯ್ಶ್ಚರೈಜರ್ + ಪ್ರೈಮರ್\n• ಲೈಟ್/ಮೀಡಿಯಂ ಕವರೇಜ್ ಫೌಂಡೇಶನ್\n• ಕನ್ಸೀಲರ್\n• ಲೂಸ್ ಪೌಡರ್\n\n**ಕಣ್ಣುಗಳು:**\n• ನ್ಯೂಟ್ರಲ್ ಐಶಾಡೋ\n• ಲೈಟ್ ಐಲೈನರ್\n• ಮಸ್ಕಾರಾ\n• ಹುಬ್ಬುಗಳನ್ನು ನೈಸರ್ಗಿಕವಾಗಿ ತುಂಬಿಸಿ\n\n**ತುಟಿಗಳು:**\n• ನ್ಯೂಡ್, ಪಿಂಕ್, ಅಥವಾ ಕೋರಲ್ ಲಿಪ್ಸ್ಟಿಕ್\n• ಟಿಂಟೆಡ್ ಲಿಪ್ ಬಾಮ್\n\n**ಫಿನಿಶಿಂಗ್:**\n• ಲೈಟ್ ಬ್ಲಶ್\n• ಐಚ್ಛಿಕ: ಲೈಟ್ ಹೈಲೈಟರ್\n\n**ಬ್ರಾಂಡ್ಗಳು:** Maybelline, Lakme, L'Oreal\n\nತಾಜಾ ಮತ್ತು ನೈಸರ್ಗಿಕ ನೋಟ!"
-            }
-            return responses.get(lang, responses['en'])
+@STAGE_SECONDS.timed('generate_fashion_response')
+def generate_fashion_response(analysis, session):
+    state = session.context
+    response, intent, update = FASHION_TABLE.resolve(analysis.intent, analysis.features)
+    
+    # Store intent and keywords for next interaction (the ring keeps the last MAX_KEYWORDS)
+    state.last_intent = intent
+    if update == 'turn':
+        state.last_query = analysis.text_lower
+    state.keywords.extend(analysis.keyword_ids)
+    if update == 'turn':
+        state.keyword_links = analysis.keyword_links
+    
+    if response == FASHION_TABLE.default:
+        # No rule fired: answer from the knowledge base when it has something relevant
+        tips = retrieve_tips(analysis.text_lower, analysis.lang)
+        if tips:
+            return get_response('knowledge_tips', analysis.lang).format(tips='\n'.join('• ' + tip for tip in tips))
+    return get_response(response, analysis.lang)
+
+@STAGE_SECONDS.timed('retrieve_tips')
+def retrieve_tips(text_lower, lang):
+    return KNOWLEDGE_BASE.search(text_lower, lang)
+
+def build_static():
+    """Static files under content-hashed names, and index.html rendered once against them"""
+    assets, hashed_names = load_static(os.path.join(app.root_path, 'static'))
+    html = app.jinja_env.get_template('index.html').render(static_url=lambda name: '/static/' + hashed_names[name])
+    return StaticAsset(html.encode('utf-8'), CONTENT_TYPES['.html'], REVALIDATE), assets
+
+index_page, static_files = build_static()
+
+def current_static():
+    # The debug server picks up template and static edits without a restart
+    return build_static() if app.debug else (index_page, static_files)
+
+@app.route('/')
+def index():
+    page, _ = current_static()
+    return page.response(request)
+
+@app.route('/static/<name>')
+def static_file(name):
+    _, assets = current_static()
+    asset = assets.get(name)
+    if asset is None:
+        return 'Not found', 404
+    return asset.response(request)
+
+@STAGE_SECONDS.timed('images')
+def select_images(analysis, session):
+    """Catalog images for this reply that the session has not been shown yet"""
+    if not len(image_catalog):
+        return []
+    intent = session.context.last_intent
+    keys = [pair_key(intent, colour) for colour in sorted(analysis.match.category('colour'))]
+    keys.append(intent)
+    keys.extend(sorted(analysis.match.category('occasion')))
+    image_ids = image_catalog.select(keys, session.shown_images, IMAGES_PER_RESPONSE)
+    return [image_catalog.images[image_id] for image_id in image_ids]
+
+@app.route('/images/<int:width>/<name>')
+def catalog_image(width, name):
+    directory = image_catalog.thumbnail_dir(width)
+    if directory is None:
+        return 'Not found', 404
+    # Thumbnail names carry a content hash, so they never change
+    response = send_from_directory(directory, name)
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+@STAGE_SECONDS.timed('turn')
+def answer_message(user_message, session):
+    """One turn of the chat pipeline against a session: (JSON payload, language, intent)"""
+    # Context updates (last_intent, keywords, ...) still run below on a cache hit
+    analysis = analyze_turn(user_message, session.context)
+    session.history.append(user_message, TOPIC_FEATURES.mask(analysis.match.category('topic')))
+    lang = analysis.lang
     
-    # Handle makeup queries
-    if intent == 'makeup' or any(word in query_lower for word in ['makeup', 'cosmetic', 'foundation', 'lipstick', 'eyeshadow', 'mascara', 'ಮೇಕಪ್']):
-        if any(word in query_lower for word in ['wedding', 'bridal', 'traditional', 'settled', 'ಮದುವೆ']):
-            responses = {
-                'en': "**Traditional Wedding Makeup Guide:** 💄✨\n\n**Base:**\n• Primer for long-lasting makeup\n• Full-coverage foundation (match skin tone)\n• Concealer for dark circles\n• Setting powder (translucent)\n• Contour & highlight for definition\n\n**Eyes:**\n• Bold eyeshadow (gold, bronze, maroon)\n• Winged eyeliner (black/brown)\n• False lashes or mascara (2-3 coats)\n• Kajal on waterline\n• Fill & define eyebrows\n\n**Lips:**\n• Red, maroon, or pink lipstick\n• Lip liner to prevent bleeding\n• Gloss for shine (optional)\n\n**Finishing:**\n• Blush (peach/pink)\n• Bindi (traditional)\n• Setting spray for 12+ hour wear\n\n**Brands:** MAC, Huda Beauty, Lakme, Maybelline\n\nYou'll look absolutely stunning! 💐✨",
-                'kn': "**ಸಾಂಪ್ರದಾಯಿಕ ಮದುವೆಯ ಮೇಕಪ್ ಮಾರ್ಗದರ್ಶಿ:** 💄✨\n\n**ಬೇಸ್:**\n• ದೀರ್ಘಕಾಲೀನ ಮೇಕಪ್ಗಾಗಿ ಪ್ರೈಮರ್\n• ಫುಲ್-ಕವರೇಜ್ ಫೌಂಡೇಶನ್\n• ಡಾರ್ಕ್ ಸರ್ಕಲ್ಸ್ಗಾಗಿ ಕನ್ಸೀಲರ್\n• ಸೆಟ್ಟಿಂಗ್ ಪೌಡರ್\n• ಕಾಂಟೂರ್ & ಹೈಲೈಟ್\n\n**ಕಣ್ಣುಗಳು:**\n• ಬೋಲ್ಡ್ ಐಶಾಡೋ (ಚಿನ್ನ, ಕಂಚು, ಮರೂನ್)\n• ವಿಂಗ್ಡ್ ಐಲೈನರ್\n• ಫಾಲ್ಸ್ ಲ್ಯಾಶಸ್ ಅಥವಾ ಮಸ್ಕಾರಾ\n• ವಾಟರ್ಲೈನ್ನಲ್ಲಿ ಕಾಜಲ್\n• ಹುಬ್ಬುಗಳನ್ನು ತುಂಬಿಸಿ\n\n**ತುಟಿಗಳು:**\n• ಕೆಂಪು, ಮರೂನ್, ಅಥವಾ ಗುಲಾಬಿ ಲಿಪ್ಸ್ಟಿಕ್\n• ಲಿಪ್ ಲೈನರ್\n• ಹೊಳಪಿಗಾಗಿ ಗ್ಲಾಸ್\n\n**ಫಿನಿಶಿಂಗ್:**\n• ಬ್ಲಶ್ (ಪೀಚ್/ಪಿಂಕ್)\n• ಬಿಂದಿ (ಸಾಂಪ್ರದಾಯಿಕ)\n• ಸೆಟ್ಟಿಂಗ್ ಸ್ಪ್ರೇ\n\n**ಬ್ರಾಂಡ್ಗಳು:** MAC, Huda Beauty, Lakme, Maybelline\n\nನೀವು ಸಂಪೂರ್ಣವಾಗಿ ಅದ್ಭುತವಾಗಿ ಕಾಣುತ್ತೀರಿ! 💐✨"
-            }
-            return responses.get(lang, responses['en'])
+    if analysis.greeting and analysis.word_count <= 3:
+        return {'response': get_greeting_response(lang)}, lang, 'greeting'
     
-    # Men's wedding outfit queries
-    if intent == 'men_wedding' or (intent == 'wedding' and any(word in query_lower for word in ['men', 'man', 'male', 'groom', 'guy'])):
-        responses = {
-            'en': "**Wedding Outfit Guide for Men:** 💍✨\n\n**Traditional:**\n• Sherwani with churidar (gold, cream, maroon)\n• Kurta pajama with Nehru jacket\n• Bandhgala suit (Indo-western)\n• Dhoti with silk kurta\n\n**Western:**\n• Three-piece suit (navy, black, grey)\n• Tuxedo with bow tie\n• Blazer with formal trousers\n\n**Accessories:**\n• Turban/Safa (for groom)\n• Mojari/Jutti or formal shoes\n• Watch, brooch, pocket square\n• Shawl or stole\n\n**Grooming:** Professional haircut, well-groomed beard, subtle cologne\n\n**Brands:** Manyavar, Mohanlal Sons, Raymond, Blackberrys\n\nLook like a king! 👑",
-            'kn': "**ಪುರುಷರಿಗೆ ಮದುವೆಯ ಉಡುಪು ಮಾರ್ಗದರ್ಶಿ:** 💍✨\n\n**ಸಾಂಪ್ರದಾಯಿಕ:**\n• ಚುರಿದಾರ್ನೊಂದಿಗೆ ಶೇರ್ವಾನಿ (ಚಿನ್ನ, ಕ್ರೀಮ್, ಮರೂನ್)\n• ನೆಹರೂ ಜಾಕೆಟ್ನೊಂದಿಗೆ ಕುರ್ತಾ ಪಜಾಮಾ\n• ಬಂಧಗಲಾ ಸೂಟ್ (ಇಂಡೋ-ವೆಸ್ಟರ್ನ್)\n• ಸಿಲ್ಕ್ ಕುರ್ತಾದೊಂದಿಗೆ ಧೋತಿ\n\n**ವೆಸ್ಟರ್ನ್:**\n• ಥ್ರೀ-ಪೀಸ್ ಸೂಟ್ (ನೇವಿ, ಕಪ್ಪು, ಬೂದು)\n• ಬೋ ಟೈನೊಂದಿಗೆ ಟಕ್ಸೆಡೋ\n• ಫಾರ್ಮಲ್ ಪ್ಯಾಂಟ್ಸ್ನೊಂದಿಗೆ ಬ್ಲೇಜರ್\n\n**ಆಕ್ಸೆಸರೀಸ್:**\n• ಟರ್ಬನ್/ಸಫಾ (ವರನಿಗೆ)\n• ಮೊಜರಿ/ಜುಟ್ಟಿ ಅಥವಾ ಫಾರ್ಮಲ್ ಶೂಸ್\n• ವಾಚ್, ಬ್ರೂಚ್, ಪಾಕೆಟ್ ಸ್ಕ್ವೇರ್\n• ಶಾಲ್ ಅಥವಾ ಸ್ಟೋಲ್\n\n**ಗ್ರೂಮಿಂಗ್:** ಪ್ರೊಫೆಷನಲ್ ಹೇರ್ಕಟ್, ಗ್ರೂಮ್ಡ್ ಬಿಯರ್ಡ್\n\n**ಬ್ರಾಂಡ್ಗಳು:** Manyavar, Mohanlal Sons, Raymond\n\nರಾಜನಂತೆ ಕಾಣಿರಿ! 👑"
-        }
-        return responses.get(lang, responses['en'])
+    if analysis.gratitude and analysis.word_count <= 5:
+        return {'response': get_gratitude_response(lang)}, lang, 'gratitude'
     
-    # Wedding outfit queries
-    if intent == 'wedding' or intent == 'wedding_continue' or any(word in query_lower for word in ['wedding', 'bridal', 'ಮದುವೆ', 'ವೆಡ್ಡಿಂಗ್']):
-        responses = {
-            'en': "**Wedding Outfit Guide:** 💍✨\n\n**For Women:**\n• Silk saree (Kanchipuram, Banarasi)\n• Lehenga choli (heavy embroidery)\n• Designer saree with embellishments\n• Colors: Red, maroon, pink, green, gold\n\n**Jewelry:** Gold temple jewelry, diamond sets, jhumkas, bangles\n**Makeup:** Bold, glamorous, traditional\n**Brands:** Nalli, Pothys, Taneira, FabIndia\n\nYou'll look stunning!",
-            'kn': "**ಮದುವೆಯ ಉಡುಪು ಮಾರ್ಗದರ್ಶಿ:** 💍✨\n\n**ಮಹಿಳೆಯರಿಗೆ:**\n• ರೇಷ್ಮೆ ಸೀರೆ (ಕಾಂಚೀಪುರಂ, ಬನಾರಸಿ)\n• ಲೆಹೆಂಗಾ ಚೋಲಿ (ಭಾರೀ ಕಸೂತಿ)\n• ಡಿಸೈನರ್ ಸೀರೆ\n• ಬಣ್ಣಗಳು: ಕೆಂಪು, ಮರೂನ್, ಗುಲಾಬಿ, ಹಸಿರು, ಚಿನ್ನ\n\n**ಆಭರಣಗಳು:** ಚಿನ್ನದ ದೇವಾಲಯ ಆಭರಣಗಳು, ವಜ್ರ ಸೆಟ್ಗಳು, ಝುಮ್ಕಾಗಳು, ಬಳೆಗಳು\n**ಮೇಕಪ್:** ದಪ್ಪ, ಆಕರ್ಷಕ, ಸಾಂಪ್ರದಾಯಿಕ\n**ಬ್ರಾಂಡ್ಗಳು:** ನಲ್ಲಿ, ಪೋತೀಸ್, ತನೀರಾ, ಫ್ಯಾಬ್ಇಂಡಿಯಾ\n\nನೀವು ಅದ್ಭುತವಾಗಿ ಕಾಣುತ್ತೀರಿ!"
-        }
-        return responses.get(lang, responses['en'])
+    if not is_fashion_related(user_message, session.history, analysis.match) and not analysis.greeting:
+        return {'response': get_out_of_scope_message(lang)}, lang, 'out_of_scope'
     
-    # Overall look queries
-    if intent == 'complete_office_look' or (any(word in query_lower for word in ['overall', 'complete', 'full', 'entire', 'whole']) and any(word in query_lower for word in ['look', 'style'])):
-        if any(word in query_lower for word in ['casual', 'office', 'work']) or context_data.get('last_intent') in ['casual_office', 'formal_office']:
-            responses = {
-                'en': "**Complete Casual Office Look:** 💼✨\n\n**Outfit:**\n• Tailored trousers with blouse/shirt\n• OR midi skirt with tucked-in top\n• Blazer (optional)\n• Colors: Navy, black, grey, white, pastels\n\n**Footwear:** Loafers, ballet flats, low heels\n\n**Accessories:**\n• Simple watch\n• Small stud earrings\n• Tote bag or structured handbag\n• Minimal necklace (optional)\n\n**Makeup:**\n• Natural foundation\n• Nude/pink lipstick\n• Light eyeshadow\n• Mascara\n• Filled eyebrows\n\n**Hair:** Neat bun, low ponytail, or loose waves\n\n**Brands:** Zara, H&M, Marks & Spencer, Westside\n\nProfessional, polished, and comfortable! 💼",
-                'kn': "**ಸಂಪೂರ್ಣ ಕ್ಯಾಶುಯಲ್ ಆಫೀಸ್ ಲುಕ್:** 💼✨\n\n**ಉಡುಪು:**\n• ಬ್ಲೌಸ್/ಶರ್ಟ್ನೊಂದಿಗೆ ಟೈಲರ್ಡ್ ಪ್ಯಾಂಟ್ಸ್\n• ಅಥವಾ ಟಾಪ್ನೊಂದಿಗೆ ಮಿಡಿ ಸ್ಕರ್ಟ್\n• ಬ್ಲೇಜರ್ (ಐಚ್ಛಿಕ)\n• ಬಣ್ಣಗಳು: ನೇವಿ, ಕಪ್ಪು, ಬೂದು, ಬಿಳಿ\n\n**ಪಾದರಕ್ಷೆ:** ಲೋಫರ್ಸ್, ಬ್ಯಾಲೆ ಫ್ಲಾಟ್ಸ್, ಲೋ ಹೀಲ್ಸ್\n\n**ಆಕ್ಸೆಸರೀಸ್:**\n• ಸಿಂಪಲ್ ವಾಚ್\n• ಸ್ಮಾಲ್ ಸ್ಟಡ್ ಇಯರ್ರಿಂಗ್ಸ್\n• ಟೋಟ್ ಬ್ಯಾಗ್\n• ಮಿನಿಮಲ್ ನೆಕ್ಲೇಸ್\n\n**ಮೇಕಪ್:**\n• ನ್ಯಾಚುರಲ್ ಫೌಂಡೇಶನ್\n• ನ್ಯೂಡ್/ಪಿಂಕ್ ಲಿಪ್ಸ್ಟಿಕ್\n• ಲೈಟ್ ಐಶಾಡೋ\n• ಮಸ್ಕಾರಾ\n• ಫಿಲ್ಡ್ ಐಬ್ರೋಸ್\n\n**ಹೇರ್:** ನೀಟ್ ಬನ್, ಲೋ ಪೋನಿಟೇಲ್\n\n**ಬ್ರಾಂಡ್ಗಳು:** Zara, H&M, Marks & Spencer\n\nಪ್ರೊಫೆಷನಲ್ ಮತ್ತು ಆರಾಮದಾಯಕ! 💼"
-            }
-            return responses.get(lang, responses['en'])
+    response = generate_fashion_response(analysis, session)
     
-    # Outfit queries
-    if 'outfit' in query_lower or 'ಉಡುಪು' in query_lower:
-        responses = {
-            'en': "I'd love to help with outfit ideas! Could you tell me the occasion? (wedding, party, casual, formal)",
-            'kn': "ಉಡುಪು ಐಡಿಯಾಗಳೊಂದಿಗೆ ಸಹಾಯ ಮಾಡಲು ನಾನು ಇಷ್ಟಪಡುತ್ತೇನೆ! ಸಂದರ್ಭವನ್ನು ಹೇಳಬಹುದೇ? (ಮದುವೆ, ಪಾರ್ಟಿ, ಕ್ಯಾಶುಯಲ್, ಫಾರ್ಮಲ್)"
-        }
-        return responses.get(lang, responses['en'])
-    
-    # Default fashion response
-    responses = {
-        'en': "I'm here to help with all your fashion, beauty, and styling needs! Feel free to ask about trends, outfit ideas, makeup tips, or any fashion advice.",
-        'kn': "ನಿಮ್ಮ ಎಲ್ಲಾ ಫ್ಯಾಷನ್, ಸೌಂದರ್ಯ ಮತ್ತು ಸ್ಟೈಲಿಂಗ್ ಅಗತ್ಯಗಳಿಗೆ ಸಹಾಯ ಮಾಡಲು ನಾನು ಇಲ್ಲಿದ್ದೇನೆ! ಟ್ರೆಂಡ್ಗಳು, ಉಡುಪು ಐಡಿಯಾಗಳು, ಮೇಕಪ್ ಸಲಹೆಗಳು ಅಥವಾ ಯಾವುದೇ ಫ್ಯಾಷನ್ ಸಲಹೆಯ ಬಗ್ಗೆ ಕೇಳಲು ಮುಕ್ತವಾಗಿರಿ."
-    }
-    return responses.get(lang, responses['en'])
+    return {'response': response, 'images': select_images(analysis, session)}, lang, session.context.last_intent
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+CONTINUE_SUFFIX = '_continue'
+
+def intent_label(intent):
+    """The intent as a metric label: each follow-up appends another "_continue"
+    to the last intent, so chains are collapsed to one to keep the series few"""
+    if intent and intent.endswith(CONTINUE_SUFFIX + CONTINUE_SUFFIX):
+        base = intent
+        while base.endswith(CONTINUE_SUFFIX):
+            base = base[:-len(CONTINUE_SUFFIX)]
+        return base + CONTINUE_SUFFIX
+    return intent
+
+def record_turn(session_id, user_message, lang, intent, seconds):
+    """Count an answered turn and append it to the event log"""
+    INTENT_COUNTS.inc(intent_label(intent))
+    if event_log is not None:
+        event_log.append(session_id, user_message, lang, intent, seconds)
+
+def process_message(user_message, session):
+    """Run one turn of the chat pipeline against a session and return the JSON payload"""
+    started = time.perf_counter()
+    payload, lang, intent = answer_message(user_message, session)
+    record_turn(session.session_id, user_message, lang, intent, time.perf_counter() - started)
+    return payload
+
+# Times a session's turns are run again when another worker saved it first
+SAVE_ATTEMPTS = 3
+
+def run_turns(session_id, messages):
+    """Answer one session's messages in order and save it once; returns the payloads.
+
+    Call inside sessions.turn(session_id). A shared backend refuses the save
+    when another worker changed the session meanwhile; the turns then run
+    again against the reloaded session, and are counted and logged once.
+    """
+    for attempt in range(SAVE_ATTEMPTS):
+        session = touch_session(session_id)
+        answered = []
+        try:
+            for user_message in messages:
+                started = time.perf_counter()
+                payload, lang, intent = answer_message(user_message, session)
+                answered.append((user_message, payload, lang, intent, time.perf_counter() - started))
+        finally:
+            saved = save_session(session)
+        if saved:
+            break
+    for user_message, payload, lang, intent, seconds in answered:
+        record_turn(session_id, user_message, lang, intent, seconds)
+    return [payload for _, payload, _, _, _ in answered]
+
+@STAGE_SECONDS.timed('session_touch')
+def touch_session(session_id):
+    return sessions.touch(session_id)
+
+@STAGE_SECONDS.timed('session_save')
+def save_session(session):
+    return sessions.save(session)
+
+EMPTY_MESSAGE_RESPONSE = {'response': 'Please ask me something about fashion or beauty!'}
+
+# Streamed responses are sent in chunks of whole lines, roughly this many characters each
+STREAM_CHUNK_CHARS = 80
+
+def iter_response_chunks(text, size=STREAM_CHUNK_CHARS):
+    """Split a response on line boundaries into chunks of about `size` characters"""
+    chunk = ''
+    for line in text.splitlines(keepends=True):
+        chunk += line
+        if len(chunk) >= size:
+            yield chunk
+            chunk = ''
+    if chunk:
+        yield chunk
+
+def sse_event(data, event=None):
+    data = json.dumps(data, ensure_ascii=False)
+    if event:
+        return f'event: {event}\ndata: {data}\n\n'
+    return f'data: {data}\n\n'
+
+def stream_payload(payload):
+    """Server-Sent Events for a /chat payload: text deltas, then a 'done' event with the rest"""
+    for chunk in iter_response_chunks(payload['response']):
+        yield sse_event({'delta': chunk})
+    yield sse_event({key: value for key, value in payload.items() if key != 'response'}, 'done')
+
+ADMISSION_ERRORS = {429: 'Too many requests, please slow down', 503: 'Server busy, please retry'}
+
+def is_new_session(session_id):
+    return session_id not in sessions
+
+def admit(turns, items=1, batch=False):
+    """None if the request may run (call admission.release() when done), else the 429/503 response"""
+    rejected = admission.admit(request.remote_addr, turns, is_new_session, items, batch)
+    if rejected is None:
+        return None
+    status, retry_after, reason = rejected
+    response = jsonify({'error': ADMISSION_ERRORS[status], 'reason': reason, 'retry_after': retry_after})
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def message_text(data):
+    """The stripped message of a request or batch item; '' when it is missing or not a string"""
+    message = data.get('message')
+    return message.strip() if isinstance(message, str) else ''
+
+def wants_stream(data):
+    return bool(data.get('stream')) or request.accept_mimetypes.best == 'text/event-stream'
 
 @app.route('/chat', methods=['POST'])
 def chat():
     data = request.json
-    user_message = data.get('message', '').strip()
+    user_message = message_text(data)
     session_id = data.get('session_id', 'default')
     
     if not user_message:
-        return jsonify({'response': 'Please ask me something about fashion or beauty!'})
-    
-    if session_id not in conversation_memory:
-        conversation_memory[session_id] = []
-    if session_id not in conversation_context:
-        conversation_context[session_id] = {}
+        return jsonify(EMPTY_MESSAGE_RESPONSE)
     
-    # Update session timestamp
-    session_timestamps[session_id] = time.time()
-    
-    # Optimize memory if needed
-    optimize_memory()
-    
-    conversation_memory[session_id].append(user_message)
-    if len(conversation_memory[session_id]) > MAX_MEMORY_SIZE:
-        conversation_memory[session_id] = conversation_memory[session_id][-MAX_MEMORY_SIZE:]
-    
-    lang = detect_language(user_message)
-    
-    if is_greeting(user_message) and len(user_message.split()) <= 3:
-        response = get_greeting_response(lang)
-        return jsonify({'response': response})
-    
-    if is_gratitude(user_message) and len(user_message.split()) <= 5:
-        response = get_gratitude_response(lang)
-        return jsonify({'response': response})
-    
-    if not is_fashion_related(user_message, conversation_memory.get(session_id, [])) and not is_greeting(user_message):
-        return jsonify({'response': get_out_of_scope_message(lang)})
-    
-    response = generate_fashion_response(user_message, lang, session_id)
-    
-    return jsonify({'response': response, 'images': []})
+    rejected = admit({session_id: 1})
+    if rejected is not None:
+        return rejected
+    try:
+        # Turns of one session run one at a time; idle sessions are expired by the background sweeper
+        with sessions.turn(session_id):
+            payload, = run_turns(session_id, [user_message])
+    finally:
+        admission.release()
+    
+    if wants_stream(data):
+        return Response(stream_payload(payload), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    return jsonify(payload)
+
+def process_session_turns(session_id, turns, payloads):
+    """Run one session's turns of a batch in order, touching and saving it once"""
+    with sessions.turn(session_id):
+        answers = run_turns(session_id, [user_message for _, user_message in turns])
+    for (position, _), payload in zip(turns, answers):
+        payloads[position] = payload
+
+def process_batch(items):
+    """Answer (session_id, message) pairs; turns stay in order per session, sessions run in parallel"""
+    payloads = [EMPTY_MESSAGE_RESPONSE] * len(items)
+    turns_by_session = {}
+    for position, (session_id, user_message) in enumerate(items):
+        if user_message:
+            turns_by_session.setdefault(session_id, []).append((position, user_message))
+    
+    if len(turns_by_session) <= 1:
+        for session_id, turns in turns_by_session.items():
+            process_session_turns(session_id, turns, payloads)
+        return payloads
+    
+    futures = [batch_executor.submit(process_session_turns, session_id, turns, payloads)
+               for session_id, turns in turns_by_session.items()]
+    for future in futures:
+        future.result()
+    return payloads
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    data = request.json
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return jsonify({'error': 'Expected a list of {session_id, message} items'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} items per batch'}), 400
+    
+    turns = []
+    for item in items:
+        session_id = item.get('session_id', 'default') if isinstance(item, dict) else None
+        if not isinstance(session_id, str):
+            return jsonify({'error': 'Expected a list of {session_id, message} items'}), 400
+        turns.append((session_id, message_text(item)))
+    
+    # Every session pays for each of its turns, as it would over /chat
+    session_turns = Counter(session_id for session_id, message in turns if message)
+    rejected = admit(session_turns, len(turns), batch=True)
+    if rejected is not None:
+        return rejected
+    try:
+        return jsonify({'responses': process_batch(turns)})
+    finally:
+        admission.release()
+
+metrics.gauge('fashionbot_sessions', 'Live conversation sessions', lambda: sessions.stats()['sessions'])
+metrics.gauge('fashionbot_stored_messages', 'Messages held in session histories', lambda: sessions.stats()['messages'])
+metrics.counter_callback('fashionbot_response_cache_total', 'Response cache lookups and evictions',
+                         lambda: {key: response_cache.stats()[key] for key in ('hits', 'misses', 'evictions')}, 'result')
+metrics.gauge('fashionbot_response_cache_size', 'Entries in the response cache', lambda: len(response_cache))
+metrics.counter_callback('fashionbot_language_detections_total', 'Language detections, by tier',
+                         lambda: LANGUAGE_DETECTOR.hits, 'tier')
+metrics.counter_callback('fashionbot_spelling_lookups_total', 'Unknown message words looked up for typos, by result',
+                         lambda: SPELLING_CORRECTOR.counts, 'result')
+
+metrics.counter_callback('fashionbot_admission_total', 'Chat requests admitted or turned away, by result',
+                         lambda: admission.counts, 'result')
+if admission.in_flight is not None:
+    metrics.gauge('fashionbot_in_flight_requests', 'Chat requests being answered', lambda: admission.in_flight.current)
+if event_log is not None:
+    metrics.counter_callback('fashionbot_event_log_total', 'Turn events queued, written and dropped by the event log',
+                             lambda: event_log.counts, 'result')
+    metrics.gauge('fashionbot_event_log_queue', 'Turn events waiting for the event log writer', lambda: len(event_log))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics.enabled:
+        return 'Metrics are disabled (METRICS=0)\n', 404, {'Content-Type': 'text/plain; charset=utf-8'}
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+warmup_status = {'ready': not WARMUP_ENABLED, 'seconds': None if WARMUP_ENABLED else 0.0}
+_warmup_lock = threading.Lock()
+_warmup_thread = None
+
+def warm_up():
+    """Load what the first /chat turn would otherwise load lazily, then report ready"""
+    started = time.perf_counter()
+    if WARMUP_ENABLED:
+        LANGUAGE_DETECTOR.load()
+    warmup_status['seconds'] = time.perf_counter() - started
+    warmup_status['ready'] = True
+
+def start_warm_up():
+    """Warm up in the background (once per process), so a worker can bind and
+    answer /ready (503 until done) straight away.
+
+    Called by the servers, not on import: scripts that only import app
+    (benchmarks, classify.py, event log replay) get no stray thread.
+    """
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=warm_up, name='warm-up', daemon=True)
+            _warmup_thread.start()
+    return _warmup_thread
+
+@app.route('/ready')
+def ready():
+    if not warmup_status['ready']:
+        start_warm_up()  # Served by something other than serve.py: the first probe starts it
+        return jsonify({'status': 'warming_up'}), 503
+    return jsonify({'status': 'ready', 'warmup_seconds': round(warmup_status['seconds'], 3)})
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Development server only; use serve.py in production
+    start_warm_up()
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,87 @@
+"""Offline classification (classify.py): lines/s per worker count, peak memory vs input size.
+
+Writes seeded conversations (as in loadtest.py) to a temporary JSONL dump,
+with the turns of concurrent sessions interleaved, and runs classify.py on
+it for 1 worker and for one per CPU, then on a dump four times as long.
+Reports lines/s and the peak resident memory of the whole process tree,
+and checks that every worker count writes the same results.
+
+    python benchmarks/bench_classify.py [lines]
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import ROOT, build_conversations, parse_queries, process_tree, rss_bytes  # noqa: E402
+
+
+def write_dump(path, lines, seed=7):
+    """About `lines` turns; up to 50 sessions are open at a time and their turns interleave"""
+    rnd = random.Random(seed)
+    queries = [query for query in parse_queries() if query[1]]
+    pending = [(session_id, list(turns)) for session_id, turns in build_conversations(lines, seed, queries)]
+    pending.reverse()
+    active = []
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < lines and (pending or active):
+            while len(active) < 50 and pending:
+                active.append(pending.pop())
+            session_id, turns = conversation = rnd.choice(active)
+            f.write(json.dumps({'session_id': session_id, 'message': turns.pop(0)}, ensure_ascii=False) + '\n')
+            written += 1
+            if not turns:
+                active.remove(conversation)
+    return written
+
+
+def classify(dump, output, workers):
+    """(seconds, peak RSS of classify.py and its workers in bytes)"""
+    command = [sys.executable, 'classify.py', dump, '-o', output, '--workers', str(workers)]
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=ROOT, stderr=subprocess.DEVNULL)
+    peak = [0]
+
+    def sample():
+        while proc.poll() is None:
+            peak[0] = max(peak[0], rss_bytes(process_tree(proc.pid)) or 0)
+            time.sleep(0.05)
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    proc.wait()
+    sampler.join()
+    if proc.returncode:
+        raise RuntimeError('classify.py exited with %d' % proc.returncode)
+    return time.perf_counter() - start, peak[0]
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    cpus = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (lines, lines * 4):
+            dump = os.path.join(tmp, 'dump-%d.jsonl' % size)
+            count = write_dump(dump, size)
+            outputs = []
+            for workers in sorted({1, cpus, max(2, cpus)}):
+                output = os.path.join(tmp, 'out-%d-%d.jsonl' % (size, workers))
+                seconds, peak = classify(dump, output, workers)
+                outputs.append(output)
+                print('%7d lines, %2d workers: %.2f s, %.0f lines/s, peak RSS %.1f MB'
+                      % (count, workers, seconds, count / seconds, peak / 1e6))
+            with open(outputs[0], 'rb') as f:
+                first = f.read()
+            same = all(open(output, 'rb').read() == first for output in outputs[1:])
+            print('  results identical for every worker count: %s' % same)
+
+
+if __name__ == '__main__':
+    main()
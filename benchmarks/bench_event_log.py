@@ -0,0 +1,112 @@
+"""Event log: cost of append() on the request path, writer throughput, overload and read-back.
+
+Reports, with the log under a temporary directory:
+
+- append() latency (p50/p99/p99.9) while the writer drains, and how fast the
+  writer gets events to disk for each fsync mode
+- a burst far larger than the queue: events dropped, and append() latency
+  (it must never wait on the disk)
+- /chat p50/p99 with the log off and on (Flask test client)
+- rotation by size and read_events(): every written event read back, in order
+
+    python benchmarks/bench_event_log.py [events]
+"""
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('METRICS', '0')
+os.environ.setdefault('WARMUP', '0')
+os.environ.setdefault('ADMISSION_CONTROL', '0')
+os.environ['EVENT_LOG_DIR'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from event_log import EventLog, log_files, read_events
+
+MESSAGES = ['what should I wear to the office', 'red', 'party outfit ideas', 'wedding outfit',
+            'blue formal shirt', 'thanks', 'what is the capital of france', 'makeup for a party']
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def append_events(log, count):
+    latencies = []
+    for number in range(count):
+        message = MESSAGES[number % len(MESSAGES)]
+        start = time.perf_counter()
+        log.append('session-%d' % (number % 500), message, 'en', 'general', 0.0004)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def writer_throughput(directory, count, fsync):
+    log = EventLog(directory, max_queue=count, fsync=fsync)
+    start = time.perf_counter()
+    latencies = append_events(log, count)
+    log.close()
+    seconds = time.perf_counter() - start
+    return latencies, count / seconds, log.stats()
+
+
+def chat_latency(turns):
+    client = app.app.test_client()
+    latencies = []
+    for number in range(turns):
+        start = time.perf_counter()
+        client.post('/chat', json={'message': MESSAGES[number % len(MESSAGES)], 'session_id': 'bench-%d' % (number % 50)})
+        latencies.append(time.perf_counter() - start)
+    return percentile(latencies, 0.5) * 1e3, percentile(latencies, 0.99) * 1e3
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with tempfile.TemporaryDirectory() as tmp:
+        for fsync in ('never', 'rotate', 'batch'):
+            latencies, rate, stats = writer_throughput(os.path.join(tmp, fsync), count, fsync)
+            # The rare slow appends wait for the GIL while the writer encodes a batch
+            print('fsync=%-6s append p50 %.2f us, p99 %.2f us, p99.9 %.1f us, %d over 1 ms; '
+                  '%d written in %d batches, %.0f events/s'
+                  % (fsync, percentile(latencies, 0.5) * 1e6, percentile(latencies, 0.99) * 1e6,
+                     percentile(latencies, 0.999) * 1e6, sum(latency > 1e-3 for latency in latencies),
+                     stats['written'], stats['batches'], rate))
+
+        log = EventLog(os.path.join(tmp, 'burst'), max_queue=1000, flush_interval=0.2)
+        latencies = append_events(log, count)
+        log.close()
+        stats = log.stats()
+        print('burst of %d into a 1000-event queue: %d written, %d dropped, append p99.9 %.1f us'
+              % (count, stats['written'], stats['dropped'], percentile(latencies, 0.999) * 1e6))
+
+        turns = 3000
+        chat_latency(500)  # Loads langdetect and fills the response cache
+        off = chat_latency(turns)
+        app.event_log = EventLog(os.path.join(tmp, 'chat'))
+        on = chat_latency(turns)
+        app.event_log.close()
+        print('/chat p50/p99: log off %.3f/%.3f ms, on %.3f/%.3f ms (%d events written)'
+              % (off + on + (app.event_log.stats()['written'],)))
+        app.event_log = None
+
+        directory = os.path.join(tmp, 'rotated')
+        log = EventLog(directory, max_queue=count, max_bytes=1024 * 1024)
+        append_events(log, count)
+        log.close()
+        start = time.perf_counter()
+        read = 0
+        ordered = True
+        previous = 0.0
+        for event in read_events(directory):
+            read += 1
+            ordered = ordered and event['ts'] >= previous
+            previous = event['ts']
+        print('rotated into %d files of <= 1 MB; read back %d/%d events in %.2f s, in order: %s'
+              % (len(log_files(directory)), read, log.stats()['written'], time.perf_counter() - start, ordered))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Conversation history: memory and per-turn relevance-check latency.
+
+Builds 1000 sessions with long histories the old way (a list of raw strings,
+relevance checked by joining and scanning the last CONTEXT_WINDOW messages)
+and the new way (ConversationHistory ring buffer with a running topic count).
+
+    python benchmarks/bench_history.py [sessions] [messages_per_session]
+"""
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from session_store import ConversationHistory
+
+TURNS = ['what should I wear to the office', 'red', 'formal', 'how is the weather today',
+         'makeup for a wedding', 'ok tell me more', 'for men', 'capital of france',
+         'ಮದುವೆ ಸೀರೆ', 'thanks']
+
+
+def messages(count, seed):
+    rnd = random.Random(seed)
+    # Distinct string objects, like real request bodies
+    return [rnd.choice(TURNS) + ' %d' % i for i in range(count)]
+
+
+def legacy_is_fashion_related(text, context):
+    if context:
+        last_messages = ' '.join(context[-app.CONTEXT_WINDOW:]).lower()
+        if any(k in last_messages for k in app.CONTEXT_TOPIC_WORDS):
+            if len(text.lower().split()) <= 30:
+                return True
+    return any(k in text.lower() for k in app.FASHION_KEYWORDS)
+
+
+def build(kind, sessions, per_session):
+    store = []
+    for s in range(sessions):
+        if kind == 'legacy':
+            history = []
+            for message in messages(per_session, s):
+                history.append(message)
+                if len(history) > app.MAX_MEMORY_SIZE:
+                    history = history[-app.MAX_MEMORY_SIZE:]
+        else:
+            history = ConversationHistory(app.MAX_MEMORY_SIZE, app.CONTEXT_WINDOW)
+            for message in messages(per_session, s):
+                history.append(message, app.TOPIC_FEATURES.mask(app.scan_message(message).category('topic')))
+        store.append(history)
+    return store
+
+
+def measure(kind, sessions, per_session):
+    tracemalloc.start()
+    store = build(kind, sessions, per_session)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    text = 'how is the weather today'
+    if kind == 'legacy':
+        check = lambda: [legacy_is_fashion_related(text, h) for h in store]
+    else:
+        match = app.scan_message(text)
+        check = lambda: [app.is_fashion_related(text, h, match) for h in store]
+    seconds = min(timeit.repeat(check, number=3, repeat=3)) / 3 / sessions
+    return current, seconds
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    per_session = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    print(f"{sessions} sessions x {per_session} messages")
+    for kind in ('legacy', 'ring buffer'):
+        memory, seconds = measure(kind, sessions, per_session)
+        print(f"  {kind:12s} memory {memory / 2**20:8.1f} MiB   relevance check {seconds * 1e6:8.2f} us/turn")
+
+
+if __name__ == '__main__':
+    main()
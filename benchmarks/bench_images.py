@@ -0,0 +1,103 @@
+"""Image catalog: build, index load, selection cost and end-to-end turn latency.
+
+Builds a synthetic catalog (Pillow-generated images under intent
+directories, named after colours) in a temporary directory, then reports
+the build time, the time to map the index, select() per call and
+process_message with the catalog off vs on. Also checks that no session is
+ever sent the same image twice.
+
+    python benchmarks/bench_images.py [images_per_intent] [turns]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+
+os.environ.setdefault('METRICS', '0')
+os.environ.setdefault('WARMUP', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import app
+import image_catalog
+from image_catalog import ImageCatalog, pair_key
+
+INTENTS = ('formal_office', 'casual_office', 'party', 'wedding', 'festival', 'general',
+           'color_styling_office', 'saree_styling')
+COLOURS = ('black', 'blue', 'gold', 'green', 'maroon', 'navy', 'pink', 'red', 'white', 'yellow')
+MESSAGES = ['what should I wear to the office', 'red', 'party outfit ideas', 'wedding outfit',
+            'blue formal shirt', 'navy blazer for office', 'festival look in gold', 'ok tell me more',
+            'something in green', 'kanchipuram saree']
+
+
+def make_images(directory, per_intent):
+    rnd = random.Random(7)
+    for intent in INTENTS:
+        os.makedirs(os.path.join(directory, intent), exist_ok=True)
+        for number in range(per_intent):
+            colour = COLOURS[number % len(COLOURS)]
+            image = Image.new('RGB', (480, 720), tuple(rnd.randrange(256) for _ in range(3)))
+            image.save(os.path.join(directory, intent, '%s-look-%d.jpg' % (colour, number)), quality=85)
+
+
+def run_turns(turns, session_prefix):
+    rnd = random.Random(3)
+    sent = {}
+    repeats = 0
+    images = 0
+    start = time.perf_counter()
+    for turn in range(turns):
+        session_id = '%s-%d' % (session_prefix, rnd.randrange(50))
+        session = app.sessions.touch(session_id)
+        payload = app.process_message(rnd.choice(MESSAGES), session)
+        seen = sent.setdefault(session_id, set())
+        for image in payload.get('images', ()):
+            repeats += image['src'] in seen
+            seen.add(image['src'])
+            images += 1
+    return (time.perf_counter() - start) / turns * 1e6, images, repeats
+
+
+def main():
+    per_intent = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        make_images(tmp, per_intent)
+        start = time.perf_counter()
+        count = image_catalog.build(tmp)
+        built = time.perf_counter() - start
+        size = os.path.getsize(os.path.join(tmp, image_catalog.INDEX_NAME))
+        print('%d images, build (thumbnails + index) %.2f s, index %d bytes' % (count, built, size))
+
+        number = 200
+        load = min(timeit.repeat(lambda: ImageCatalog(tmp).close(), number=number, repeat=3)) / number
+        print('index load %.1f us' % (load * 1e6))
+
+        catalog = ImageCatalog(tmp)
+        keys = [pair_key('formal_office', 'navy'), 'formal_office', 'office']
+        number = 100000
+        fresh = min(timeit.repeat(lambda: catalog.select(keys, bytearray()), number=number, repeat=3)) / number
+        # A session that has already seen most of the intent's images scans further
+        # (select marks the bitset in place, so each call gets a copy)
+        shown = bytearray()
+        catalog.select(['formal_office'], shown, count=per_intent - 5, max_scan=per_intent)
+        seen = min(timeit.repeat(lambda: catalog.select(keys, bytearray(shown)), number=number, repeat=3)) / number
+        print('select: new session %.2f us, after %d shown %.2f us' % (fresh * 1e6, per_intent - 5, seen * 1e6))
+
+        run_turns(turns, 'warmup')  # Loads langdetect and fills the response cache
+        off_us, _, _ = run_turns(turns, 'off')
+        app.image_catalog = catalog
+        on_us, images, repeats = run_turns(turns, 'on')
+        print('process_message: catalog off %.1f us/turn, on %.1f us/turn (%d images sent, %d repeats)'
+              % (off_us, on_us, images, repeats))
+        catalog.close()
+    if repeats:
+        print('FAILED: a session was sent the same image twice')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Keyword links over long keyword histories: substring loops vs the group bitmask index.
+
+For each history length, links the same current keywords against the same
+history with the original nested loop (current x previous x group x group
+word substring tests) and with find_keyword_links over interned IDs, checks
+both find the same groups, and prints time per call. Then times resolving
+unseen tokens ("weddings") to group masks by looping over KEYWORD_GROUPS vs
+KEYWORD_GROUP_INDEX.
+
+    python benchmarks/bench_keyword_links.py [repeats]
+"""
+import os
+import random
+import sys
+import timeit
+
+os.environ.setdefault('METRICS', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from keyword_matcher import KeywordGroupIndex
+
+HISTORY_LENGTHS = (15, 50, 200, 1000, 5000)
+SUFFIXES = ('', '', '', 's', 'es', 'ish', 'y', '!')
+
+
+def legacy_find_keyword_links(current_keywords, prev_keywords):
+    links = []
+    for current_kw in current_keywords:
+        for prev_kw in prev_keywords:
+            for group_name, group_words in app.KEYWORD_GROUPS.items():
+                if any(gw in current_kw for gw in group_words) and any(gw in prev_kw for gw in group_words):
+                    links.append(group_name)
+                    break
+    return list(set(links))
+
+
+def legacy_group_mask(keyword):
+    mask = 0
+    for bit, group_words in enumerate(app.KEYWORD_GROUPS.values()):
+        if any(gw in keyword for gw in group_words):
+            mask |= 1 << bit
+    return mask
+
+
+def keywords(count, rnd):
+    return [rnd.choice(app.IMPORTANT_WORDS) + rnd.choice(SUFFIXES) for _ in range(count)]
+
+
+def per_call(func, repeats):
+    number = max(1, repeats)
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rnd = random.Random(0)
+    current = keywords(4, rnd)
+    current_ids = tuple(map(app.KEYWORD_IDS.key, current))
+    print('%d current keywords, best of 3' % len(current))
+    print('%8s  %12s  %12s  %8s  %s' % ('history', 'loops', 'bitmask', 'speedup', 'same links'))
+    for length in HISTORY_LENGTHS:
+        history = keywords(length, rnd)
+        history_ids = tuple(map(app.KEYWORD_IDS.key, history))
+        legacy = legacy_find_keyword_links(current, history)
+        links = app.find_keyword_links(current_ids, history_ids)
+        same = sorted(legacy) == sorted(app.STATE_CODEC.link_names(links))
+        loop_s = per_call(lambda: legacy_find_keyword_links(current, history), max(1, repeats * 15 // length))
+        mask_s = per_call(lambda: app.find_keyword_links(current_ids, history_ids), repeats * 50)
+        print('%8d  %9.1f us  %9.1f us  %7.0fx  %s' % (length, loop_s * 1e6, mask_s * 1e6, loop_s / mask_s, same))
+        if not same:
+            sys.exit(1)
+
+    tokens = list({token for token in keywords(5000, rnd)})
+    index = KeywordGroupIndex(app.KEYWORD_GROUPS, known=app.IMPORTANT_WORDS)
+    same = all(legacy_group_mask(token) == index.mask(token) for token in tokens)
+    loop_s = per_call(lambda: [legacy_group_mask(token) for token in tokens], 1) / len(tokens)
+    cold = KeywordGroupIndex(app.KEYWORD_GROUPS, known=app.IMPORTANT_WORDS, memo_size=0)
+    scan_s = per_call(lambda: [cold.mask(token) for token in tokens], 1) / len(tokens)
+    warm_s = per_call(lambda: [index.mask(token) for token in tokens], 5) / len(tokens)
+    print('token -> group mask (%d distinct tokens, same masks: %s)' % (len(tokens), same))
+    print('  group loops %6.2f us   index scan %6.2f us   index memoized %6.2f us'
+          % (loop_s * 1e6, scan_s * 1e6, warm_s * 1e6))
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Knowledge-base retrieval: build, incremental rebuild and query latency at scale.
+
+Generates `tips` synthetic tips (sentences recombined from the words of the
+real knowledge/en files) in 100 files under a temporary directory, then
+reports the cold build, a rebuild from the cache with nothing changed, a
+rebuild after one file changed, and per-query latency (p50/p99/max) for
+queries drawn from the same vocabulary. Queries go straight to TipIndex, so
+the KnowledgeBase memo does not hide the cost.
+
+    python benchmarks/bench_knowledge.py [tips] [queries]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_base import WORD, build_index, read_tips
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FILES = 100
+
+
+def vocabulary():
+    words = []
+    directory = os.path.join(ROOT, 'knowledge', 'en')
+    for name in sorted(os.listdir(directory)):
+        for title, tip in read_tips(os.path.join(directory, name)):
+            words.extend(WORD.findall(tip.lower()))
+    return words
+
+
+def write_corpus(directory, tips, words, rnd):
+    per_file = tips // FILES
+    for number in range(FILES):
+        with open(os.path.join(directory, 'topic%03d.md' % number), 'w', encoding='utf-8') as f:
+            f.write('# Topic %d\n\n' % number)
+            for _ in range(per_file):
+                f.write(' '.join(rnd.choice(words) for _ in range(rnd.randint(15, 40))) + '.\n\n')
+    return per_file * FILES
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    tips = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rnd = random.Random(5)
+    words = vocabulary()
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, 'en')
+        os.makedirs(corpus)
+        tips = write_corpus(corpus, tips, words, rnd)
+        cache = os.path.join(tmp, 'cache', 'en.npz')
+
+        cold, index = timed(lambda: build_index(corpus, cache))
+        warm, _ = timed(lambda: build_index(corpus, cache))
+        with open(os.path.join(corpus, 'topic000.md'), 'a', encoding='utf-8') as f:
+            f.write('Pair a navy blazer with white sneakers for a relaxed office look.\n')
+        incremental, index = timed(lambda: build_index(corpus, cache))
+        print('%d tips in %d files: cold build %.2f s, cached %.2f s, one file changed %.2f s, cache %.1f MB'
+              % (len(index), FILES, cold, warm, incremental, os.path.getsize(cache) / 1e6))
+
+        queries = [' '.join(rnd.choice(words) for _ in range(rnd.randint(2, 12))) for _ in range(count)]
+        for query in queries[:50]:
+            index.search(query)
+        latencies = []
+        found = 0
+        for query in queries:
+            start = time.perf_counter()
+            found += bool(index.search(query))
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print('%d queries (2-12 words): p50 %.2f ms, p99 %.2f ms, max %.2f ms; %d with results'
+              % (count, latencies[len(latencies) // 2] * 1e3, latencies[int(len(latencies) * 0.99)] * 1e3,
+                 latencies[-1] * 1e3, found))
+        # The appended tip is the last one of the first file
+        print('edited tip retrieved:', index.search('navy blazer white sneakers relaxed office')[0][0] == tips // FILES)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Language detection tiers: hit rates and latency saved.
+
+Replays the queries in test_queries.md (plus the short single-keyword turns
+that dominate real traffic) twice through the tiered detector, then compares
+against calling seeded langdetect on every message.
+
+    python benchmarks/bench_language.py
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from langdetect import detect
+from langdetect.lang_detect_exception import LangDetectException
+
+from language_detector import LanguageDetector
+import app
+
+SHORT_TURNS = ['formal', 'red', 'makeup', 'for men', 'wedding outfit', 'casual', 'ಮದುವೆ', 'ಮೇಕಪ್',
+               'party makeup', 'saree', 'green', 'yes', 'smart casual', 'complete look']
+
+
+def load_queries():
+    queries = []
+    with open(os.path.join(ROOT, 'test_queries.md'), encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('- ') and not line.startswith('- ['):
+                queries.append(line[2:])
+    return queries
+
+
+def plain_langdetect(text):
+    try:
+        return detect(text)
+    except LangDetectException:
+        return 'en'
+
+
+def main():
+    messages = (load_queries() + SHORT_TURNS * 5) * 2
+    detector = LanguageDetector(app.KEYWORD_MATCHER.vocabulary)
+    plain_langdetect('warm up')
+
+    start = time.perf_counter()
+    for text in messages:
+        plain_langdetect(text)
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text in messages:
+        detector.detect(text)
+    tiered = time.perf_counter() - start
+
+    stats = detector.stats()
+    print(f"messages: {stats['total']}")
+    for tier, rate in stats['hit_rates'].items():
+        print(f"  {tier:11s} {stats['hits'][tier]:5d}  {rate:6.1%}")
+    print(f"langdetect every message: {baseline * 1000:8.1f} ms ({baseline / len(messages) * 1e6:7.1f} us/msg)")
+    print(f"tiered detector:          {tiered * 1000:8.1f} ms ({tiered / len(messages) * 1e6:7.1f} us/msg)")
+    print(f"estimated saved by fast tiers: {stats['estimated_ms_saved']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Micro-benchmark: per-message keyword classification cost.
+
+Compares the previous approach (one substring scan per vocabulary entry, per
+classifier) against a single KEYWORD_MATCHER pass shared by all classifiers.
+
+    python benchmarks/bench_matcher.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+SHORT = "red wedding saree"
+LONG = ("I'm going to a wedding next month and I have no idea what to wear outdoors "
+        "in summer, I have a blue dress but need help with accessories shoes and makeup")
+
+
+def legacy_classify(text):
+    """The pre-matcher scans: every classifier re-lowercases and substring-scans"""
+    text_lower = text.lower()
+    greeting = any(g in text_lower for g in app.GREETING_KEYWORDS)
+    gratitude = any(g in text_lower for g in app.GRATITUDE_KEYWORDS)
+    fashion = any(k in text_lower for k in app.FASHION_KEYWORDS)
+    keywords = [w for w in text_lower.split()
+                if w in app.IMPORTANT_WORDS or any(kw in w for kw in app.IMPORTANT_WORDS)]
+    return greeting, gratitude, fashion, keywords
+
+
+def matcher_classify(text):
+    match = app.scan_message(text)
+    return (app.is_greeting(text, match), app.is_gratitude(text, match),
+            match.has('fashion'), app.extract_keywords(text, match))
+
+
+def bench(fn, text, number=2000):
+    return min(timeit.repeat(lambda: fn(text), number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    for label, text in (('short (3 words)', SHORT), ('long (%d words)' % len(LONG.split()), LONG)):
+        assert legacy_classify(text) == matcher_classify(text)
+        before = bench(legacy_classify, text)
+        after = bench(matcher_classify, text)
+        intent = bench(lambda t: app.extract_intent(t, app.STATE_CODEC.new(), app.scan_message(t)), text)
+        print(f"{label:18s} before {before:8.1f} us   after {after:8.1f} us   "
+              f"speedup {before / after:4.1f}x   scan+extract_intent {intent:8.1f} us")
+
+
+if __name__ == '__main__':
+    main()
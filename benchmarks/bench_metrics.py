@@ -0,0 +1,65 @@
+"""Cost of per-stage instrumentation: METRICS=0 vs METRICS=1.
+
+Runs the same turns through process_message in a fresh interpreter per mode
+(the switch is read at import time) with the response cache off, so every
+stage runs on every turn.
+
+    python benchmarks/bench_metrics.py [turns] [repeats]
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = r'''
+import json, random, sys, time, timeit
+sys.path.insert(0, sys.argv[1])
+import app
+from session_store import SessionStore
+
+turns, repeats = int(sys.argv[2]), int(sys.argv[3])
+messages = ['formal', 'makeup', 'red', 'for men', 'wedding outfit', 'office wear', 'hello',
+            'thanks', 'kanchipuram saree', 'green', 'capital of france', 'party makeup']
+rnd = random.Random(0)
+script = [('s%d' % rnd.randrange(100), rnd.choice(messages)) for _ in range(turns)]
+
+def run():
+    store = SessionStore(1000, 3600, app.MAX_MEMORY_SIZE, app.CONTEXT_WINDOW, context_codec=app.STATE_CODEC)
+    start = time.perf_counter()
+    for session_id, message in script:
+        app.process_message(message, store.touch(session_id))
+    return time.perf_counter() - start
+
+run()
+best = min(run() for _ in range(repeats))
+instrumented = app.STAGE_SECONDS.stages
+inc = min(timeit.repeat(lambda: app.INTENT_COUNTS.inc('wedding'), number=100000, repeat=5)) / 100000
+print(json.dumps({'us_per_turn': best / turns * 1e6, 'wrapped': instrumented, 'inc_ns': inc * 1e9}))
+'''
+
+
+def measure(enabled, turns, repeats):
+    env = dict(os.environ, METRICS='1' if enabled else '0', RESPONSE_CACHE_SIZE='0')
+    out = subprocess.run([sys.executable, '-c', WORKER, ROOT, str(turns), str(repeats)],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    off = measure(False, turns, repeats)
+    on = measure(True, turns, repeats)
+    print('%d turns, best of %d, response cache off' % (turns, repeats))
+    print('METRICS=0  %6.1f us/turn  wrapped stages: %s  counter inc: %.0f ns'
+          % (off['us_per_turn'], off['wrapped'] or 'none', off['inc_ns']))
+    print('METRICS=1  %6.1f us/turn  wrapped stages: %s  counter inc: %.0f ns'
+          % (on['us_per_turn'], ', '.join(on['wrapped']), on['inc_ns']))
+    print('instrumentation cost: %+.1f us/turn (%+.1f%%)'
+          % (on['us_per_turn'] - off['us_per_turn'], (on['us_per_turn'] / off['us_per_turn'] - 1) * 100))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Response cache: per-turn latency and hit rate on repetitive short-turn traffic.
+
+Replays the same random conversations through process_message with the cache
+disabled and enabled, checks every reply and the final session contexts
+match, and prints turn latency and the cache counters. A few fixed
+two-session cases whose contexts differ only after spelling correction are
+checked the same way. Exits 1 on any difference.
+
+    python benchmarks/bench_response_cache.py [turns] [sessions]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from response_cache import ResponseCache
+from session_store import SessionStore
+
+# Skewed towards the short follow-ups that dominate real traffic
+TURNS = ['formal', 'makeup', 'red', 'for men', 'wedding outfit', 'office wear', 'casual',
+         'party', 'saree', 'green', 'yes', 'thanks', 'hello', 'bridal makeup',
+         'what should I wear to the office tomorrow', 'kanchipuram saree for my sister',
+         'ಮದುವೆ ಸೀರೆ', 'Formal', 'capital of france']
+WEIGHTS = [12, 10, 10, 8, 8, 6, 6, 5, 5, 4, 4, 3, 3, 2, 1, 1, 2, 1, 1]
+
+
+def conversation(turns, session_count, seed=0):
+    rnd = random.Random(seed)
+    return [('s%d' % rnd.randrange(session_count), rnd.choices(TURNS, WEIGHTS)[0]) for _ in range(turns)]
+
+
+def replay(turns, cache_size):
+    app.response_cache = ResponseCache(cache_size)
+    store = SessionStore(len(turns), app.INACTIVE_SESSION_TIMEOUT, app.MAX_MEMORY_SIZE, app.CONTEXT_WINDOW,
+                         context_codec=app.STATE_CODEC)
+    replies = []
+    start = time.perf_counter()
+    for session_id, message in turns:
+        replies.append(app.process_message(message, store.touch(session_id)))
+    elapsed = time.perf_counter() - start
+    contexts = {session_id: store.get(session_id).context.to_dict() for session_id, _ in turns}
+    return elapsed, replies, contexts, app.response_cache.stats()
+
+
+# Turns whose cache keys must differ: after a misspelt keyword the context only
+# matches once the text is corrected ("need weding" continues "wedding outfit",
+# not "bridal outfit"), so the key has to be built from the corrected text
+CONTEXT_CASES = [
+    [('a', 'wedding outfit'), ('b', 'bridal outfit'), ('a', 'need weding'), ('b', 'need weding'),
+     ('a', 'for men'), ('b', 'for men')],
+]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    session_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    turns = conversation(count, session_count)
+    replay(turns[:2000], 0)  # Warm language detection and rule caches
+    base, base_replies, base_contexts, _ = replay(turns, 0)
+    cached, replies, contexts, stats = replay(turns, app.RESPONSE_CACHE_SIZE)
+    same = replies == base_replies and contexts == base_contexts
+    for case in CONTEXT_CASES:
+        _, case_base, case_base_contexts, _ = replay(case, 0)
+        _, case_cached, case_contexts, _ = replay(case, app.RESPONSE_CACHE_SIZE)
+        if case_cached != case_base or case_contexts != case_base_contexts:
+            print('cached replies differ for %s' % ', '.join('%s: %r' % turn for turn in case))
+            same = False
+    print('%d turns, %d sessions, outputs identical: %s' % (count, session_count, same))
+    print('no cache   %6.1f us/turn' % (base / count * 1e6))
+    print('cache      %6.1f us/turn  (%.1fx)' % (cached / count * 1e6, base / cached))
+    print('hit rate %.1f%%, size %d/%d, evictions %d'
+          % (stats['hit_rate'] * 100, stats['size'], stats['max_size'], stats['evictions']))
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
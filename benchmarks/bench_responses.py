@@ -0,0 +1,75 @@
+"""Response catalogs: compile and map cost per language, lookup cost and per-process memory.
+
+Copies locales/ into a temporary directory, then reports for every language
+the cold compile + map and the map of an already compiled catalog, the cost
+of get() for a text in the language, a fallback to English and a language
+without a catalog, and (on Linux) the process's private memory before and
+after loading every language.
+
+    python benchmarks/bench_responses.py [lookups]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_catalog import ResponseCatalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def private_kb():
+    """Private (unshared) memory of this process in kB, or None off Linux"""
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            return sum(int(line.split()[1]) for line in f if line.startswith(('Private_Clean', 'Private_Dirty')))
+    except OSError:
+        return None
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - start) * 1e3, result
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with tempfile.TemporaryDirectory() as tmp:
+        locales = os.path.join(tmp, 'locales')
+        shutil.copytree(os.path.join(ROOT, 'locales'), locales)
+        cache = os.path.join(tmp, 'cache')
+
+        cold_ms, catalog = timed(lambda: ResponseCatalog(locales, cache))
+        languages = catalog.languages()
+        print('languages: %s; English compiled and mapped in %.2f ms' % (' '.join(languages), cold_ms))
+        for lang in languages:
+            if lang == catalog.default_lang:
+                continue
+            cold_ms, compiled = timed(lambda: catalog.catalog(lang))
+            warm_ms, _ = timed(lambda: ResponseCatalog(locales, cache).catalog(lang))
+            print('  %s: %d responses, %d bytes compiled; first use %.2f ms, already compiled (fresh catalog) %.2f ms'
+                  % (lang, len(compiled), os.path.getsize(os.path.join(cache, lang + '.cat')), cold_ms, warm_ms))
+
+        catalog = ResponseCatalog(locales, cache)
+        before = private_kb()
+        for lang in languages:
+            for key in ('greeting', 'default', 'wedding'):
+                catalog.get(key, lang)
+        after = private_kb()
+        if before is not None:
+            print('private memory for loading every language: %d kB' % (after - before))
+
+        for label, key, lang in (('text in its language', 'greeting', 'kn'),
+                                 ('id missing, English fallback', 'wedding', 'es'),
+                                 ('language without a catalog', 'wedding', 'ja')):
+            seconds = min(timeit.repeat(lambda: catalog.get(key, lang), number=number, repeat=3)) / number
+            print('get(), %s: %.0f ns' % (label, seconds * 1e9))
+
+
+if __name__ == '__main__':
+    main()
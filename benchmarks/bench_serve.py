@@ -0,0 +1,119 @@
+"""/chat throughput: Werkzeug dev server (app.run(debug=True)) vs serve.py.
+
+Starts each server on a free port, then drives POST /chat from client threads
+over keep-alive connections with a mix of multi-turn conversations.
+
+    python benchmarks/bench_serve.py [requests] [clients] [workers] [threads]
+"""
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Raw throughput: admission control would reject most of a single client's traffic
+os.environ.setdefault('ADMISSION_CONTROL', '0')
+
+TURNS = ['what should I wear to the office', 'red', 'formal', 'makeup for a wedding',
+         'ok tell me more', 'for men', 'party outfit ideas', 'kanchipuram saree',
+         'ಮದುವೆ ಸೀರೆ', 'thanks']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(port, timeout=30):
+    """Wait until the server answers /ready with 200 (warm-up done)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=0.5)
+            conn.request('GET', '/ready')
+            status = conn.getresponse().status
+            conn.close()
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError('server did not become ready on port %d' % port)
+
+
+def client(port, count, offset, latencies, errors):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    for i in range(count):
+        body = json.dumps({'message': TURNS[(offset + i) % len(TURNS)],
+                           'session_id': 'bench-%d-%d' % (offset, i // len(TURNS))})
+        start = time.perf_counter()
+        try:
+            conn.request('POST', '/chat', body, {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as exc:
+            errors.append(repr(exc))
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def run(name, command, env, requests, clients):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), **env)
+    proc = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        wait_ready(port)
+        # Warm up imports, language models and caches in every worker
+        client(port, 50, 0, [], [])
+        latencies, errors = [], []
+        per_client = requests // clients
+        threads = [threading.Thread(target=client, args=(port, per_client, n * 7, latencies, errors))
+                   for n in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        os.killpg(proc.pid, 15)
+        proc.wait()
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    print('%-34s %8.0f req/s   p50 %6.1f ms   p99 %6.1f ms   errors %d'
+          % (name, len(latencies) / elapsed, p50, p99, len(errors)))
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    workers = sys.argv[3] if len(sys.argv) > 3 else str(os.cpu_count())
+    threads = sys.argv[4] if len(sys.argv) > 4 else '4'
+    print('%d requests from %d keep-alive clients, %d CPU(s)' % (requests, clients, os.cpu_count()))
+    run('dev server (debug=True)', [sys.executable, 'app.py'], {'FLASK_DEBUG': '1'}, requests, clients)
+    with tempfile.TemporaryDirectory() as tmp:
+        # More than one worker shares sessions through SQLite
+        env = {'SESSION_DB': os.path.join(tmp, 'sessions.db')} if int(workers) > 1 else {}
+        run('gunicorn %sw x %st' % (workers, threads),
+            [sys.executable, 'serve.py', '--server', 'gunicorn', '--workers', workers, '--threads', threads],
+            env, requests, clients)
+    run('waitress %st' % threads,
+        [sys.executable, 'serve.py', '--server', 'waitress', '--threads', threads],
+        {}, requests, clients)
+
+
+if __name__ == '__main__':
+    main()
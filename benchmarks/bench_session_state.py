@@ -0,0 +1,142 @@
+"""Per-session context: dict of string lists vs SessionState with vocabulary IDs.
+
+Plays the same turns through the old context update (list concatenation and
+slicing, quadruple-loop find_keyword_links, list of link names) and the new
+one (intent and keyword IDs in a KeywordRing, bitmask links), then reports
+memory per session and per-turn time/allocations for the context work.
+Keywords are extracted once per message up front, so the keyword scan is not
+part of the numbers.
+
+    python benchmarks/bench_session_state.py [sessions] [turns_per_session]
+"""
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('METRICS', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+MESSAGES = ['wedding outfit for my sister', 'bridal makeup', 'red and gold saree', 'office wear for men',
+            'formal blazer', 'smart casual look', 'party makeup', 'kanchipuram silk saree', 'green',
+            'complete look with heels and clutch', 'ಮದುವೆ ಸೀರೆ ಕೆಂಪು', 'traditional jewelry', 'trendy dress']
+INTENTS = ['wedding', 'wedding_makeup', 'saree', 'men_office', 'formal_office', 'casual_office',
+           'party_makeup', 'kanchipuram_saree', 'saree_color_change', 'complete_look']
+
+
+def legacy_find_keyword_links(current_keywords, prev_keywords):
+    links = []
+    for current_kw in current_keywords:
+        for prev_kw in prev_keywords[-15:]:
+            for group_name, group_words in app.KEYWORD_GROUPS.items():
+                if any(gw in current_kw for gw in group_words) and any(gw in prev_kw for gw in group_words):
+                    links.append(group_name)
+                    break
+    return list(set(links))
+
+
+def legacy_turn(context, message, keywords, intent):
+    links = legacy_find_keyword_links(keywords, context.get('keywords', []))
+    prev_keywords = context.get('keywords', [])
+    context['last_intent'] = intent
+    context['last_query'] = message.lower()
+    context['keywords'] = (prev_keywords + list(keywords))[-app.MAX_KEYWORDS:]
+    context['keyword_links'] = list(links)
+
+
+def state_turn(state, message, keywords, intent):
+    keyword_ids = tuple(map(app.KEYWORD_IDS.key, keywords))
+    links = app.find_keyword_links(keyword_ids, state.keywords.last(app.KEYWORD_LINK_WINDOW))
+    state.last_intent = intent
+    state.last_query = message.lower()
+    state.keywords.extend(keyword_ids)
+    state.keyword_links = links
+
+
+KEYWORDS = {message: app.extract_keywords(message) for message in MESSAGES}
+
+
+def script(sessions, turns, seed=0):
+    rnd = random.Random(seed)
+    return [[(rnd.choice(MESSAGES), rnd.choice(INTENTS)) for _ in range(turns)] for _ in range(sessions)]
+
+
+def fresh(message):
+    # A distinct string object per turn, as request parsing would produce
+    return (message + ' ')[:-1]
+
+
+def measure_memory(kind, plan):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    contexts = []
+    for turns in plan:
+        context = {} if kind == 'dict' else app.STATE_CODEC.new()
+        apply = legacy_turn if kind == 'dict' else state_turn
+        for message, intent in turns:
+            apply(context, fresh(message), KEYWORDS[message], intent)
+        contexts.append(context)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / len(plan), contexts
+
+
+def measure_turn(kind, context, plan):
+    """Mean time per turn, then mean peak bytes allocated during one turn's context work"""
+    apply = legacy_turn if kind == 'dict' else state_turn
+    turns = [(fresh(message), KEYWORDS[message], intent) for message, intent in plan]
+    start = time.perf_counter()
+    for message, keywords, intent in turns:
+        apply(context, message, keywords, intent)
+    elapsed = time.perf_counter() - start
+    # CPython has no allocation-event counter; the per-turn peak above the
+    # starting point is the closest stable measure of what a turn allocates
+    tracemalloc.start()
+    transient = 0
+    sample = turns[:1000]
+    for message, keywords, intent in sample:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        apply(context, message, keywords, intent)
+        transient += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return elapsed / len(turns) * 1e6, transient / len(sample)
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    plan = script(sessions, turns)
+    # Fill the annotation cache once so it is not charged to the first sessions
+    measure_memory('state', plan[:10])
+
+    dict_bytes, dict_contexts = measure_memory('dict', plan)
+    state_bytes, state_contexts = measure_memory('state', plan)
+    same = all(
+        {**d, 'keyword_links': sorted(d['keyword_links'])} == {**s.to_dict(), 'keyword_links': sorted(s.to_dict()['keyword_links'])}
+        for d, s in zip(dict_contexts, state_contexts))
+
+    long_plan = script(1, 5000, seed=1)[0]
+    dict_us, dict_peak = measure_turn('dict', dict_contexts[0], long_plan)
+    state_us, state_peak = measure_turn('state', state_contexts[0], long_plan)
+
+    print('%d sessions x %d turns, contexts identical: %s' % (sessions, turns, same))
+    print('memory per session    dict %7.0f B   SessionState %7.0f B   (%.1fx smaller)'
+          % (dict_bytes, state_bytes, dict_bytes / state_bytes))
+    print('context work per turn dict %7.1f us  SessionState %7.1f us  (%.1fx faster)'
+          % (dict_us, state_us, dict_us / state_us))
+    print('bytes allocated/turn  dict %7.0f B   SessionState %7.0f B   (peak during the turn)'
+          % (dict_peak, state_peak))
+    print('vocabulary: %d keywords (fixed)' % len(app.KEYWORD_IDS))
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
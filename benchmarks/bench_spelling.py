@@ -0,0 +1,128 @@
+"""Spelling correction: accuracy, per-token cost and worst-case latency on long messages.
+
+Reports the index build, corrections for common misspellings, ordinary words
+that must be left alone, and timings for:
+
+- exact vocabulary tokens (skip set only, no fuzzy lookup)
+- cold lookups of generated typos (one or two random edits of a vocabulary
+  word), per token: p50 / p99 / max
+- long messages (200 tokens, every one a different unseen typo or unknown
+  word), cold and then memoised; only the first max_lookups (32) unknown
+  tokens of a message are looked up, which bounds the cold cost
+
+    python benchmarks/bench_spelling.py [messages]
+"""
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('METRICS', '0')
+os.environ.setdefault('WARMUP', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from spelling import MAX_TOKEN_LENGTH, SpellingCorrector
+
+TYPOS = {
+    'weding': 'wedding', 'lehnga': 'lehenga', 'makup': 'makeup', 'kanjeevaram': 'kanchipuram',
+    'kanjivaram': 'kanchipuram', 'acessories': 'accessories', 'earings': 'earrings', 'fashon': 'fashion',
+    'cotten': 'cotton', 'jewlery': 'jewelry', 'sneekers': 'sneakers', 'lipstik': 'lipstick',
+    'engagment': 'engagement', 'recepion': 'reception', 'chifon': 'chiffon', 'georgete': 'georgette',
+    'kancheepuram': 'kanchipuram', 'mascarra': 'mascara', 'ಮದುವೇ': 'ಮದುವೆ',
+}
+ORDINARY = ('right', 'light', 'sleep', 'organize', 'python', 'capital', 'france', 'cost', 'word',
+            'short', 'parts', 'where', 'weddings', 'formally', 'meeting', 'tonight', 'weeding', 'bridge')
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def build():
+    return SpellingCorrector(app.KEYWORD_MATCHER.vocabulary, known=app.spelling_known_words(),
+                             aliases=app.SPELLING_VARIANTS, contains_word=app._contains_keyword,
+                             dictionary=app.SPELLING_CORRECTOR._dictionary)
+
+
+def typo(word, rnd):
+    for _ in range(rnd.choice((1, 2))):
+        position = rnd.randrange(len(word))
+        edit = rnd.randrange(3)
+        if edit == 0:
+            word = word[:position] + word[position + 1:]
+        elif edit == 1:
+            word = word[:position] + rnd.choice(LETTERS) + word[position:]
+        else:
+            word = word[:position] + rnd.choice(LETTERS) + word[position + 1:]
+    return word
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rnd = random.Random(11)
+    start = time.perf_counter()
+    corrector = build()
+    print('index: %d words, %d deletes, built in %.1f ms'
+          % (len(corrector), len(corrector._deletes), (time.perf_counter() - start) * 1e3))
+
+    fixed = sum(corrector.correct(wrong) == right for wrong, right in TYPOS.items())
+    kept = sum(corrector.correct(word) == word for word in ORDINARY)
+    print('typos corrected %d/%d, ordinary words kept %d/%d' % (fixed, len(TYPOS), kept, len(ORDINARY)))
+    for wrong, right in TYPOS.items():
+        if corrector.correct(wrong) != right:
+            print('  missed %s -> %s (got %s)' % (wrong, right, corrector.correct(wrong)))
+
+    words = [word for word in app.KEYWORD_MATCHER.vocabulary if word.isalpha() and len(word) >= 5]
+    exact = ' '.join(rnd.choice(words) for _ in range(200))
+    number = 2000
+    start = time.perf_counter()
+    for _ in range(number):
+        corrector.correct(exact)
+    print('exact vocabulary tokens: %.2f us/token' % ((time.perf_counter() - start) / number / 200 * 1e6))
+
+    timings = []
+    for _ in range(5000):
+        token = typo(rnd.choice(words), rnd)
+        corrector.lookup.cache_clear()
+        start = time.perf_counter()
+        corrector.lookup(token)
+        timings.append(time.perf_counter() - start)
+    print('cold lookup of a typo: p50 %.1f us, p99 %.1f us, max %.1f us'
+          % (percentile(timings, 0.5) * 1e6, percentile(timings, 0.99) * 1e6, max(timings) * 1e6))
+
+    # Longest tokens the corrector looks at: the most deletes per lookup
+    long_tokens = [''.join(rnd.choice(LETTERS) for _ in range(MAX_TOKEN_LENGTH)) for _ in range(200)]
+    corrector.lookup.cache_clear()
+    start = time.perf_counter()
+    for token in long_tokens:
+        corrector.lookup(token)
+    print('cold lookup of a %d-letter token: %.1f us' % (MAX_TOKEN_LENGTH, (time.perf_counter() - start) / 200 * 1e6))
+
+    cold = []
+    warm = []
+    for _ in range(messages):
+        tokens = [typo(rnd.choice(words), rnd) if rnd.random() < 0.7 else
+                  ''.join(rnd.choice(LETTERS) for _ in range(rnd.randint(5, MAX_TOKEN_LENGTH)))
+                  for _ in range(200)]
+        message = ' '.join(tokens)
+        corrector.lookup.cache_clear()
+        start = time.perf_counter()
+        corrector.correct(message)
+        cold.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        corrector.correct(message)
+        warm.append(time.perf_counter() - start)
+    print('200-token messages of unseen typos: cold p50 %.2f ms, max %.2f ms (%.1f us/token); memoised %.3f ms'
+          % (percentile(cold, 0.5) * 1e3, max(cold) * 1e3, max(cold) / 200 * 1e6, percentile(warm, 0.5) * 1e3))
+
+    client = app.app.test_client()
+    for message in ('weding outfit', 'makup for a party', 'acessories for office'):
+        reply = client.post('/chat', json={'message': message, 'session_id': 'bench-' + message}).get_json()
+        print('%-24s -> %s' % (message, reply['response'].split('\n')[0]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Cold start: import time, warm-up and time to the first /chat response.
+
+Each run is a fresh interpreter. "first response" is measured from process
+start to the reply of a /chat message that needs langdetect, sent as soon
+as /ready says 200 (or right after import with WARMUP=0, where /ready is
+immediate and the first message pays for loading the language profiles).
+
+    python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = r'''
+import time
+started = time.perf_counter()
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+while client.get('/ready').status_code != 200:
+    time.sleep(0.005)
+ready = time.perf_counter()
+reply = client.post('/chat', json={'message': 'what should I wear to my cousins engagement next week'})
+first = time.perf_counter()
+client.post('/chat', json={'message': 'something elegant for an evening reception please'})
+second = time.perf_counter()
+print(json.dumps({'import': imported - started, 'ready': ready - started, 'first': first - started,
+                  'first_request': first - ready, 'second_request': second - first,
+                  'status': reply.status_code}))
+'''
+
+
+def run(env_overrides, runs):
+    samples = []
+    for _ in range(runs):
+        env = dict(os.environ, METRICS='0', **env_overrides)
+        out = subprocess.run([sys.executable, '-c', WORKER, ROOT], env=env,
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, 'rules.pickle')
+        subprocess.run([sys.executable, '-c', 'import sys; sys.path.insert(0, sys.argv[1]); import app', ROOT],
+                       env=dict(os.environ, RULES_SNAPSHOT=snapshot), check=True)
+        modes = [
+            ('WARMUP=0', {'WARMUP': '0'}),
+            ('WARMUP=1', {'WARMUP': '1'}),
+            ('WARMUP=1 + snapshot', {'WARMUP': '1', 'RULES_SNAPSHOT': snapshot}),
+        ]
+        print('median of %d fresh processes, times in ms from process start' % runs)
+        print('%-22s %8s %8s %10s %12s %12s' % ('mode', 'import', 'ready', '1st reply', '1st request', '2nd request'))
+        for name, overrides in modes:
+            result = run(overrides, runs)
+            print('%-22s %8.0f %8.0f %10.0f %12.1f %12.1f' % (
+                name, result['import'] * 1e3, result['ready'] * 1e3, result['first'] * 1e3,
+                result['first_request'] * 1e3, result['second_request'] * 1e3))
+        sys.path.insert(0, ROOT)
+        os.environ['METRICS'] = '0'
+        os.environ['WARMUP'] = '0'
+        import app
+        import rule_snapshot
+        digest = rule_snapshot.fingerprint(app.MATCHER_VOCABULARIES, app.KEYWORD_GROUPS, app.IMPORTANT_WORDS)
+        build = min(timeit.repeat(app.build_keyword_structures, number=1, repeat=10))
+        load = min(timeit.repeat(lambda: rule_snapshot.load(snapshot, digest), number=1, repeat=10))
+        print('keyword structures: build %.1f ms, load from snapshot %.1f ms' % (build * 1e3, load * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Page delivery: render_template on every hit vs the precompressed in-memory page and assets.
+
+"legacy" re-renders one page with the CSS and JS inline, as index.html used
+to be, on every request with no compression or validators. The new path is
+measured for a first visit (page + both assets, brotli or gzip) and a repeat
+visit (page revalidated with If-None-Match -> 304; hashed assets come from
+the browser cache without a request).
+
+    python benchmarks/bench_static.py [requests]
+"""
+import os
+import re
+import sys
+import time
+import timeit
+
+os.environ.setdefault('METRICS', '0')
+os.environ.setdefault('WARMUP', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+STATIC = os.path.join(app.app.root_path, 'static')
+
+
+def legacy_page():
+    """index.html with chat.css and chat.js inlined again, as a compiled template"""
+    with open(os.path.join(app.app.root_path, 'templates', 'index.html'), encoding='utf-8') as f:
+        source = f.read()
+    for name, tag in (('chat.css', '<style>\n%s</style>'), ('chat.js', '<script>\n%s</script>')):
+        with open(os.path.join(STATIC, name), encoding='utf-8') as f:
+            # Indented as it was inside the template
+            inline = '    ' + tag % ''.join('        ' + line if line.strip() else line for line in f.readlines())
+        source = re.sub(r'<[^>]*\{\{ static_url\(\'%s\'\) \}\}[^>]*>(</script>)?' % re.escape(name),
+                        lambda _: inline, source)
+    return app.app.jinja_env.from_string(source)
+
+
+def visit(client, paths, headers):
+    total = 0
+    for path in paths:
+        response = client.get(path, headers=headers)
+        assert response.status_code in (200, 304), (path, response.status_code)
+        total += len(response.data)
+    return total
+
+
+def timed(func, count):
+    func()
+    start = time.perf_counter()
+    for _ in range(count):
+        result = func()
+    return (time.perf_counter() - start) / count * 1e3, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    template = legacy_page()
+    app.app.add_url_rule('/legacy', 'legacy', lambda: template.render())
+    client = app.app.test_client()
+
+    page = client.get('/', headers={'Accept-Encoding': 'identity'})
+    assets = re.findall(r'/static/[^"]+', page.data.decode('utf-8'))
+    first_paths = ['/'] + assets
+
+    print('%d requests each, in-process test client' % count)
+    print('%-40s %10s %10s' % ('', 'bytes', 'ms/visit'))
+    ms, size = timed(lambda: visit(client, ['/legacy'], {}), count)
+    print('%-40s %10d %10.3f' % ('legacy render_template, identity', size, ms))
+    for label, encoding in (('identity', 'identity'), ('gzip', 'gzip'), ('br', 'gzip, deflate, br')):
+        headers = {'Accept-Encoding': encoding}
+        ms, size = timed(lambda: visit(client, first_paths, headers), count)
+        print('%-40s %10d %10.3f' % ('first visit (page + 2 assets), ' + label, size, ms))
+    etag = client.get('/', headers={'Accept-Encoding': 'gzip, deflate, br'}).headers['ETag']
+    headers = {'Accept-Encoding': 'gzip, deflate, br', 'If-None-Match': etag}
+    ms, size = timed(lambda: visit(client, ['/'], headers), count)
+    print('%-40s %10d %10.3f' % ('repeat visit (304), br', size, ms))
+
+    # The handlers alone, without the test client's WSGI round trip
+    number = count * 10
+    with app.app.test_request_context('/', headers={'Accept-Encoding': 'gzip, deflate, br'}):
+        legacy = min(timeit.repeat(lambda: app.app.make_response(template.render()), number=number, repeat=3))
+        cached = min(timeit.repeat(lambda: app.index_page.response(app.request), number=number, repeat=3))
+    print('handler only: render_template %.1f us, in-memory page %.1f us'
+          % (legacy / number * 1e6, cached / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
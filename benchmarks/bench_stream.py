@@ -0,0 +1,74 @@
+"""Streamed vs plain /chat: output equivalence and time to first rendered text.
+
+Replays the same conversations through /chat as JSON and as Server-Sent
+Events, checks the concatenated deltas are byte-identical to the JSON
+response for every turn, then estimates how long a slow link takes to
+deliver the first renderable chunk versus the whole JSON body.
+
+    python benchmarks/bench_stream.py [kbit_per_second]
+"""
+import json
+import os
+import sys
+
+os.environ.setdefault('ADMISSION_CONTROL', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+CONVERSATIONS = [
+    ['hello', 'wedding outfit', 'for men', 'makeup', 'thanks'],
+    ['office wear', 'formal', 'red', 'complete look'],
+    ['kanchipuram saree', 'green', 'gold', 'bridal makeup'],
+    ['party outfit ideas', 'for men', 'festival', 'vacation'],
+    ['ಮದುವೆ ಸೀರೆ', 'ಮೇಕಪ್', 'capital of france', 'casual office'],
+]
+
+
+def parse_events(body):
+    events = []
+    for frame in body.split('\n\n'):
+        if not frame:
+            continue
+        event, data = 'message', ''
+        for line in frame.split('\n'):
+            if line.startswith('event: '):
+                event = line[7:]
+            elif line.startswith('data: '):
+                data += line[6:]
+        events.append((event, json.loads(data)))
+    return events
+
+
+def main():
+    kbps = float(sys.argv[1]) if len(sys.argv) > 1 else 400.0  # Slow 3G-ish
+    bytes_per_second = kbps * 1000 / 8
+    client = app.app.test_client()
+    turns = mismatches = 0
+    first_chunk = whole_body = 0
+    for n, conversation in enumerate(CONVERSATIONS):
+        for message in conversation:
+            plain = client.post('/chat', json={'message': message, 'session_id': 'plain-%d' % n})
+            streamed = client.post('/chat', json={'message': message, 'session_id': 'stream-%d' % n,
+                                                  'stream': True})
+            expected = plain.get_json()
+            events = parse_events(streamed.get_data(as_text=True))
+            text = ''.join(data['delta'] for event, data in events if event == 'message')
+            done = [data for event, data in events if event == 'done']
+            rebuilt = dict(done[0], response=text) if len(done) == 1 else None
+            if text.encode() != expected['response'].encode() or rebuilt != expected:
+                mismatches += 1
+            turns += 1
+            whole_body += len(plain.get_data())
+            first_chunk += len(streamed.get_data(as_text=True).split('\n\n', 1)[0].encode()) + 2
+    print('%d turns, %d streamed/plain mismatches' % (turns, mismatches))
+    print('avg bytes before first text: streamed %.0f, plain JSON %.0f'
+          % (first_chunk / turns, whole_body / turns))
+    print('at %.0f kbit/s: first text after %.1f ms streamed vs %.1f ms plain'
+          % (kbps, first_chunk / turns / bytes_per_second * 1000, whole_body / turns / bytes_per_second * 1000))
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
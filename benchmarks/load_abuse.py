@@ -0,0 +1,135 @@
+"""Abusive traffic vs /chat tail latency, with admission control off and on.
+
+Starts serve.py (waitress, one process, --trusted-proxies 1) for each phase
+and runs paced "human" clients for `seconds` seconds. Each has its own IP
+(sent as X-Forwarded-For) and one session per short conversation. Phases:
+
+- baseline: the human clients alone
+- abuse, ADMISSION_CONTROL=0: plus noisy clients sending as fast as they
+  can, half of them on one session_id and half with a fresh session_id
+  every request, each from its own IP
+- abuse, admission control on (default limits)
+
+Reports the human clients' p50/p99 and error count, how many abusive
+requests were sent and answered 200/429/503, and the live session count at
+the end (session churn shows up as evictions of real conversations).
+
+    python benchmarks/load_abuse.py [seconds] [humans] [abusers]
+"""
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_serve import free_port, wait_ready  # noqa: E402
+
+CONVERSATION = ('what should I wear to the office', 'formal', 'red and black', 'thanks')
+HUMAN_PAUSE = 1.2  # Seconds between a human client's turns
+
+
+def post(conn, body, ip):
+    conn.request('POST', '/chat', body, {'Content-Type': 'application/json', 'X-Forwarded-For': ip})
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def human(port, number, stop, latencies, errors):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    ip = '10.1.%d.%d' % (number // 250, number % 250 + 1)
+    conversation = 0
+    stop.wait(random.Random(number).uniform(0, HUMAN_PAUSE))  # Humans do not arrive all at once
+    while not stop.is_set():
+        session_id = 'human-%d-%d' % (number, conversation)
+        for message in CONVERSATION:
+            start = time.perf_counter()
+            status = post(conn, json.dumps({'message': message, 'session_id': session_id}), ip)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+            if stop.wait(HUMAN_PAUSE):
+                break
+        conversation += 1
+    conn.close()
+
+
+def abuser(port, number, stop, statuses):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    ip = '10.9.0.%d' % (number + 1)
+    sent = 0
+    while not stop.is_set():
+        if number % 2:
+            body = json.dumps({'message': 'wedding outfit', 'session_id': 'flood-%d' % number})
+        else:
+            body = json.dumps({'message': 'party outfit', 'session_id': 'churn-%d-%d' % (number, sent)})
+        status = post(conn, body, ip)
+        statuses[status] = statuses.get(status, 0) + 1
+        sent += 1
+    conn.close()
+
+
+def metric(port, name):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request('GET', '/metrics')
+    text = conn.getresponse().read().decode()
+    conn.close()
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.split()[1])
+    return None
+
+
+def phase(name, seconds, humans, abusers, admission):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), ADMISSION_CONTROL='1' if admission else '0', METRICS='1')
+    command = [sys.executable, 'serve.py', '--server', 'waitress', '--threads', '8', '--trusted-proxies', '1']
+    proc = subprocess.Popen(command, cwd=ROOT,
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        wait_ready(port)
+        stop = threading.Event()
+        latencies, errors = [], []
+        statuses = [{} for _ in range(abusers)]
+        threads = [threading.Thread(target=human, args=(port, number, stop, latencies, errors))
+                   for number in range(humans)]
+        threads += [threading.Thread(target=abuser, args=(port, number, stop, statuses[number]))
+                    for number in range(abusers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        sessions = metric(port, 'fashionbot_sessions')
+    finally:
+        os.killpg(proc.pid, 15)
+        proc.wait()
+    latencies.sort()
+    totals = {}
+    for counts in statuses:
+        for status, count in counts.items():
+            totals[status] = totals.get(status, 0) + count
+    abusive = ', '.join('%d x %s' % (count, status) for status, count in sorted(totals.items())) or 'none'
+    print('%-26s humans: %5d turns, p50 %6.2f ms, p99 %7.2f ms, %d errors | abusive: %s | sessions %d'
+          % (name, len(latencies), latencies[len(latencies) // 2] * 1e3, latencies[int(len(latencies) * 0.99)] * 1e3,
+             len(errors), abusive, sessions or 0))
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    humans = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    abusers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    phase('baseline', seconds, humans, 0, True)
+    phase('abuse, admission off', seconds, humans, abusers, False)
+    phase('abuse, admission on', seconds, humans, abusers, True)
+
+
+if __name__ == '__main__':
+    main()
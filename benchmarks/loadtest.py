@@ -0,0 +1,394 @@
+"""Load test: replay test_queries.md and synthetic multi-turn conversations.
+
+Conversations are generated from a seed, so two runs with the same options
+send exactly the same turns. Each conversation is one session whose turns are
+sent in order; `--concurrency` conversations run at a time.
+
+    # In-process through the Flask test client
+    python benchmarks/loadtest.py inproc --conversations 2000 --concurrency 8
+
+    # Over HTTP against serve.py started by the harness, or an existing server
+    python benchmarks/loadtest.py http --workers 2 --threads 8 --concurrency 32
+    python benchmarks/loadtest.py http --url http://127.0.0.1:5000
+
+    # Save results and compare a later run against them
+    python benchmarks/loadtest.py inproc --output baseline.json
+    python benchmarks/loadtest.py inproc --compare baseline.json
+
+Reports throughput, p50/p95/p99 latency, RSS growth per 1000 sessions and
+time per pipeline stage (from /metrics over HTTP), and writes everything to a
+JSON file (benchmarks/results/loadtest-<mode>.json unless --output is
+given). With --compare, the exit status is 2 if throughput or latency got
+worse than --tolerance.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Every simulated client shares one address, so per-IP limits would cap the whole run
+os.environ.setdefault('ADMISSION_CONTROL', '0')
+sys.path.insert(0, ROOT)
+
+from bench_serve import free_port, wait_ready  # noqa: E402
+
+QUERIES_FILE = os.path.join(ROOT, 'test_queries.md')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')  # Ignored by git
+
+# Follow-up chains that exercise the context paths in extract_intent
+# (continuations, gender/colour/single-word follow-ups, keyword links)
+CONTEXT_CHAINS = (
+    ('wedding outfit ideas', 'makeup', 'for men'),
+    ('what to wear to a wedding', 'outfit', 'bridal makeup', 'thanks'),
+    ('office wear', 'formal', 'red and black', 'complete look'),
+    ('office outfit', 'casual', 'for men', 'yes please'),
+    ('kanchipuram saree', 'green', 'gold', 'need something more'),
+    ('saree for a function', 'pink', 'makeup'),
+    ('party outfit', 'makeup', 'for men', 'thank you'),
+    ('casual wear for weekend', 'for men', 'style'),
+    ('festival look', 'saree', 'maroon'),
+    ('vacation outfits for the beach', 'makeup', 'more'),
+    ('ಮದುವೆ ಸೀರೆ', 'ಮೇಕಪ್', 'ಧನ್ಯವಾದ'),
+    ('hello', 'night party makeup', 'outfit'),
+)
+
+STAGE_LINE = re.compile(r'^fashionbot_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+
+def parse_queries(path=QUERIES_FILE):
+    """[(section, query)] for every bullet / quick-test line in test_queries.md"""
+    queries = []
+    section = ''
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            line = line.strip()
+            if line.startswith('#'):
+                section = line.lstrip('#').strip()
+            elif line.startswith('- [') or not line:
+                continue
+            elif line.startswith('- '):
+                query = line[2:].strip()
+                queries.append((section, '' if query == '(empty message)' else query))
+            elif re.match(r'^\d+\. `.*`$', line):
+                queries.append((section, line.split('`')[1]))
+    return queries
+
+
+def build_conversations(count, seed, queries):
+    """Seeded mix: context chains, test_queries.md openers with a chain follow-up, single queries"""
+    rnd = random.Random(seed)
+    conversations = []
+    for number in range(count):
+        kind = rnd.random()
+        if kind < 0.5:
+            turns = list(rnd.choice(CONTEXT_CHAINS))
+        elif kind < 0.8:
+            chain = rnd.choice(CONTEXT_CHAINS)
+            turns = [rnd.choice(queries)[1]] + list(chain[1:rnd.randint(2, len(chain))])
+        else:
+            turns = [rnd.choice(queries)[1] for _ in range(rnd.randint(1, 3))]
+        conversations.append(('load-%d-%d' % (seed, number), turns))
+    return conversations
+
+
+def rss_bytes(pids):
+    """Resident set size summed over pids (Linux /proc; None elsewhere)"""
+    total = 0
+    try:
+        for pid in pids:
+            with open('/proc/%d/status' % pid) as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return total
+
+
+def process_tree(pid):
+    pids = [pid]
+    for current in pids:
+        try:
+            with open('/proc/%d/task/%d/children' % (current, current)) as children:
+                pids.extend(int(child) for child in children.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class InProcessTarget:
+    """Flask test client against this interpreter's app"""
+
+    def __init__(self):
+        import app
+        self.app = app
+        self._local = threading.local()
+
+    def post(self, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.app.test_client()
+        response = client.post('/chat', data=body, content_type='application/json')
+        response.get_data()
+        return response.status_code
+
+    def rss(self):
+        return rss_bytes([os.getpid()])
+
+    def stage_totals(self):
+        return self.app.STAGE_SECONDS.totals()
+
+    def close(self):
+        pass
+
+
+class HttpTarget:
+    """Keep-alive HTTP client against a running server (started here unless url is given)"""
+
+    def __init__(self, url=None, workers=1, threads=4, server='gunicorn'):
+        self.proc = None
+        self._tmp = None
+        if url is None:
+            port = free_port()
+            self._tmp = tempfile.TemporaryDirectory()
+            env = dict(os.environ, PORT=str(port))
+            if workers > 1:
+                env['SESSION_DB'] = os.path.join(self._tmp.name, 'sessions.db')
+            self.proc = subprocess.Popen(
+                [sys.executable, 'serve.py', '--server', server, '--workers', str(workers), '--threads', str(threads)],
+                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+            wait_ready(port)
+            url = 'http://127.0.0.1:%d' % port
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        return conn
+
+    def post(self, body):
+        conn = self._connection()
+        try:
+            conn.request('POST', '/chat', body.encode(), {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+
+    def rss(self):
+        if self.proc is None:
+            return None
+        return rss_bytes(process_tree(self.proc.pid))
+
+    def stage_totals(self):
+        """Stage sums/counts scraped from /metrics (one worker's view with several workers)"""
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            conn.request('GET', '/metrics')
+            response = conn.getresponse()
+            text = response.read().decode()
+            if response.status != 200:
+                return {}
+        finally:
+            conn.close()
+        totals = {}
+        for line in text.splitlines():
+            match = STAGE_LINE.match(line)
+            if match:
+                kind, stage, value = match.groups()
+                count, seconds = totals.get(stage, (0, 0.0))
+                if kind == 'count':
+                    count = int(float(value))
+                else:
+                    seconds = float(value)
+                totals[stage] = (count, seconds)
+        return totals
+
+    def close(self):
+        if self.proc is not None:
+            os.killpg(self.proc.pid, 15)
+            self.proc.wait()
+        if self._tmp is not None:
+            self._tmp.cleanup()
+
+
+def run_conversations(target, conversations, concurrency):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def converse(conversation):
+        session_id, turns = conversation
+        local = []
+        for message in turns:
+            body = json.dumps({'message': message, 'session_id': session_id}, ensure_ascii=False)
+            start = time.perf_counter()
+            try:
+                status = target.post(body)
+            except (OSError, http.client.HTTPException) as exc:
+                status = repr(exc)
+            local.append(time.perf_counter() - start)
+            if status != 200:
+                with lock:
+                    errors.append(status)
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(converse, conversations))
+    return time.perf_counter() - start, latencies, errors
+
+
+def stage_report(before, after):
+    stages = {}
+    for stage, (count, seconds) in sorted(after.items()):
+        count -= before.get(stage, (0, 0.0))[0]
+        seconds -= before.get(stage, (0, 0.0))[1]
+        if count:
+            stages[stage] = {'count': count, 'total_ms': seconds * 1000, 'mean_us': seconds / count * 1e6}
+    return stages
+
+
+def run(args):
+    queries = parse_queries()
+    conversations = build_conversations(args.conversations, args.seed, queries)
+    warmup = build_conversations(args.warmup, args.seed + 1, queries)
+    if args.mode == 'inproc':
+        target = InProcessTarget()
+    else:
+        target = HttpTarget(args.url, args.workers, args.threads, args.server)
+    try:
+        run_conversations(target, warmup, args.concurrency)
+        rss_before = target.rss()
+        stages_before = target.stage_totals()
+        duration, latencies, errors = run_conversations(target, conversations, args.concurrency)
+        rss_after = target.rss()
+        stages = stage_report(stages_before, target.stage_totals())
+    finally:
+        target.close()
+
+    latencies.sort()
+    requests = len(latencies)
+    rss_growth = None
+    if rss_before is not None and rss_after is not None:
+        rss_growth = (rss_after - rss_before) / 1024 / len(conversations) * 1000
+    return {
+        'mode': args.mode,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'config': {'conversations': args.conversations, 'concurrency': args.concurrency, 'seed': args.seed,
+                   'workers': args.workers, 'threads': args.threads, 'server': args.server, 'url': args.url,
+                   'queries_parsed': len(queries)},
+        'requests': requests,
+        'errors': len(errors),
+        'duration_s': duration,
+        'throughput_rps': requests / duration if duration else 0.0,
+        'latency_ms': {
+            'mean': sum(latencies) / requests * 1000 if requests else 0.0,
+            'p50': percentile(latencies, 0.50) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'max': latencies[-1] * 1000 if latencies else 0.0,
+        },
+        'sessions': len(conversations),
+        'rss_growth_kib_per_1000_sessions': rss_growth,
+        'stages': stages,
+    }
+
+
+def print_report(result):
+    latency = result['latency_ms']
+    print('%s: %d requests in %.2fs, %d errors' % (result['mode'], result['requests'], result['duration_s'],
+                                                   result['errors']))
+    print('  throughput  %.0f req/s' % result['throughput_rps'])
+    print('  latency     p50 %.2f ms  p95 %.2f ms  p99 %.2f ms  max %.2f ms'
+          % (latency['p50'], latency['p95'], latency['p99'], latency['max']))
+    if result['rss_growth_kib_per_1000_sessions'] is not None:
+        print('  RSS growth  %.0f KiB per 1000 sessions' % result['rss_growth_kib_per_1000_sessions'])
+    if result['stages']:
+        print('  stage                          calls    total ms   mean us')
+        for stage, numbers in sorted(result['stages'].items(), key=lambda item: -item[1]['total_ms']):
+            print('  %-28s %8d %11.1f %9.1f' % (stage, numbers['count'], numbers['total_ms'], numbers['mean_us']))
+
+
+def compare(result, baseline, tolerance):
+    """Print changes against a saved run; returns the list of regressions"""
+    checks = [('throughput_rps', result['throughput_rps'], baseline['throughput_rps'], True)]
+    for key in ('p50', 'p95', 'p99'):
+        checks.append(('latency %s' % key, result['latency_ms'][key], baseline['latency_ms'][key], False))
+    regressions = []
+    print('  vs %s run of %s' % (baseline['mode'], baseline['timestamp']))
+    for name, current, previous, higher_is_better in checks:
+        change = (current - previous) / previous if previous else 0.0
+        worse = -change if higher_is_better else change
+        flag = ''
+        if worse > tolerance:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print('  %-16s %10.2f -> %10.2f  (%+.1f%%)%s' % (name, previous, current, change * 100, flag))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Replay chat conversations and report latency/throughput')
+    parser.add_argument('mode', choices=('inproc', 'http'))
+    parser.add_argument('--conversations', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--url', help='existing server to test (http mode); otherwise serve.py is started')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--server', choices=('gunicorn', 'waitress'), default='gunicorn')
+    parser.add_argument('--output', help='where to write the JSON results (default benchmarks/results/loadtest-<mode>.json)')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='relative slowdown that counts as a regression')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run(args)
+    print_report(result)
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, 'loadtest-%s.json' % args.mode)
+    with open(output, 'w', encoding='utf-8') as handle:
+        json.dump(result, handle, indent=2)
+    print('  results written to %s' % output)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        if compare(result, baseline, args.tolerance):
+            sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
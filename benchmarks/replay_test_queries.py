@@ -0,0 +1,95 @@
+"""Rule engine equivalence: replays test_queries.md and compares every reply.
+
+Each query of test_queries.md is sent to /chat in a session of its own, then
+the "Quick Test Script" is sent as one conversation. Replies are compared
+with test_queries.expected.json, recorded from the original
+generate_fashion_response if-chain. Two later additions are switched off so
+that only the rule tables are compared:
+
+- language detection: Kannada script means 'kn', anything else 'en'
+- knowledge base tips: turns where no rule fires get the generic reply
+
+Exits 1 if any reply differs. After an intended change to a reply,
+re-record with --save and review the diff of the JSON file.
+
+    python benchmarks/replay_test_queries.py [--save]
+"""
+import json
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXPECTED = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_queries.expected.json')
+
+os.environ.setdefault('ADMISSION_CONTROL', '0')
+os.environ.setdefault('METRICS', '0')
+os.environ.setdefault('WARMUP', '0')
+os.environ['EVENT_LOG_DIR'] = ''
+os.environ['SESSION_DB'] = ''
+sys.path.insert(0, ROOT)
+
+KANNADA_LETTER = re.compile('[ಀ-೿]')
+QUICK_TEST = re.compile(r'\d+\. `(.*)`$')
+
+
+def conversations(path=os.path.join(ROOT, 'test_queries.md')):
+    """Every listed query as a one-turn conversation, then the quick test script as one conversation"""
+    single, quick = [], []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            match = QUICK_TEST.match(line)
+            if match:
+                quick.append(match.group(1))
+            elif line.startswith('- ') and not line.startswith('- ['):
+                single.append(line[2:])
+    return [[query] for query in single] + [quick]
+
+
+def script_language(text):
+    return 'kn' if KANNADA_LETTER.search(text) else 'en'
+
+
+def replay(app):
+    """[[session_id, message, reply text]] for every turn"""
+    app.detect_language = script_language
+    app.retrieve_tips = lambda text_lower, lang: []
+    client = app.app.test_client()
+    turns = []
+    for number, conversation in enumerate(conversations()):
+        session_id = 'replay-%d' % number
+        for message in conversation:
+            reply = client.post('/chat', json={'message': message, 'session_id': session_id}).get_json()
+            turns.append([session_id, message, reply['response']])
+    return turns
+
+
+def save(turns, path=EXPECTED):
+    """One turn per line, so a changed reply shows up as a one-line diff"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[\n' + ',\n'.join(json.dumps(turn, ensure_ascii=False) for turn in turns) + '\n]\n')
+
+
+def main():
+    import app
+
+    turns = replay(app)
+    if '--save' in sys.argv[1:]:
+        save(turns)
+        print('recorded %d turns in %s' % (len(turns), EXPECTED))
+        return
+    with open(EXPECTED, encoding='utf-8') as f:
+        expected = json.load(f)
+    mismatches = [(want, got) for want, got in zip(expected, turns) if want != got]
+    if len(expected) != len(turns):
+        print('expected %d turns, replayed %d' % (len(expected), len(turns)))
+    for want, got in mismatches[:10]:
+        print('%s %r\n  expected: %r\n  got:      %r' % (got[0], got[1], want[2][:120], got[2][:120]))
+    print('%d turns, %d mismatches' % (len(turns), len(mismatches)))
+    if mismatches or len(expected) != len(turns):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
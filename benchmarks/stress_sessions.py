@@ -0,0 +1,128 @@
+"""Stress test: many threads running turns against the session backends.
+
+Every thread runs turns on a few hot sessions shared by all threads and on
+cold sessions drawn from a pool much larger than max_sessions, while a
+sweeper with a short TTL expires idle ones. Each turn touches the session
+inside backend.turn(), appends a message and saves. Reported per backend:
+
+- overlaps: turns that found another turn of the same session in flight
+- dropped: in-memory store only; sessions evicted or expired during a turn
+- lost: hot-session messages missing at the end, where every turn must have
+  landed
+
+The "no turn()" row runs the same load without backend.turn() to show what
+it guards against. It is expected to report overlaps, dropped sessions or
+lost messages; every other row must report zero, or the script exits 1.
+
+    python benchmarks/stress_sessions.py [threads] [turns_per_thread]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import SessionStore
+from sqlite_session_store import SqliteSessionStore
+
+HOT_SESSIONS = 8
+COLD_POOL = 5000
+MAX_SESSIONS = 500
+TTL = 0.5
+
+
+def run(store, threads, turns, guarded=True, check_identity=True):
+    inflight = {}
+    inflight_lock = threading.Lock()
+    problems = {'overlaps': 0, 'dropped': 0}
+    hot_turns = [0] * HOT_SESSIONS
+    counts_lock = threading.Lock()
+    start_gate = threading.Barrier(threads + 1)
+
+    def worker(index):
+        rnd = random.Random(index)
+        local_hot = [0] * HOT_SESSIONS
+        start_gate.wait()
+        for turn in range(turns):
+            if rnd.random() < 0.5:
+                hot = rnd.randrange(HOT_SESSIONS)
+                session_id = 'hot-%d' % hot
+                local_hot[hot] += 1
+            else:
+                session_id = 'cold-%d' % rnd.randrange(COLD_POOL)
+            with store.turn(session_id) if guarded else nullcontext():
+                session = store.touch(session_id)
+                with inflight_lock:
+                    if inflight.get(session_id):
+                        problems['overlaps'] += 1
+                    inflight[session_id] = inflight.get(session_id, 0) + 1
+                # Widen the window in which another thread could interleave
+                for _ in range(3):
+                    time.sleep(0)
+                session.history.append('%d:%d' % (index, turn))
+                if check_identity and store.get(session_id) is not session:
+                    with inflight_lock:
+                        problems['dropped'] += 1
+                with inflight_lock:
+                    inflight[session_id] -= 1
+                store.save(session)
+        with counts_lock:
+            for hot, count in enumerate(local_hot):
+                hot_turns[hot] += count
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    store.start_sweeper(interval=0.01, batch=64)
+    start_gate.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    store.stop_sweeper()
+    lost = 0
+    for hot, expected in enumerate(hot_turns):
+        session = store.get('hot-%d' % hot)
+        lost += expected - (session.history.total if session is not None else 0)
+    stats = store.stats()
+    return threads * turns / elapsed, problems['overlaps'], problems['dropped'], lost, stats
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    print('%d threads x %d turns, %d hot sessions, %d cold ids, max_sessions %d, ttl %.1fs'
+          % (threads, turns, HOT_SESSIONS, COLD_POOL, MAX_SESSIONS, TTL))
+    print('%-24s %10s %9s %8s %6s %10s %12s' % ('backend', 'turns/s', 'overlaps', 'dropped', 'lost',
+                                               'evictions', 'expirations'))
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [
+            ('no turn(), 1 shard', lambda: SessionStore(MAX_SESSIONS, TTL, 100000, 50, shards=1), False, True),
+            ('memory, 1 shard', lambda: SessionStore(MAX_SESSIONS, TTL, 100000, 50, shards=1), True, True),
+            ('memory, 16 shards', lambda: SessionStore(MAX_SESSIONS, TTL, 100000, 50, shards=16), True, True),
+            ('sqlite', lambda: SqliteSessionStore(os.path.join(tmp, 'stress.db'), MAX_SESSIONS, TTL, 100000, 50),
+             True, False),
+        ]
+        for name, factory, guarded, check_identity in backends:
+            store = factory()
+            try:
+                rate, overlaps, dropped, lost, stats = run(store, threads, turns, guarded, check_identity)
+            finally:
+                store.close()
+            print('%-24s %10.0f %9d %8s %6d %10d %12d' % (
+                name, rate, overlaps, dropped if check_identity else '-', lost,
+                stats['evictions'], stats['expirations']))
+            if guarded and (overlaps or dropped or lost):
+                failed = True
+    if failed:
+        print('FAILED: a guarded backend ran overlapping turns or lost a session mid-turn')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
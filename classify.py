@@ -0,0 +1,271 @@
+"""Offline classification of a JSONL query dump through the chat pipeline, on a pool of processes.
+
+Each input line is a JSON object with a message and, optionally, a session id
+(by default the `message` and `session_id` fields, so event log files work
+as input). Every line gets one output line: the input object plus `lang`,
+`intent` and `response`, or `{"error": ...}` for a line that could not be
+classified, so output line N always belongs to input line N.
+
+Lines are read in chunks and each turn goes to the worker that owns its
+session (by a hash of the id), so the turns of a session run in order in
+one process and keep their context. Workers keep at most `max_sessions`
+sessions each (least recently used are dropped) and only `window` chunks
+are in flight at once, so memory stays flat however long the input is.
+Results are written in input order as soon as every earlier chunk is done.
+
+    python classify.py queries.jsonl [-o out.jsonl] [--workers N]
+"""
+import argparse
+import gzip
+import heapq
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import zlib
+
+EMPTY_RESULT = json.dumps({'error': 'empty message'})
+INVALID_RESULT = json.dumps({'error': 'invalid JSON'})
+
+# Set in each worker process by _start_worker
+_app = None
+_sessions = None
+
+
+def _start_worker(max_sessions):
+    global _app, _sessions
+    # Offline runs: no web-side logging, warm-up, metrics or shared session database
+    os.environ['EVENT_LOG_DIR'] = ''
+    os.environ['SESSION_DB'] = ''
+    os.environ.setdefault('METRICS', '0')
+    os.environ.setdefault('WARMUP', '0')
+    import app
+    from session_store import SessionStore
+
+    _app = app
+    _sessions = SessionStore(max_sessions, float('inf'), app.MAX_MEMORY_SIZE, app.CONTEXT_WINDOW,
+                             context_codec=app.STATE_CODEC, shards=1)
+
+
+def classify_turns(turns, with_response=True):
+    """Answer (line, session_id, record, message) turns in order; [(line, intent, output JSON line)]"""
+    results = []
+    for line, session_id, record, message in turns:
+        if session_id is None:
+            session = _sessions.new_session(None, 0)
+        else:
+            session = _sessions.touch(session_id)
+        try:
+            payload, lang, intent = _app.answer_message(message, session)
+        except Exception as e:  # One bad line must not end a run over millions
+            results.append((line, 'error', json.dumps({'error': '%s: %s' % (type(e).__name__, e)})))
+            continue
+        record['lang'] = lang
+        record['intent'] = intent
+        if with_response:
+            record['response'] = payload['response']
+        results.append((line, intent, json.dumps(record, ensure_ascii=False)))
+    return results
+
+
+def _worker(max_sessions, with_response, tasks, results):
+    _start_worker(max_sessions)
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        chunk, turns = task
+        results.put((chunk, classify_turns(turns, with_response)))
+
+
+def parse_line(text, message_field, session_field):
+    """(session_id or None, record, message) for one input line; record is None when it is not a JSON object"""
+    try:
+        record = json.loads(text)
+    except ValueError:
+        return None, None, None
+    if not isinstance(record, dict):
+        return None, None, None
+    message = str(record.get(message_field) or '').strip()
+    session_id = record.get(session_field)
+    return (None if session_id is None else str(session_id)), record, message
+
+
+def read_chunks(lines, chunk_size, message_field, session_field):
+    """Chunks of [(line, session_id, record, message)] turns; unparseable lines carry their error output"""
+    chunk = []
+    for line, text in enumerate(lines):
+        session_id, record, message = parse_line(text, message_field, session_field)
+        if record is None:
+            chunk.append((line, None, None, INVALID_RESULT))
+        elif not message:
+            chunk.append((line, None, None, EMPTY_RESULT))
+        else:
+            chunk.append((line, session_id, record, message))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def split_chunk(chunk, workers):
+    """Per-worker turn lists (by session id hash) and the lines answered without the pipeline"""
+    parts = [[] for _ in range(workers)]
+    skipped = []
+    for turn in chunk:
+        line, session_id, record, message = turn
+        if record is None:
+            skipped.append((line, 'error' if message is INVALID_RESULT else 'empty', message))
+        elif session_id is None:
+            parts[line % workers].append(turn)  # No session: any worker will do
+        else:
+            parts[zlib.crc32(session_id.encode('utf-8')) % workers].append(turn)
+    return parts, skipped
+
+
+class Classifier:
+    """Classify a stream of JSONL lines on `workers` processes, writing results in input order"""
+
+    def __init__(self, workers=None, chunk_size=256, window=None, max_sessions=10000, with_response=True,
+                 message_field='message', session_field='session_id'):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.window = window or self.workers * 4  # Chunks in flight
+        self.max_sessions = max_sessions
+        self.with_response = with_response
+        self.message_field = message_field
+        self.session_field = session_field
+        self.counts = {}  # Intent (or 'empty'/'error') -> lines
+        self.lines = 0
+
+    def _write(self, out, results):
+        for line, intent, text in results:
+            self.counts[intent] = self.counts.get(intent, 0) + 1
+            out.write(text)
+            out.write('\n')
+            self.lines += 1
+
+    def run(self, lines, out):
+        """Classify every line of `lines`, writing to `out`; returns a summary"""
+        started = time.perf_counter()
+        chunks = read_chunks(lines, self.chunk_size, self.message_field, self.session_field)
+        if self.workers == 1:
+            _start_worker(self.max_sessions)
+            for chunk in chunks:
+                parts, skipped = split_chunk(chunk, 1)
+                self._write(out, heapq.merge(skipped, classify_turns(parts[0], self.with_response)))
+        else:
+            self._run_pool(chunks, out)
+        return self.summary(time.perf_counter() - started)
+
+    def _run_pool(self, chunks, out):
+        context = multiprocessing.get_context()
+        results = context.Queue()
+        tasks = [context.Queue() for _ in range(self.workers)]
+        processes = [context.Process(target=_worker, args=(self.max_sessions, self.with_response, tasks[number], results),
+                                     daemon=True)
+                     for number in range(self.workers)]
+        for process in processes:
+            process.start()
+        pending = {}  # Chunk number -> [parts still out, finished parts]
+        next_chunk = 0  # Next chunk to write
+
+        def receive():
+            nonlocal next_chunk
+            while True:
+                try:
+                    chunk, part = results.get(timeout=1.0)
+                    break
+                except queue.Empty:
+                    if any(process.exitcode not in (None, 0) for process in processes):
+                        raise RuntimeError('a classify worker exited unexpectedly')
+            state = pending[chunk]
+            state[0] -= 1
+            state[1].append(part)
+            # Write every chunk that is complete and next in input order
+            while next_chunk in pending and pending[next_chunk][0] == 0:
+                self._write(out, heapq.merge(*pending.pop(next_chunk)[1]))
+                next_chunk += 1
+
+        try:
+            for number, chunk in enumerate(chunks):
+                while len(pending) >= self.window:
+                    receive()
+                parts, skipped = split_chunk(chunk, self.workers)
+                sent = [worker for worker, part in enumerate(parts) if part]
+                pending[number] = [len(sent), [skipped]]
+                for worker in sent:
+                    tasks[worker].put((number, parts[worker]))
+                if not sent:
+                    pending[number][0] = 1
+                    results.put((number, []))
+            while pending:
+                receive()
+        except BaseException:
+            for process in processes:
+                process.terminate()
+            raise
+        for task_queue in tasks:
+            task_queue.put(None)
+        for process in processes:
+            process.join()
+
+    def summary(self, seconds):
+        return {
+            'lines': self.lines,
+            'seconds': seconds,
+            'lines_per_second': self.lines / seconds if seconds else 0.0,
+            'intents': dict(sorted(self.counts.items(), key=lambda item: -item[1])),
+        }
+
+
+def open_input(path):
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def print_summary(summary, file=sys.stderr):
+    print('classified %d lines in %.2f s (%.0f lines/s)'
+          % (summary['lines'], summary['seconds'], summary['lines_per_second']), file=file)
+    for intent, count in summary['intents'].items():
+        print('  %8d  %5.1f%%  %s' % (count, 100.0 * count / summary['lines'], intent), file=file)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Classify a JSONL dump of chat turns without the web server')
+    parser.add_argument('input', help='JSONL file (.gz is read compressed, - for stdin)')
+    parser.add_argument('-o', '--output', default='-', help='where to write results (default: stdout)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--chunk-size', type=int, default=256, help='lines sent to the workers at a time')
+    parser.add_argument('--max-sessions', type=int, default=10000, help='sessions each worker remembers')
+    parser.add_argument('--message-field', default='message')
+    parser.add_argument('--session-field', default='session_id',
+                        help='lines without it are answered as single-turn sessions')
+    parser.add_argument('--no-response', action='store_true', help='leave the reply text out of the results')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    classifier = Classifier(args.workers, args.chunk_size, max_sessions=args.max_sessions,
+                            with_response=not args.no_response, message_field=args.message_field,
+                            session_field=args.session_field)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        with open_input(args.input) as lines:
+            summary = classifier.run(lines, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print_summary(summary)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
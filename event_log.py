@@ -0,0 +1,259 @@
+"""Append-only conversation event log: a bounded queue in front of a batched background writer.
+
+append() only puts a tuple on an in-memory queue; a writer thread turns
+queued events into JSON lines and writes them in batches to
+
+    <directory>/events-<start time>-<pid>.jsonl
+
+starting a new file when the current one passes `max_bytes` or is older
+than `max_age` seconds. Each process writes its own files, so gunicorn
+workers never interleave lines. When the queue is full, append() waits up to
+`block_timeout` seconds for room (0: never waits) and then drops the event;
+drops are counted, never raised into the request.
+
+read_events() streams the log back in time order (one open file per log
+file, merged lazily), and `replay` runs it through the chat pipeline:
+
+    python event_log.py cat <directory>
+    python event_log.py replay <directory> [limit]
+"""
+import heapq
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+FILE_PREFIX = 'events-'
+FILE_SUFFIX = '.jsonl'
+# 'never' leaves flushing to disk to the OS; 'rotate' fsyncs each file as it is
+# closed; 'batch' fsyncs after every written batch
+FSYNC_MODES = ('never', 'rotate', 'batch')
+
+
+class EventLog:
+    """Non-blocking writer of one event per chat turn"""
+
+    def __init__(self, directory, max_queue=10000, batch_size=512, flush_interval=0.2,
+                 max_bytes=64 * 1024 * 1024, max_age=3600, fsync='rotate', block_timeout=0.0, clock=time.time):
+        if fsync not in FSYNC_MODES:
+            raise ValueError('fsync must be one of %s' % ', '.join(FSYNC_MODES))
+        self.directory = directory
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.fsync = fsync
+        self.block_timeout = block_timeout
+        self.clock = clock
+        self._queue = []
+        self._lock = threading.Lock()
+        self._queued = threading.Condition(self._lock)  # Signalled when a batch is ready
+        self._space = threading.Condition(self._lock)  # Signalled when the writer takes the queue
+        # One flush at a time, so batches reach the file in queue order
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened = 0.0
+        self.path = None
+        self.counts = {'queued': 0, 'written': 0, 'dropped': 0, 'errors': 0}
+        self.batches = 0
+        self.rotations = 0
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_loop, name='event-writer', daemon=True)
+        self._writer.start()
+
+    def append(self, session_id, message, lang, intent, latency):
+        """Queue one turn (latency in seconds); False if it was dropped because the queue is full"""
+        with self._lock:
+            if len(self._queue) >= self.max_queue or self._stop.is_set():
+                if not self.block_timeout or self._stop.is_set():
+                    self.counts['dropped'] += 1
+                    return False
+                self._queued.notify()
+                # Back-pressure: hold the request briefly rather than lose the event
+                self._space.wait_for(lambda: len(self._queue) < self.max_queue or self._stop.is_set(),
+                                     self.block_timeout)
+                if len(self._queue) >= self.max_queue or self._stop.is_set():
+                    self.counts['dropped'] += 1
+                    return False
+            # Stamped under the lock, so every file is in timestamp order
+            self._queue.append((self.clock(), session_id, message, lang, intent, latency))
+            self.counts['queued'] += 1
+            if len(self._queue) >= self.batch_size:
+                self._queued.notify()
+        return True
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _open(self):
+        started = self.clock()
+        name = '%s%s-%d%s' % (FILE_PREFIX, time.strftime('%Y%m%dT%H%M%S', time.gmtime(started)),
+                              os.getpid(), FILE_SUFFIX)
+        path = os.path.join(self.directory, name)
+        for number in itertools.count(1):
+            if not os.path.exists(path):
+                break
+            path = os.path.join(self.directory, '%s.%d%s' % (name[:-len(FILE_SUFFIX)], number, FILE_SUFFIX))
+        self._file = open(path, 'ab')
+        self._file_bytes = 0
+        self._file_opened = started
+        self.path = path
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        self._file.flush()
+        if self.fsync != 'never':
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+    def _write(self, events):
+        if self._file is not None and (self._file_bytes >= self.max_bytes
+                                       or self.clock() - self._file_opened >= self.max_age):
+            self._close_file()
+            self.rotations += 1
+        if self._file is None:
+            self._open()
+        data = ''.join(json.dumps({
+            'ts': round(ts, 6), 'session_id': session_id, 'message': message, 'lang': lang,
+            'intent': intent, 'latency_ms': round(latency * 1000, 3),
+        }, ensure_ascii=False) + '\n' for ts, session_id, message, lang, intent, latency in events).encode('utf-8')
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync == 'batch':
+            os.fsync(self._file.fileno())
+        self._file_bytes += len(data)
+        self.batches += 1
+
+    def flush(self):
+        """Write every queued event now; returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                events, self._queue = self._queue, []
+                self._space.notify_all()
+            if not events:
+                return 0
+            try:
+                # In batch_size slices: encoding a whole backlog at once would
+                # hold the GIL long enough to stall request threads
+                for start in range(0, len(events), self.batch_size):
+                    self._write(events[start:start + self.batch_size])
+            except (OSError, ValueError):
+                # A full or read-only disk must not take the writer down; the
+                # next batch retries on a fresh file
+                self.counts['errors'] += 1
+                self.counts['dropped'] += len(events)
+                if self._file is not None:
+                    try:
+                        self._file.close()
+                    except OSError:
+                        pass
+                    self._file = None
+                return 0
+            self.counts['written'] += len(events)
+            return len(events)
+
+    def _write_loop(self):
+        while not self._stop.is_set():
+            with self._lock:
+                if len(self._queue) < self.batch_size:
+                    self._queued.wait(self.flush_interval)
+            self.flush()
+        self.flush()
+
+    def close(self):
+        """Stop the writer, write what is still queued and close the file"""
+        self._stop.set()
+        with self._lock:
+            self._queued.notify_all()
+            self._space.notify_all()
+        self._writer.join()
+        self.flush()
+        with self._flush_lock:
+            self._close_file()
+
+    def stats(self):
+        return dict(self.counts, queue=len(self._queue), max_queue=self.max_queue, batches=self.batches,
+                    rotations=self.rotations, path=self.path)
+
+
+def log_files(directory):
+    """Event log files under `directory`, sorted by name (start time)"""
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.startswith(FILE_PREFIX) and name.endswith(FILE_SUFFIX))
+
+
+def _read_file(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:  # A line cut short by a crash
+                continue
+            if isinstance(event, dict) and 'ts' in event:
+                yield event
+
+
+def read_events(directory):
+    """Every logged event as a dict, in timestamp order across files and worker processes.
+
+    Each file is already in time order, so the files are merged lazily and
+    memory stays flat however long the log is.
+    """
+    return heapq.merge(*(_read_file(path) for path in log_files(directory)), key=lambda event: event['ts'])
+
+
+def replay(events, limit=None):
+    """Run logged turns through the chat pipeline; returns a summary of what changed"""
+    os.environ['EVENT_LOG_DIR'] = ''  # Replayed turns must not be logged again
+    os.environ.setdefault('WARMUP', '0')
+    import app
+
+    summary = {'events': 0, 'intent_changed': 0, 'lang_changed': 0, 'seconds': 0.0}
+    changes = {}
+    started = time.perf_counter()
+    for event in itertools.islice(events, limit):
+        session_id = event['session_id']
+        with app.sessions.turn(session_id):
+            session = app.touch_session(session_id)
+            _, lang, intent = app.answer_message(event['message'], session)
+            app.save_session(session)
+        summary['events'] += 1
+        if lang != event['lang']:
+            summary['lang_changed'] += 1
+        if intent != event['intent']:
+            summary['intent_changed'] += 1
+            key = '%s -> %s' % (event['intent'], intent)
+            changes[key] = changes.get(key, 0) + 1
+    summary['seconds'] = time.perf_counter() - started
+    summary['changes'] = dict(sorted(changes.items(), key=lambda item: -item[1]))
+    return summary
+
+
+def main(argv):
+    if len(argv) < 2 or argv[0] not in ('cat', 'replay'):
+        print('usage: python event_log.py cat <directory>\n'
+              '       python event_log.py replay <directory> [limit]', file=sys.stderr)
+        return 2
+    events = read_events(argv[1])
+    if argv[0] == 'cat':
+        for event in events:
+            print(json.dumps(event, ensure_ascii=False))
+        return 0
+    summary = replay(events, int(argv[2]) if len(argv) > 2 else None)
+    rate = summary['events'] / summary['seconds'] if summary['seconds'] else 0.0
+    print('replayed %d turns in %.2f s (%.0f turns/s); intent changed for %d, language for %d'
+          % (summary['events'], summary['seconds'], rate, summary['intent_changed'], summary['lang_changed']))
+    for change, count in summary['changes'].items():
+        print('  %6d  %s' % (count, change))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,206 @@
+"""Local outfit image catalog: tagged images, pre-generated thumbnails and a memory-mapped index.
+
+Images live under one directory; their tags are the lowercased words of the
+relative path, so images/wedding/red-silk-saree.jpg is tagged wedding, red,
+silk and saree; name directories after intents (e.g. men_office). Building
+the catalog (needs Pillow) writes a thumbnail per image in each of
+THUMB_WIDTHS under thumbs/<width>/ and a binary index:
+
+    MAGIC, version, header length         HEADER struct
+    header                                JSON: widths, image names, key -> (offset, count)
+    postings                              uint32 image ids, one run per key
+
+Keys are single tags and "tag+tag" pairs, so picking images for an intent
+and a colour is a dictionary lookup. At runtime the index is memory-mapped
+and only the small header is parsed.
+
+    python image_catalog.py build images/
+"""
+from array import array
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+
+try:
+    from PIL import Image
+except ImportError:  # Only needed to build the catalog
+    Image = None
+
+INDEX_NAME = 'catalog.idx'
+THUMB_DIR = 'thumbs'
+THUMB_WIDTHS = (160, 320, 640)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+MAGIC = b'FBIMGIDX'
+INDEX_VERSION = 1
+HEADER = struct.Struct('<8sII')
+TAG_SPLIT = re.compile(r'[^0-9a-z_ಀ-೿]+')
+
+
+def image_tags(relative_path):
+    """Tags of an image: the words of its directory names and file name"""
+    stem = os.path.splitext(relative_path)[0].lower()
+    return sorted({word for word in TAG_SPLIT.split(stem) if word and not word.isdigit()})
+
+
+def selection_keys(tags):
+    keys = list(tags)
+    for position, first in enumerate(tags):
+        for second in tags[position + 1:]:
+            keys.append(first + '+' + second)
+    return keys
+
+
+def pair_key(first, second):
+    return first + '+' + second if first < second else second + '+' + first
+
+
+def _scan(directory):
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(name for name in dirs if not (root == directory and name == THUMB_DIR))
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(root, name), directory))
+    return found
+
+
+def _write_thumbnails(source, directory, name, widths, quality):
+    targets = [os.path.join(directory, THUMB_DIR, str(width), name) for width in widths]
+    if all(os.path.exists(target) for target in targets):
+        return
+    with Image.open(source) as image:
+        image = image.convert('RGB')
+        for width, target in zip(widths, targets):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            thumb = image.copy()
+            thumb.thumbnail((width, width * 2))
+            thumb.save(target, 'JPEG', quality=quality, optimize=True, progressive=True)
+
+
+def build(directory, widths=THUMB_WIDTHS, quality=80):
+    """Write thumbnails for every image under `directory` and its index; returns the image count"""
+    if Image is None:
+        raise RuntimeError('building the image catalog needs Pillow (pip install Pillow)')
+    names = []
+    postings = {}
+    for image_id, relative_path in enumerate(_scan(directory)):
+        source = os.path.join(directory, relative_path)
+        with open(source, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:10]
+        # Content-hashed names: a changed image gets a new URL, so thumbnails can be cached forever
+        stem = '-'.join(TAG_SPLIT.split(os.path.splitext(relative_path)[0].lower())).strip('-')
+        name = '%s.%s.jpg' % (stem, digest)
+        _write_thumbnails(source, directory, name, widths, quality)
+        names.append(name)
+        for key in selection_keys(image_tags(relative_path)):
+            postings.setdefault(key, []).append(image_id)
+
+    keys = {}
+    flat = array('I')
+    for key in sorted(postings):
+        keys[key] = (len(flat), len(postings[key]))
+        flat.extend(postings[key])
+    header = json.dumps({'widths': list(widths), 'images': names, 'keys': keys},
+                        ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    header += b' ' * (-(HEADER.size + len(header)) % 4)  # Align the postings for cast('I')
+    path = os.path.join(directory, INDEX_NAME)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, INDEX_VERSION, len(header)))
+        f.write(header)
+        f.write(flat.tobytes())
+    os.replace(path + '.tmp', path)
+    return len(names)
+
+
+class ImageCatalog:
+    """Read side of the catalog; empty when `directory` has no index"""
+
+    def __init__(self, directory, url_prefix='/images', display_width=320):
+        self.directory = directory
+        self.names = []
+        self.widths = ()
+        self.images = []  # Per image id: the payload entry sent to the client
+        self._keys = {}
+        self._postings = ()
+        self._mmap = None
+        path = os.path.join(directory, INDEX_NAME)
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != INDEX_VERSION:
+            raise ValueError('%s is not a version %d image catalog index; rebuild it' % (path, INDEX_VERSION))
+        header = json.loads(self._mmap[HEADER.size:HEADER.size + header_size])
+        self._postings = memoryview(self._mmap)[HEADER.size + header_size:].cast('I')
+        self._keys = {key: tuple(entry) for key, entry in header['keys'].items()}
+        self.names = header['images']
+        self.widths = tuple(header['widths'])
+        display = min(self.widths, key=lambda width: abs(width - display_width))
+        self.images = [{
+            'src': '%s/%d/%s' % (url_prefix, display, name),
+            'srcset': ', '.join('%s/%d/%s %dw' % (url_prefix, width, name, width) for width in self.widths),
+        } for name in self.names]
+
+    def __len__(self):
+        return len(self.names)
+
+    def thumbnail_dir(self, width):
+        if width not in self.widths:
+            return None
+        return os.path.join(self.directory, THUMB_DIR, str(width))
+
+    def select(self, keys, shown, count=3, max_scan=64):
+        """Up to `count` image ids not yet marked in `shown`, trying `keys` in order.
+
+        `shown` is a bytearray bitset (bit i of byte i // 8 per image id),
+        marked in place; it grows only to the highest id picked. Looks at no
+        more than `max_scan` postings, so the cost per response is bounded
+        however large the catalog.
+        """
+        picked = []
+        scanned = 0
+        postings = self._postings
+        for key in keys:
+            entry = self._keys.get(key)
+            if entry is None:
+                continue
+            offset, length = entry
+            for position in range(offset, offset + length):
+                image_id = postings[position]
+                index = image_id >> 3
+                bit = 1 << (image_id & 7)
+                if index >= len(shown):
+                    shown.extend(bytes(index + 1 - len(shown)))
+                if not shown[index] & bit:
+                    shown[index] |= bit
+                    picked.append(image_id)
+                    if len(picked) == count:
+                        return picked
+                scanned += 1
+                if scanned >= max_scan:
+                    return picked
+        return picked
+
+    def close(self):
+        if self._mmap is not None:
+            self._postings.release()
+            self._mmap.close()
+            self._mmap = None
+
+
+def main(argv):
+    if len(argv) != 2 or argv[0] != 'build':
+        print('usage: python image_catalog.py build <image directory>', file=sys.stderr)
+        return 2
+    count = build(argv[1])
+    print('indexed %d images into %s' % (count, os.path.join(argv[1], INDEX_NAME)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,164 @@
+"""Declarative intent and response rules compiled into per-intent dispatch tables."""
+from collections import namedtuple
+from functools import lru_cache
+
+# One row of the extract_intent table. A row fires when every feature group in
+# all_of was hit and, if last_intents/link are given, the conversation is in that
+# context (last_intent in last_intents OR the link group's bit is set in keyword_links). `result` is an
+# intent name (may use {last_intent}) or a callable returning an intent or None.
+IntentRule = namedtuple(
+    'IntentRule',
+    'result all_of last_intents link exact max_words needs_last_intent',
+    defaults=((), None, None, None, None, False),
+)
+
+# One row of the generate_fashion_response table. `intents` is None (any), a set
+# of intent names or a predicate on the intent. `update` is 'turn' (store intent,
+# query, keywords and links) or 'keywords' (only last_intent and keywords).
+ResponseRule = namedtuple(
+    'ResponseRule',
+    'response intents all_of set_intent update',
+    defaults=(None, (), None, 'turn'),
+)
+
+
+def intent_names(intent_rules, response_rules, default):
+    """Every intent name the rules can produce, except "{last_intent}_continue" chains.
+
+    A template with last_intents ("men_{last_intent}") stands for one name
+    per listed intent. Callable results must only return names found here,
+    with or without "_continue" suffixes.
+    """
+    names = [default]
+    for rule in intent_rules:
+        result = rule.result
+        if callable(result):
+            continue
+        if '{last_intent}' not in result:
+            names.append(result)
+        elif rule.last_intents is not None:
+            names.extend(result.format(last_intent=intent) for intent in rule.last_intents)
+    names.extend(rule.set_intent for rule in response_rules if rule.set_intent)
+    return list(dict.fromkeys(names))
+
+
+class FeatureIndex:
+    """Maps matched vocabulary words to a bitmask of feature groups"""
+
+    def __init__(self, groups):
+        self.bits = {}
+        self._word_bits = {}
+        for position, (name, words) in enumerate(groups.items()):
+            bit = 1 << position
+            self.bits[name] = bit
+            for word in words:
+                self._word_bits[word] = self._word_bits.get(word, 0) | bit
+
+    @property
+    def words(self):
+        return self._word_bits.keys()
+
+    def mask(self, hits):
+        word_bits = self._word_bits
+        mask = 0
+        for word in hits:
+            mask |= word_bits.get(word, 0)
+        return mask
+
+    def require(self, names):
+        required = 0
+        for name in names:
+            required |= self.bits[name]
+        return required
+
+
+class IntentTable:
+    """Compiled extract_intent rules, pre-filtered per last_intent.
+
+    `links` maps link group names to their bit in the keyword_links bitmask; a
+    name with no group (bit 0) can never be linked.
+    """
+
+    def __init__(self, rules, features, links, default):
+        self.default = default
+        self._rules = tuple(
+            (features.require(rule.all_of),
+             frozenset(rule.last_intents) if rule.last_intents is not None else None,
+             links.get(rule.link, 0) if rule.link is not None else None,
+             frozenset(rule.exact) if rule.exact is not None else None,
+             rule.max_words,
+             rule.needs_last_intent,
+             rule.result)
+            for rule in rules
+        )
+        self.candidates = lru_cache(maxsize=1024)(self._candidates)
+
+    def _candidates(self, last_intent):
+        candidates = []
+        for required, last_intents, link, exact, max_words, needs_last, result in self._rules:
+            if needs_last and not last_intent:
+                continue
+            if last_intents is not None and last_intent in last_intents:
+                link = None  # context already satisfied by last_intent
+            elif last_intents is not None or link is not None:
+                if link is None:
+                    continue
+            else:
+                link = None
+            if isinstance(result, str) and '{last_intent}' in result:
+                result = result.format(last_intent=last_intent)
+            candidates.append((required, link, exact, max_words, result))
+        return tuple(candidates)
+
+    def resolve(self, mask, text_lower, word_count, last_intent, keyword_links, *args):
+        stripped = None
+        for required, link, exact, max_words, result in self.candidates(last_intent):
+            if mask & required != required:
+                continue
+            if link is not None and not keyword_links & link:
+                continue
+            if max_words is not None and word_count > max_words:
+                continue
+            if exact is not None:
+                if stripped is None:
+                    stripped = text_lower.strip()
+                if stripped not in exact:
+                    continue
+            if callable(result):
+                result = result(mask, text_lower, last_intent, *args)
+                if result is None:
+                    continue
+            return result
+        return self.default
+
+
+class ResponseTable:
+    """Compiled generate_fashion_response rules, pre-filtered per intent"""
+
+    def __init__(self, rules, features, default):
+        self.default = default
+        self._rules = tuple(
+            (rule.intents, features.require(rule.all_of), rule.response, rule.set_intent, rule.update)
+            for rule in rules
+        )
+        self.candidates = lru_cache(maxsize=1024)(self._candidates)
+
+    def _candidates(self, intent):
+        candidates = []
+        for intents, required, response, set_intent, update in self._rules:
+            if intents is None:
+                pass
+            elif callable(intents):
+                if not intents(intent):
+                    continue
+            elif intent not in intents:
+                continue
+            candidates.append((required, response, set_intent, update))
+        return tuple(candidates)
+
+    def resolve(self, intent, mask):
+        """Return (response id, intent to remember, context update mode)"""
+        for required, response, set_intent, update in self.candidates(intent):
+            if mask & required == required:
+                return response, set_intent or intent, update
+        return self.default, intent, 'turn'
@@ -0,0 +1,220 @@
+"""Single-pass keyword matching (Aho-Corasick) shared by the chat classifiers."""
+from bisect import bisect_right
+from functools import lru_cache
+import re
+
+KANNADA_SCRIPT = re.compile('[ಀ-೿]')
+
+
+class MatchResult:
+    """All vocabulary hits found in one lowercased message"""
+    __slots__ = ('text', 'hits', 'spans', '_vocabularies', '_tokens')
+
+    def __init__(self, text, hits, spans, vocabularies):
+        self.text = text
+        self.hits = hits
+        self.spans = spans
+        self._vocabularies = vocabularies
+        self._tokens = None
+
+    def has(self, category):
+        return not self.hits.isdisjoint(self._vocabularies.get(category, ()))
+
+    def category(self, category):
+        return self.hits & self._vocabularies.get(category, frozenset())
+
+    @property
+    def categories(self):
+        """Hits grouped by category (only categories with at least one hit)"""
+        grouped = {}
+        for category, words in self._vocabularies.items():
+            found = self.hits & words
+            if found:
+                grouped[category] = found
+        return grouped
+
+    def any_of(self, words):
+        return not self.hits.isdisjoint(words)
+
+    @property
+    def tokens(self):
+        """(start, end, token) for each whitespace-separated token"""
+        if self._tokens is None:
+            # Only whitespace lies between two tokens, so each one is found
+            # by searching from the end of the previous one
+            tokens = []
+            find = self.text.find
+            end = 0
+            for token in self.text.split():
+                start = find(token, end)
+                end = start + len(token)
+                tokens.append((start, end, token))
+            self._tokens = tokens
+        return self._tokens
+
+    @property
+    def word_count(self):
+        if self._tokens is None:
+            return len(self.text.split())
+        return len(self._tokens)
+
+    def tokens_containing(self, category):
+        """Tokens (in message order) that contain a hit of the given category"""
+        words = self.category(category)
+        if not words:
+            return []
+        matched = set()
+        tokens = self.tokens
+        starts = [t[0] for t in tokens]
+        for start, end, word in self.spans:
+            if word not in words:
+                continue
+            # Find the token whose span encloses this hit
+            index = bisect_right(starts, start) - 1
+            if index >= 0 and end <= tokens[index][1]:
+                matched.add(index)
+        return [tokens[i][2] for i in sorted(matched)]
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton compiled once from category-tagged vocabularies"""
+
+    def __init__(self, vocabularies):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        self._tags = {}
+        self._vocabularies = {}
+
+        for category, words in vocabularies.items():
+            for word in words:
+                word = word.lower()
+                if not word:
+                    continue
+                self._tags.setdefault(word, set()).add(category)
+                if KANNADA_SCRIPT.search(word):
+                    self._tags[word].add('kannada')
+                self._insert(word)
+
+        self._tags = {word: frozenset(tags) for word, tags in self._tags.items()}
+        for word, tags in self._tags.items():
+            for category in tags:
+                self._vocabularies.setdefault(category, set()).add(word)
+        self._vocabularies = {c: frozenset(w) for c, w in self._vocabularies.items()}
+        self._build_failure_links()
+        # Deterministic transitions, filled in lazily as characters are seen
+        self._delta = [dict(edges) for edges in self._goto]
+        self._alphabet = frozenset(char for edges in self._goto for char in edges)
+
+    def _insert(self, word):
+        state = 0
+        for char in word:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                self._goto[state][char] = nxt
+            state = nxt
+        if word not in self._output[state]:
+            self._output[state] = self._output[state] + (word,)
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    @property
+    def vocabulary(self):
+        return self._tags.keys()
+
+    def tags(self, word):
+        return self._tags.get(word, frozenset())
+
+    def _transition(self, state, char):
+        origin = state
+        while state and char not in self._goto[state]:
+            state = self._fail[state]
+        target = self._goto[state].get(char, 0)
+        self._delta[origin][char] = target
+        return target
+
+    def scan(self, text):
+        """Scan lowercased text once and return every vocabulary hit"""
+        delta = self._delta
+        output = self._output
+        alphabet = self._alphabet
+        state = 0
+        spans = []
+        for index, char in enumerate(text):
+            if char not in alphabet:
+                state = 0
+                continue
+            nxt = delta[state].get(char)
+            state = self._transition(state, char) if nxt is None else nxt
+            if output[state]:
+                end = index + 1
+                for word in output[state]:
+                    spans.append((end - len(word), end, word))
+
+        hits = frozenset([span[2] for span in spans])
+        return MatchResult(text, hits, spans, self._vocabularies)
+
+
+class KeywordGroupIndex:
+    """Token -> group bitmask, where bit i is set when the token contains a word of group i.
+
+    Every group word (and any `known` token) is resolved when the index is
+    built. Other tokens ("weddings", "redish") are resolved by scanning them
+    once with an automaton over the group words, and the result is memoized.
+    """
+
+    def __init__(self, groups, known=(), memo_size=4096):
+        self.groups = tuple(groups)
+        self._word_masks = {}
+        for bit, words in enumerate(groups.values()):
+            for word in words:
+                word = word.lower()
+                self._word_masks[word] = self._word_masks.get(word, 0) | (1 << bit)
+        self._matcher = KeywordMatcher({'group': self._word_masks})
+        self._index = {}
+        for token in (*self._word_masks, *known):
+            self._index[token] = self._scan(token)
+        self._memo_size = memo_size
+        self._fallback = lru_cache(maxsize=memo_size)(self._scan)
+
+    def __getstate__(self):
+        # The memo is a cache of this process's traffic; don't persist it
+        state = self.__dict__.copy()
+        del state['_fallback']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._fallback = lru_cache(maxsize=self._memo_size)(self._scan)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _scan(self, token):
+        mask = 0
+        for word in self._matcher.scan(token).hits:
+            mask |= self._word_masks[word]
+        return mask
+
+    def mask(self, token):
+        mask = self._index.get(token)
+        if mask is None:
+            return self._fallback(token)
+        return mask
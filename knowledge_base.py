@@ -0,0 +1,266 @@
+"""TF-IDF retrieval over the local style-tip knowledge base (knowledge/<lang>/*.md).
+
+Each file holds tips separated by blank lines; an optional "# Title" line is
+indexed with every tip of the file but not shown. Tips become hashed word
+unigrams and bigrams, weighted by TF-IDF and L2-normalised. The weights are
+stored column-wise (feature -> tips containing it), so scoring a query is a
+single np.bincount over the postings of its features, followed by
+np.argpartition for the top k.
+
+Tokenising is the slow part of a build, so the hashed features of every
+file are cached per language in <cache_dir>/<lang>.npz. A rebuild only
+re-reads files whose size or mtime changed.
+"""
+from collections import Counter
+from functools import lru_cache
+import json
+import os
+import re
+import tempfile
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # Retrieval is disabled without NumPy
+    np = None
+
+CACHE_VERSION = 1
+HASH_BITS = 22
+TIP_SEPARATOR = re.compile(r'\n\s*\n')
+WORD = re.compile(r'[0-9a-zà-ÿಀ-೿]+')
+
+# Words too common to say anything about a tip
+STOPWORDS = frozenset({
+    'a', 'an', 'the', 'and', 'or', 'but', 'for', 'with', 'to', 'of', 'in', 'on', 'at', 'by', 'from',
+    'is', 'are', 'be', 'can', 'do', 'does', 'should', 'would', 'will', 'it', 'its', 'this', 'that',
+    'i', 'me', 'my', 'you', 'your', 'we', 'they', 'them', 'what', 'which', 'how', 'when', 'so',
+    'some', 'any', 'all', 'more', 'most', 'very', 'too', 'as', 'if', 'not', 'no', 'please', 'tell',
+    'about', 'wear', 'good', 'best',
+})
+
+
+def tip_terms(text):
+    """Unigrams and bigrams of the words of `text` that are not stopwords"""
+    words = [word for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+    return words + [first + ' ' + second for first, second in zip(words, words[1:])]
+
+
+def hash_terms(terms):
+    # crc32 rather than hash(): feature ids must match across processes and runs
+    mask = (1 << HASH_BITS) - 1
+    return [zlib.crc32(term.encode('utf-8')) & mask for term in terms]
+
+
+def read_tips(path):
+    """(title, tip) pairs of one knowledge file"""
+    with open(path, encoding='utf-8') as f:
+        blocks = TIP_SEPARATOR.split(f.read())
+    title = ''
+    tips = []
+    for block in blocks:
+        block = block.strip()
+        if block.startswith('# '):
+            heading, _, block = block.partition('\n')
+            title = heading[2:].strip()
+            block = block.strip()
+        if block:
+            tips.append((title, ' '.join(block.split())))
+    return tips
+
+
+def _parse_file(path):
+    texts = []
+    features = []
+    counts = []
+    lengths = []
+    for title, tip in read_tips(path):
+        counted = Counter(hash_terms(tip_terms(title + ' ' + tip)))
+        texts.append(tip)
+        features.extend(counted.keys())
+        counts.extend(counted.values())
+        lengths.append(len(counted))
+    return {
+        'texts': texts,
+        'features': np.array(features, dtype=np.uint32),
+        'counts': np.array(counts, dtype=np.float32),
+        'lengths': np.array(lengths, dtype=np.int64),
+    }
+
+
+def _load_cache(path):
+    """The cached per-file features as {name: (size, mtime_ns, parsed)}, or {} if unusable"""
+    try:
+        with np.load(path) as data:
+            manifest = json.loads(bytes(data['manifest']).decode('utf-8'))
+            if manifest.get('version') != CACHE_VERSION or manifest.get('hash_bits') != HASH_BITS:
+                return {}
+            features, counts, lengths = data['features'], data['counts'], data['lengths']
+            texts = bytes(data['texts']).decode('utf-8').split('\0')
+    except (OSError, KeyError, ValueError):
+        return {}
+    files = {}
+    tip = feature = 0
+    for name, size, mtime_ns, tip_count in manifest['files']:
+        file_lengths = lengths[tip:tip + tip_count]
+        feature_count = int(file_lengths.sum())
+        files[name] = (size, mtime_ns, {
+            'texts': texts[tip:tip + tip_count],
+            'features': features[feature:feature + feature_count],
+            'counts': counts[feature:feature + feature_count],
+            'lengths': file_lengths,
+        })
+        tip += tip_count
+        feature += feature_count
+    return files
+
+
+def _save_cache(path, entries):
+    manifest = {
+        'version': CACHE_VERSION,
+        'hash_bits': HASH_BITS,
+        'files': [[name, size, mtime_ns, len(parsed['texts'])] for name, size, mtime_ns, parsed in entries],
+    }
+    texts = '\0'.join(text for _, _, _, parsed in entries for text in parsed['texts'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(
+                f,
+                manifest=np.frombuffer(json.dumps(manifest).encode('utf-8'), dtype=np.uint8),
+                texts=np.frombuffer(texts.encode('utf-8'), dtype=np.uint8),
+                features=_concat([parsed['features'] for _, _, _, parsed in entries], np.uint32),
+                counts=_concat([parsed['counts'] for _, _, _, parsed in entries], np.float32),
+                lengths=_concat([parsed['lengths'] for _, _, _, parsed in entries], np.int64),
+            )
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _concat(arrays, dtype):
+    return np.concatenate(arrays).astype(dtype, copy=False) if arrays else np.zeros(0, dtype=dtype)
+
+
+class TipIndex:
+    """Column-wise TF-IDF matrix over the tips of one language"""
+
+    def __init__(self, texts, features, counts, lengths):
+        self.texts = texts
+        size = len(texts)
+        order = np.argsort(features, kind='stable')
+        features = features[order]
+        self._tips = np.repeat(np.arange(size, dtype=np.int32), lengths)[order]
+        # Postings are grouped by feature; group[i] is the column of posting i
+        first = np.empty(len(features), dtype=bool)
+        first[:1] = True
+        np.not_equal(features[1:], features[:-1], out=first[1:])
+        starts = np.flatnonzero(first)
+        group = np.cumsum(first) - 1
+        self._features = features[starts]
+        self._starts = np.append(starts, len(features)).astype(np.int64)
+        frequency = np.diff(self._starts)
+        self._idf = (np.log((1.0 + size) / (1.0 + frequency)) + 1.0).astype(np.float32)
+        weights = (1.0 + np.log(counts[order])) * self._idf[group]
+        norms = np.sqrt(np.bincount(self._tips, weights=weights * weights, minlength=size))
+        weights /= np.maximum(norms, 1e-12)[self._tips]
+        self._weights = weights.astype(np.float32)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def search(self, text, k=3, min_score=0.15):
+        """Indexes and cosine scores of the best `k` tips scoring at least `min_score`"""
+        counted = Counter(hash_terms(tip_terms(text)))
+        if not counted or not len(self._features):
+            return []
+        query = np.fromiter(counted.keys(), dtype=np.uint32, count=len(counted))
+        positions = np.minimum(np.searchsorted(self._features, query), len(self._features) - 1)
+        known = self._features[positions] == query
+        if not known.any():
+            return []
+        positions = positions[known]
+        tf = 1.0 + np.log(np.fromiter(counted.values(), dtype=np.float32, count=len(counted)))
+        query_weights = tf[known] * self._idf[positions]
+        # Unknown features still count towards the query norm, so a query
+        # that is mostly unfamiliar words scores low everywhere
+        unknown = tf[~known]
+        query_weights /= np.sqrt(np.dot(query_weights, query_weights) + np.dot(unknown, unknown))
+
+        # Gather every posting of the query's features in one go
+        starts = self._starts[positions]
+        lengths = self._starts[positions + 1] - starts
+        total = int(lengths.sum())
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+        scores = np.bincount(self._tips[offsets], weights=self._weights[offsets] * np.repeat(query_weights, lengths),
+                             minlength=len(self.texts))
+        # Partition only the tips above the threshold: most scores are 0, and
+        # argpartition over that many ties is slow
+        best = np.flatnonzero(scores >= min_score)
+        if len(best) > k:
+            best = best[np.argpartition(scores[best], -k)[-k:]]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(int(tip), float(scores[tip])) for tip in best]
+
+
+def build_index(directory, cache_path=None):
+    """TipIndex over every *.md under `directory`, re-tokenising only files changed since the cache"""
+    cached = _load_cache(cache_path) if cache_path else {}
+    entries = []
+    changed = False
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.md'):
+            continue
+        stat = os.stat(os.path.join(directory, name))
+        previous = cached.pop(name, None)
+        if previous is not None and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+            parsed = previous[2]
+        else:
+            parsed = _parse_file(os.path.join(directory, name))
+            changed = True
+        entries.append((name, stat.st_size, stat.st_mtime_ns, parsed))
+    if cache_path and (changed or cached or not os.path.exists(cache_path)):
+        _save_cache(cache_path, entries)
+    return TipIndex(
+        [text for _, _, _, parsed in entries for text in parsed['texts']],
+        _concat([parsed['features'] for _, _, _, parsed in entries], np.uint32),
+        _concat([parsed['counts'] for _, _, _, parsed in entries], np.float32),
+        _concat([parsed['lengths'] for _, _, _, parsed in entries], np.int64),
+    )
+
+
+class KnowledgeBase:
+    """One TipIndex per language directory; queries in other languages use `default_lang`"""
+
+    def __init__(self, directory, cache_dir=None, default_lang='en', k=3, memo_size=1024):
+        self.directory = directory
+        self.cache_dir = cache_dir
+        self.default_lang = default_lang
+        self.k = k
+        self.indexes = {}
+        self.search = lru_cache(maxsize=memo_size)(self._search)
+
+    def build(self):
+        """(Re)build every language index; a no-op without NumPy or a knowledge directory"""
+        if np is None or not os.path.isdir(self.directory):
+            return self
+        indexes = {}
+        for lang in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, lang)
+            if os.path.isdir(path):
+                cache_path = os.path.join(self.cache_dir, lang + '.npz') if self.cache_dir else None
+                indexes[lang] = build_index(path, cache_path)
+        self.indexes = indexes
+        self.search.cache_clear()
+        return self
+
+    def __len__(self):
+        return sum(len(index) for index in self.indexes.values())
+
+    def _search(self, text_lower, lang):
+        """Texts of the best tips for a lowercased query, best first"""
+        index = self.indexes.get(lang) or self.indexes.get(self.default_lang)
+        if index is None:
+            return ()
+        return tuple(index.texts[tip] for tip, _ in index.search(text_lower, self.k))
@@ -0,0 +1,122 @@
+"""Tiered language detection: script check, known-vocabulary fast path, cached langdetect."""
+from collections import OrderedDict
+import re
+import threading
+import time
+
+from langdetect import DetectorFactory, detect, detector_factory
+from langdetect.lang_detect_exception import LangDetectException
+
+# langdetect is randomised unless seeded; fix it so the same text always maps
+# to the same language
+DetectorFactory.seed = 0
+
+KANNADA_LETTER = re.compile('[ಀ-೿]')
+LETTER = re.compile(r'[^\W\d_]')
+WORD = re.compile(r"[a-z]+(?:['-][a-z]+)*")
+
+# Function words that often accompany a single keyword ("for men", "a red saree")
+ENGLISH_FILLER_WORDS = frozenset({
+    'a', 'an', 'the', 'for', 'and', 'or', 'with', 'in', 'on', 'to', 'of', 'my', 'me', 'i',
+    'is', 'it', 'what', 'how', 'some', 'any', 'about', 'please', 'too', 'not', 'no',
+})
+
+TIERS = ('script', 'vocabulary', 'cache', 'langdetect')
+
+# One load per process, whichever detector (or thread) asks first
+_profiles_lock = threading.Lock()
+_profiles_loaded = False
+
+
+def load_profiles():
+    """Load langdetect's language profiles (about half a second) if no one has yet.
+
+    langdetect's own init_factory() publishes its factory before reading the
+    profiles, so a detect() racing with it fails with "Need to load
+    profiles". The factory is published here only once it is complete.
+    """
+    global _profiles_loaded
+    with _profiles_lock:
+        if not _profiles_loaded:
+            if detector_factory._factory is None:
+                factory = DetectorFactory()
+                factory.load_profile(detector_factory.PROFILES_DIRECTORY)
+                detector_factory._factory = factory
+            _profiles_loaded = True
+
+
+class LanguageDetector:
+    """Detect the language of a chat message, cheapest tier first"""
+
+    def __init__(self, vocabulary, max_fast_words=4, cache_size=4096, default='en'):
+        self.vocabulary = frozenset(word for word in vocabulary if word.isascii()) | ENGLISH_FILLER_WORDS
+        self.max_fast_words = max_fast_words
+        self.cache_size = cache_size
+        self.default = default
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = dict.fromkeys(TIERS, 0)
+        self.seconds = dict.fromkeys(TIERS, 0.0)
+
+    @property
+    def loaded(self):
+        return _profiles_loaded
+
+    def load(self):
+        """Load langdetect's language profiles now instead of on first use"""
+        load_profiles()
+
+    def detect(self, text):
+        start = time.perf_counter()
+        lang, tier = self._detect(text)
+        self.hits[tier] += 1
+        self.seconds[tier] += time.perf_counter() - start
+        return lang
+
+    def _detect(self, text):
+        # Tier 1: Kannada script wins when most of the letters are Kannada
+        kannada = len(KANNADA_LETTER.findall(text))
+        if kannada and kannada * 2 >= len(LETTER.findall(text)):
+            return 'kn', 'script'
+
+        # Tier 2: short ASCII messages made only of known vocabulary
+        if text.isascii():
+            words = WORD.findall(text.lower())
+            if words and len(words) <= self.max_fast_words and all(word in self.vocabulary for word in words):
+                return 'en', 'vocabulary'
+
+        # Tier 3/4: seeded langdetect behind a bounded LRU cache
+        with self._lock:
+            lang = self._cache.get(text)
+            if lang is not None:
+                self._cache.move_to_end(text)
+                return lang, 'cache'
+        if not _profiles_loaded:
+            # langdetect's own lazy load is not thread-safe
+            load_profiles()
+        try:
+            lang = detect(text)
+        except LangDetectException:
+            lang = self.default
+        with self._lock:
+            self._cache[text] = lang
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return lang, 'langdetect'
+
+    def stats(self):
+        """Per-tier hit counts/rates and the estimated time saved by the fast tiers"""
+        total = sum(self.hits.values())
+        slow_calls = self.hits['langdetect']
+        avg_slow = self.seconds['langdetect'] / slow_calls if slow_calls else 0.0
+        saved = 0.0
+        for tier in ('script', 'vocabulary', 'cache'):
+            saved += self.hits[tier] * avg_slow - self.seconds[tier]
+        return {
+            'total': total,
+            'hits': dict(self.hits),
+            'hit_rates': {tier: (count / total if total else 0.0) for tier, count in self.hits.items()},
+            'avg_langdetect_ms': avg_slow * 1000,
+            'estimated_ms_saved': max(saved, 0.0) * 1000,
+            'cache_size': len(self._cache),
+        }
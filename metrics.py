@@ -0,0 +1,197 @@
+"""Minimal Prometheus-style metrics: labelled histograms and counters, callback gauges.
+
+Everything is per process. Each thread records into series of its own, so
+observe() and inc() take no lock; scrapes add the threads' series up. When
+the registry is disabled, timed() hands back the undecorated function and
+counters ignore inc(), so instrumented code runs exactly as it would without
+instrumentation.
+"""
+from bisect import bisect_left
+from functools import wraps
+import threading
+import time
+
+# Pipeline stages take microseconds to milliseconds
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _PerThread:
+    """One dict per thread that has written, so writers never share one"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()  # Guards _shards, only taken by a thread's first write
+
+    def shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def shards(self):
+        with self._lock:
+            return list(self._shards)
+
+
+class Histogram:
+    """Latency histogram with one series per label value"""
+
+    def __init__(self, name, help, label, buckets=DEFAULT_BUCKETS, enabled=True):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self.enabled = enabled
+        self.stages = []  # Label values passed to timed(), in decoration order
+        self._threads = _PerThread()  # Per thread: label value -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, label_value, seconds):
+        index = bisect_left(self.buckets, seconds)
+        shard = self._threads.shard()
+        series = shard.get(label_value)
+        if series is None:
+            series = shard[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[index] += 1
+        series[-1] += seconds
+
+    def timed(self, label_value):
+        """Decorator recording the wrapped function's wall time under label_value"""
+        def decorate(func):
+            if not self.enabled:
+                return func
+            self.stages.append(label_value)
+            clock = time.perf_counter
+            observe = self.observe
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = clock()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    observe(label_value, clock() - start)
+            return wrapper
+        return decorate
+
+    def _merged(self):
+        series = {}
+        for shard in self._threads.shards():
+            for key, values in list(shard.items()):
+                total = series.get(key)
+                if total is None:
+                    series[key] = list(values)
+                else:
+                    series[key] = [a + b for a, b in zip(total, values)]
+        return series
+
+    def totals(self):
+        """{label value: (observations, total seconds)}"""
+        return {key: (sum(values[:-1]), values[-1]) for key, values in self._merged().items()}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        series = self._merged()
+        for label_value, values in sorted(series.items()):
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label}}} {_format_value(values[-1])}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter with one series per label value"""
+
+    def __init__(self, name, help, label, enabled=True):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.enabled = enabled
+        self._threads = _PerThread()  # Per thread: label value -> count
+
+    def inc(self, label_value, amount=1):
+        if not self.enabled:
+            return
+        values = self._threads.shard()
+        values[label_value] = values.get(label_value, 0) + amount
+
+    def render(self):
+        values = {}
+        for shard in self._threads.shards():
+            for label_value, value in list(shard.items()):
+                values[label_value] = values.get(label_value, 0) + value
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for label_value, value in sorted(values.items()):
+            lines.append(f'{self.name}{{{self.label}="{_escape(label_value)}"}} {_format_value(value)}')
+        return lines
+
+
+class Callback:
+    """Gauge or counter read from `func` at scrape time.
+
+    func returns a number, or a {label value: number} dict when `label` is set.
+    """
+
+    def __init__(self, name, help, kind, func, label=None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.func = func
+        self.label = label
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        value = self.func()
+        if self.label is None:
+            lines.append(f'{self.name} {_format_value(value)}')
+        else:
+            for label_value, number in sorted(value.items()):
+                lines.append(f'{self.name}{{{self.label}="{_escape(label_value)}"}} {_format_value(number)}')
+        return lines
+
+
+class MetricsRegistry:
+    """Collects metric families and renders them in Prometheus text format"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = []
+
+    def histogram(self, name, help, label, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, label, buckets, self.enabled))
+
+    def counter(self, name, help, label):
+        return self._register(Counter(name, help, label, self.enabled))
+
+    def gauge(self, name, help, func, label=None):
+        return self._register(Callback(name, help, 'gauge', func, label))
+
+    def counter_callback(self, name, help, func, label=None):
+        return self._register(Callback(name, help, 'counter', func, label))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,161 @@
+"""Per-language response catalogs: compiled from locales/<lang>.json, memory-mapped on first use.
+
+Each source file is a JSON object of response id -> text. The first time a
+language is needed, its source is compiled into <cache_dir>/<lang>.cat:
+
+    MAGIC, version, header length         HEADER struct
+    header                                JSON: source size/mtime, response id -> (offset, length)
+    texts                                 UTF-8, back to back
+
+and the compiled file is memory-mapped, so every worker process shares the
+same read-only pages. A text is decoded the first time it is asked for; a
+language is recompiled when its source file changes size or mtime.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+MAGIC = b'FBRESCAT'
+CATALOG_VERSION = 1
+HEADER = struct.Struct('<8sII')
+SOURCE_SUFFIX = '.json'
+COMPILED_SUFFIX = '.cat'
+
+
+def compile_catalog(source, target):
+    """Write the compiled form of one source catalog to `target` (atomically); returns the entry count"""
+    stat = os.stat(source)
+    with open(source, encoding='utf-8') as f:
+        texts = json.load(f)
+    entries = {}
+    blob = bytearray()
+    for key, text in texts.items():
+        if not isinstance(text, str):
+            raise ValueError('%s: response %r is not a string' % (source, key))
+        data = text.encode('utf-8')
+        entries[key] = (len(blob), len(data))
+        blob += data
+    header = json.dumps({'source': [stat.st_size, stat.st_mtime_ns], 'entries': entries},
+                        ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, CATALOG_VERSION, len(header)))
+            f.write(header)
+            f.write(blob)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(entries)
+
+
+class CompiledCatalog:
+    """The responses of one language, read from a memory-mapped compiled catalog"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != CATALOG_VERSION:
+            self._mmap.close()
+            raise ValueError('%s is not a version %d response catalog' % (path, CATALOG_VERSION))
+        header = json.loads(self._mmap[HEADER.size:HEADER.size + header_size])
+        self.source = tuple(header['source'])
+        self._base = HEADER.size + header_size
+        self._entries = header['entries']
+        self._texts = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """The text of response `key`, or None"""
+        text = self._texts.get(key)
+        if text is None:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            text = self._decode(entry)
+            self._texts[key] = text
+        return text
+
+    def texts(self):
+        """Every text, decoded without keeping them"""
+        return [self._decode(entry) for entry in self._entries.values()]
+
+    def _decode(self, entry):
+        offset, length = entry
+        start = self._base + offset
+        return self._mmap[start:start + length].decode('utf-8')
+
+    def close(self):
+        self._mmap.close()
+
+
+class ResponseCatalog:
+    """Responses by id and language; missing languages and ids fall back to `default_lang`"""
+
+    def __init__(self, directory, cache_dir, default_lang='en'):
+        self.directory = directory
+        self.cache_dir = cache_dir
+        self.default_lang = default_lang
+        self._catalogs = {}  # lang -> CompiledCatalog, or None when the language has no source
+        self._lock = threading.Lock()
+        self._default = self.catalog(default_lang)
+        if self._default is None:
+            raise FileNotFoundError('no %s%s in %s' % (default_lang, SOURCE_SUFFIX, directory))
+
+    def languages(self):
+        """Languages with a source catalog, loaded or not"""
+        return sorted(name[:-len(SOURCE_SUFFIX)] for name in os.listdir(self.directory)
+                      if name.endswith(SOURCE_SUFFIX))
+
+    def loaded(self):
+        return sorted(lang for lang, catalog in self._catalogs.items() if catalog is not None)
+
+    def catalog(self, lang):
+        """The CompiledCatalog of `lang`, compiling and mapping it on first use; None if there is none"""
+        try:
+            return self._catalogs[lang]
+        except KeyError:
+            pass
+        with self._lock:
+            if lang not in self._catalogs:
+                self._catalogs[lang] = self._load(lang)
+            return self._catalogs[lang]
+
+    def _load(self, lang):
+        source = os.path.join(self.directory, lang + SOURCE_SUFFIX)
+        # langdetect codes are plain identifiers; anything else never names a file
+        if not lang.replace('-', '').isalnum() or not os.path.isfile(source):
+            return None
+        stat = os.stat(source)
+        target = os.path.join(self.cache_dir, lang + COMPILED_SUFFIX)
+        try:
+            catalog = CompiledCatalog(target)
+            if catalog.source == (stat.st_size, stat.st_mtime_ns):
+                return catalog
+            catalog.close()
+        except (OSError, ValueError, struct.error):  # Missing, stale format or truncated
+            pass
+        compile_catalog(source, target)
+        return CompiledCatalog(target)
+
+    def get(self, key, lang):
+        catalog = self.catalog(lang)
+        if catalog is not None:
+            text = catalog.get(key)
+            if text is not None:
+                return text
+        text = self._default.get(key)
+        if text is None:
+            raise KeyError(key)
+        return text
@@ -0,0 +1,56 @@
+"""Versioned on-disk snapshot of compiled keyword structures, so new workers can skip rebuilding them.
+
+A snapshot is a pickle and is only loaded from a path the operator chose
+(RULES_SNAPSHOT); it is ignored, and rebuilt, when its format version or the
+fingerprint of the word lists it was built from no longer match.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+
+# Bump when KeywordMatcher/KeywordGroupIndex change their internal layout
+SNAPSHOT_VERSION = 1
+
+
+def _canonical(value):
+    # Sets and dict views iterate in hash order, which changes between processes
+    if isinstance(value, dict):
+        return [(key, _canonical(item)) for key, item in sorted(value.items())]
+    if isinstance(value, (set, frozenset, type({}.keys()))):
+        return sorted(value)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def fingerprint(*sources):
+    """Digest of everything the structures are built from"""
+    return hashlib.sha256(repr(_canonical(sources)).encode('utf-8')).hexdigest()
+
+
+def load(path, digest):
+    """The snapshotted structures, or None when the file is missing, unreadable or stale"""
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if not isinstance(snapshot, dict):
+        return None
+    if snapshot.get('version') != SNAPSHOT_VERSION or snapshot.get('fingerprint') != digest:
+        return None
+    return snapshot['structures']
+
+
+def save(path, digest, structures):
+    """Write atomically, so workers starting at the same time never read a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.rules-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({'version': SNAPSHOT_VERSION, 'fingerprint': digest, 'structures': structures},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
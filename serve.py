@@ -0,0 +1,133 @@
+"""Production entry point: run the chatbot under a real WSGI server.
+
+    python serve.py --workers 4 --threads 8 --port 8000
+
+Uses gunicorn (pre-fork workers x threads) where available and falls back to
+waitress (single process, threaded) elsewhere, e.g. on Windows. Debug mode
+and the reloader are never enabled here; use `python app.py` for development.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the fashion chatbot with a production WSGI server')
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ['WEB_CONCURRENCY']) if os.environ.get('WEB_CONCURRENCY') else None,
+                        help='worker processes (gunicorn only; default: one per CPU)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('THREADS', 4)),
+                        help='request threads per worker')
+    parser.add_argument('--keep-alive', type=int, default=5, help='seconds to hold idle keep-alive connections')
+    parser.add_argument('--timeout', type=int, default=30, help='seconds before a stuck worker is restarted')
+    parser.add_argument('--backlog', type=int, default=2048)
+    parser.add_argument('--max-requests', type=int, default=0,
+                        help='recycle a worker after this many requests (0 = never)')
+    parser.add_argument('--max-body', type=int, default=int(os.environ.get('MAX_REQUEST_BYTES', 256 * 1024)),
+                        help='largest accepted request body in bytes')
+    parser.add_argument('--max-request-line', type=int, default=4094)
+    parser.add_argument('--max-header-fields', type=int, default=50)
+    parser.add_argument('--session-db', default=os.environ.get('SESSION_DB'),
+                        help='SQLite file for shared sessions (defaults to sessions.db with more than one worker)')
+    parser.add_argument('--rules-snapshot', default=os.environ.get('RULES_SNAPSHOT'),
+                        help='Load compiled keyword structures from this file (written on first start)')
+    parser.add_argument('--event-log', default=os.environ.get('EVENT_LOG_DIR'),
+                        help='Append every turn to JSONL files in this directory (see event_log.py)')
+    parser.add_argument('--trusted-proxies', type=int, default=int(os.environ.get('TRUSTED_PROXIES', 0)),
+                        help='reverse proxies in front of the app; rate limits use the client IP they forward')
+    parser.add_argument('--server', choices=('gunicorn', 'waitress'), default=None)
+    return parser.parse_args(argv)
+
+
+def configure_environment(args):
+    """Settings app.py reads at import time; must be set before workers load it"""
+    os.environ['MAX_REQUEST_BYTES'] = str(args.max_body)
+    session_db = args.session_db
+    if not session_db and args.workers > 1:
+        # In-process sessions would give each worker its own view of a conversation
+        session_db = os.path.abspath('sessions.db')
+        print(f'Using {session_db} to share sessions between {args.workers} workers', file=sys.stderr)
+    if session_db:
+        os.environ['SESSION_DB'] = session_db
+    if args.rules_snapshot:
+        os.environ['RULES_SNAPSHOT'] = args.rules_snapshot
+    if args.trusted_proxies:
+        os.environ['TRUSTED_PROXIES'] = str(args.trusted_proxies)
+    if args.event_log:
+        os.environ['EVENT_LOG_DIR'] = os.path.abspath(args.event_log)
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class ChatbotApplication(BaseApplication):
+        def load_config(self):
+            settings = {
+                'bind': f'{args.host}:{args.port}',
+                'workers': args.workers,
+                'threads': args.threads,
+                'worker_class': 'gthread',
+                'keepalive': args.keep_alive,
+                'timeout': args.timeout,
+                'graceful_timeout': args.timeout,
+                'backlog': args.backlog,
+                'max_requests': args.max_requests,
+                'max_requests_jitter': args.max_requests // 10,
+                'limit_request_line': args.max_request_line,
+                'limit_request_fields': args.max_header_fields,
+                # App state (sessions, sweeper threads, SQLite connections) is
+                # created per worker, after the fork
+                'preload_app': False,
+                'accesslog': None,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app, start_warm_up
+            start_warm_up()
+            return app
+
+    ChatbotApplication().run()
+
+
+def run_waitress(args):
+    from waitress import serve
+    from app import app, start_warm_up
+
+    start_warm_up()
+    serve(app, host=args.host, port=args.port, threads=args.threads, backlog=args.backlog,
+          channel_timeout=args.timeout, max_request_body_size=args.max_body,
+          max_request_header_size=args.max_request_line * args.max_header_fields,
+          # X-Forwarded-For is read by the app (ProxyFix) when proxies are trusted
+          clear_untrusted_proxy_headers=not args.trusted_proxies)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = args.server
+    if server is None:
+        try:
+            import gunicorn  # noqa: F401
+            server = 'gunicorn'
+        except ImportError:
+            server = 'waitress'
+    if server == 'waitress':
+        # Only warn when workers were asked for, not for the one-per-CPU default
+        if args.workers is not None and args.workers > 1:
+            print('waitress runs a single process; ignoring --workers', file=sys.stderr)
+        args.workers = 1
+    elif args.workers is None:
+        args.workers = multiprocessing.cpu_count()
+    configure_environment(args)
+    if server == 'gunicorn':
+        run_gunicorn(args)
+    else:
+        run_waitress(args)
+
+
+if __name__ == '__main__':
+    main()
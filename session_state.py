@@ -0,0 +1,193 @@
+"""Compact per-session conversation state: IDs from fixed vocabularies in __slots__ objects."""
+from array import array
+from functools import lru_cache
+
+CONTINUE_SUFFIX = '_continue'
+# A follow-up appends CONTINUE_SUFFIX to the last intent. No rule tells a chain
+# of two from a longer one, so deeper chains are remembered as this deep
+MAX_CONTINUE_DEPTH = 8
+
+
+class Vocabulary:
+    """A fixed set of strings, numbered in order.
+
+    key() turns a word of the set into its small integer ID and returns any
+    other word unchanged, so words outside the set are only held by the
+    sessions that use them and go away with them; nothing is added after
+    construction. If given, `annotate` computes a per-word value (e.g. a
+    group bitmask): up front for the set, and through a bounded LRU cache
+    for other words.
+    """
+
+    def __init__(self, words, annotate=None, memo_size=4096):
+        self.words = list(dict.fromkeys(words))
+        self._ids = {word: word_id for word_id, word in enumerate(self.words)}
+        self.annotations = [annotate(word) for word in self.words] if annotate else [0] * len(self.words)
+        self._annotate = lru_cache(maxsize=memo_size)(annotate) if annotate else None
+
+    def __len__(self):
+        return len(self.words)
+
+    def key(self, word):
+        """The word's ID if it is in the set, else the word itself"""
+        word_id = self._ids.get(word)
+        return word if word_id is None else word_id
+
+    def word(self, key):
+        return self.words[key] if key.__class__ is int else key
+
+    def annotation(self, key):
+        if key.__class__ is int:
+            return self.annotations[key]
+        return self._annotate(key) if self._annotate else 0
+
+
+class KeywordRing:
+    """The newest `capacity` keyword keys, as vocabulary IDs in a fixed-size array('H').
+
+    A word outside the vocabulary is stored as OTHER, with its text in
+    `others`, oldest first; the ring never holds more than `capacity` of
+    them.
+    """
+    __slots__ = ('keys', 'others', 'start', 'size')
+
+    OTHER = 0xFFFF  # Vocabularies must have fewer IDs than this
+
+    def __init__(self, capacity):
+        self.keys = array('H', bytes(2 * capacity))
+        self.others = []
+        self.start = 0  # Index of the oldest key
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(self.last(self.size))
+
+    def extend(self, new_keys):
+        """Append keys: vocabulary IDs, or the words themselves for any other word"""
+        keys = self.keys
+        capacity = len(keys)
+        other = self.OTHER
+        for key in new_keys:
+            if key.__class__ is not int:
+                self.others.append(key)
+                key = other
+            if self.size < capacity:
+                keys[(self.start + self.size) % capacity] = key
+                self.size += 1
+            else:
+                if keys[self.start] == other:
+                    del self.others[0]
+                keys[self.start] = key
+                self.start = (self.start + 1) % capacity
+
+    def last(self, count):
+        """The newest `count` keys, oldest first: IDs, and words where the ring holds OTHER"""
+        count = min(count, self.size)
+        if not count:
+            return ()
+        capacity = len(self.keys)
+        begin = (self.start + self.size - count) % capacity
+        end = begin + count
+        if end <= capacity:
+            keys = self.keys[begin:end]
+        else:
+            keys = self.keys[begin:] + self.keys[:end - capacity]
+        others = keys.count(self.OTHER)
+        if not others:
+            return keys
+        # The newest `others` words belong to the OTHER slots in this window
+        words = iter(self.others[-others:])
+        return [next(words) if key == self.OTHER else key for key in keys]
+
+
+class SessionState:
+    """What the bot remembers between turns of one conversation"""
+    __slots__ = ('codec', 'intent', 'continues', 'last_query', 'keywords', 'keyword_links')
+
+    def __init__(self, codec, max_keywords):
+        self.codec = codec
+        self.intent = -1  # ID in codec.intents; -1 until a fashion turn is answered
+        self.continues = 0  # "_continue" suffixes on that intent
+        self.last_query = None
+        self.keywords = KeywordRing(max_keywords)
+        self.keyword_links = -1  # Group bitmask; -1 until a turn sets it
+
+    @property
+    def last_intent(self):
+        """The intent name ("wedding_continue"), or '' before the first one"""
+        if self.intent < 0:
+            return ''
+        name = self.codec.intents.words[self.intent]
+        return name + CONTINUE_SUFFIX * self.continues if self.continues else name
+
+    @last_intent.setter
+    def last_intent(self, name):
+        self.intent, self.continues = self.codec.intent_key(name)
+
+    def recent_keywords(self, count):
+        word = self.codec.keywords.word
+        return [word(key) for key in self.keywords.last(count)]
+
+    def to_dict(self):
+        return self.codec.to_dict(self)
+
+
+class StateCodec:
+    """Creates SessionStates and converts them to and from plain (JSON-able) dicts.
+
+    The dict form uses the field names of the original per-session context
+    dict: last_intent, last_query, keywords and keyword_links.
+    """
+
+    def __init__(self, keywords, intents, link_groups, max_keywords):
+        self.keywords = keywords
+        self.intents = intents
+        self.link_bits = {name: 1 << position for position, name in enumerate(link_groups)}
+        self.max_keywords = max_keywords
+
+    def new(self):
+        return SessionState(self, self.max_keywords)
+
+    def intent_key(self, name):
+        """(intent ID, "_continue" count) for an intent name; (-1, 0) for '' or an unknown intent"""
+        continues = 0
+        while name.endswith(CONTINUE_SUFFIX):
+            name = name[:-len(CONTINUE_SUFFIX)]
+            continues += 1
+        intent = self.intents.key(name)
+        if intent.__class__ is not int:
+            return -1, 0
+        return intent, min(continues, MAX_CONTINUE_DEPTH)
+
+    def link_names(self, mask):
+        return [name for name, bit in self.link_bits.items() if mask & bit]
+
+    def links_mask(self, names):
+        mask = 0
+        for name in names:
+            mask |= self.link_bits[name]
+        return mask
+
+    def to_dict(self, state):
+        data = {}
+        if state.last_intent:
+            data['last_intent'] = state.last_intent
+        if state.last_query is not None:
+            data['last_query'] = state.last_query
+        if state.last_intent:
+            data['keywords'] = state.recent_keywords(len(state.keywords))
+        if state.keyword_links >= 0:
+            data['keyword_links'] = self.link_names(state.keyword_links)
+        return data
+
+    def from_dict(self, data):
+        state = self.new()
+        state.last_intent = data.get('last_intent', '')
+        state.last_query = data.get('last_query')
+        state.keywords.extend(map(self.keywords.key, data.get('keywords', ())))
+        if 'keyword_links' in data:
+            state.keyword_links = self.links_mask(data['keyword_links'])
+        return state
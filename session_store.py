@@ -0,0 +1,356 @@
+"""Session backends: the interface, and the in-process LRU/TTL store."""
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import threading
+import time
+
+
+class ConversationHistory:
+    """Fixed-size message history plus a running count of topic hits.
+
+    Each message carries a topic bitmask (one bit per topic word it mentions).
+    topic_counts covers only the last `window` messages and is updated as
+    messages enter and leave that window, so "was any topic mentioned
+    recently?" never has to rescan the history.
+    """
+    __slots__ = ('messages', 'window', 'topic_counts', 'total')
+
+    def __init__(self, max_messages, window):
+        self.messages = deque(maxlen=max_messages)
+        self.window = deque(maxlen=window)  # Topic bitmask of each recent message
+        self.topic_counts = {}  # Topic bit -> messages in the window mentioning it
+        self.total = 0  # Messages ever appended (sequence number of the last one)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def append(self, message, topics=0):
+        self.total += 1
+        self.messages.append(message)
+        counts = self.topic_counts
+        if len(self.window) == self.window.maxlen:
+            expired = self.window[0]
+            while expired:
+                bit = expired & -expired
+                expired ^= bit
+                if counts[bit] == 1:
+                    del counts[bit]
+                else:
+                    counts[bit] -= 1
+        self.window.append(topics)
+        while topics:
+            bit = topics & -topics
+            topics ^= bit
+            counts[bit] = counts.get(bit, 0) + 1
+
+    def has_topic(self):
+        return bool(self.topic_counts)
+
+
+class Session:
+    """Everything the bot remembers about one conversation"""
+    __slots__ = ('session_id', 'history', 'context', 'shown_images', 'last_active', 'version')
+
+    def __init__(self, session_id, now, max_messages, window, context=None):
+        self.session_id = session_id
+        self.history = ConversationHistory(max_messages, window)
+        self.context = {} if context is None else context  # Stores last topic/intent/keywords
+        self.shown_images = bytearray()  # Bitset of image catalog ids already sent
+        self.last_active = now
+        self.version = 0  # Bumped on every save, used by shared backends to spot stale copies
+
+
+class TurnQueue:
+    """Admits the turns of one session one at a time, in the order they arrived.
+
+    Tickets are handed out under SessionTurns.lock. The condition is only
+    created once a second turn has to wait, so uncontended turns never block.
+    """
+    __slots__ = ('condition', 'next_ticket', 'serving')
+
+    def __init__(self):
+        self.condition = None
+        self.next_ticket = 0
+        self.serving = 0
+
+    def wait(self, ticket):
+        if ticket == self.serving:
+            return
+        with self.condition:
+            while self.serving != ticket:
+                self.condition.wait()
+
+    def advance(self):
+        if self.condition is None:
+            self.serving += 1
+            return
+        with self.condition:
+            self.serving += 1
+            self.condition.notify_all()
+
+
+class SessionTurns:
+    """Turn queues of the sessions that have turns in flight.
+
+    A queue exists only while its session has a turn running or waiting, so
+    idle sessions cost nothing. `lock` must be the lock that guards the
+    backend's session map, so "is this session in use?" and eviction are
+    decided atomically.
+    """
+
+    def __init__(self, lock):
+        self.lock = lock
+        self._queues = {}
+
+    def __contains__(self, session_id):
+        return session_id in self._queues
+
+    def enter(self, session_id):
+        with self.lock:
+            queue = self._queues.get(session_id)
+            if queue is None:
+                queue = self._queues[session_id] = TurnQueue()
+            elif queue.condition is None:
+                queue.condition = threading.Condition(threading.Lock())
+            ticket = queue.next_ticket
+            queue.next_ticket += 1
+        queue.wait(ticket)
+        return queue
+
+    def exit(self, session_id, queue):
+        with self.lock:
+            queue.advance()
+            if queue.serving == queue.next_ticket:
+                del self._queues[session_id]
+
+
+class SessionBackend:
+    """Where /chat keeps sessions.
+
+    touch() returns the live Session for an id (creating it if needed) and
+    marks it active; the pipeline mutates it in place and then calls save()
+    so backends shared between worker processes can persist the turn. Do all
+    three inside `with backend.turn(session_id):` so concurrent turns of one
+    session run one at a time and the session is not evicted or expired
+    while a turn is using it.
+    """
+
+    def turns_for(self, session_id):
+        raise NotImplementedError
+
+    @contextmanager
+    def turn(self, session_id):
+        """Wait for earlier turns of the session to finish, and hold it until this one has"""
+        turns = self.turns_for(session_id)
+        queue = turns.enter(session_id)
+        try:
+            yield
+        finally:
+            turns.exit(session_id, queue)
+
+    def touch(self, session_id):
+        raise NotImplementedError
+
+    def save(self, session):
+        """Persist the turn; False if another process saved the session first
+        (reload it with touch() and run the turn again)"""
+        raise NotImplementedError
+
+    def get(self, session_id):
+        raise NotImplementedError
+
+    def discard(self, session_id):
+        raise NotImplementedError
+
+    def sweep(self, limit=256):
+        raise NotImplementedError
+
+    def start_sweeper(self, interval=30, batch=256):
+        raise NotImplementedError
+
+    def stop_sweeper(self):
+        raise NotImplementedError
+
+    def close(self):
+        """Release background threads and flush anything not yet persisted"""
+        self.stop_sweeper()
+
+    def new_session(self, session_id, now):
+        context = self.context_codec.new() if self.context_codec is not None else None
+        return Session(session_id, now, self.max_messages, self.window, context)
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class SessionShard:
+    """One slice of a SessionStore, with its own lock, LRU order and counters"""
+    __slots__ = ('sessions', 'lock', 'turns', 'created', 'evictions', 'expirations')
+
+    def __init__(self):
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        self.turns = SessionTurns(self.lock)
+        self.created = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def pop_oldest_idle(self, keep):
+        """Drop the least recently used session with no turn in flight (never `keep`)"""
+        for session_id in self.sessions:
+            if session_id != keep and session_id not in self.turns:
+                del self.sessions[session_id]
+                return True
+        return False
+
+
+class SessionStore(SessionBackend):
+    """In-process sessions, split by id hash into independently locked shards.
+
+    Each shard keeps its sessions in least-recently-used order: touch() moves a
+    session to the most-recent end, so expiry only ever has to look at a
+    shard's front until it finds a live session. Turns of different sessions
+    only contend when their ids land in the same shard, and then only for the
+    dictionary update. When the store is over max_sessions, a new session
+    evicts the oldest idle session of its own shard.
+    """
+
+    def __init__(self, max_sessions, ttl, max_messages, window, clock=time.time, context_codec=None, shards=16):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.window = window
+        self.clock = clock
+        self.context_codec = context_codec  # Builds Session.context (a plain dict when None)
+        self._shards = [SessionShard() for _ in range(shards)]
+        self._size = 0
+        self._size_lock = threading.Lock()
+        self._sweeper = None
+        self._stop = threading.Event()
+
+    def _shard(self, session_id):
+        return self._shards[hash(session_id) % len(self._shards)]
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, session_id):
+        return session_id in self._shard(session_id).sessions
+
+    @property
+    def created(self):
+        return sum(shard.created for shard in self._shards)
+
+    @property
+    def evictions(self):
+        return sum(shard.evictions for shard in self._shards)
+
+    @property
+    def expirations(self):
+        return sum(shard.expirations for shard in self._shards)
+
+    def turns_for(self, session_id):
+        return self._shard(session_id).turns
+
+    def _resize(self, delta):
+        with self._size_lock:
+            self._size += delta
+            return self._size
+
+    def get(self, session_id):
+        """Look up a session without marking it active"""
+        return self._shard(session_id).sessions.get(session_id)
+
+    def touch(self, session_id):
+        """Return the session (creating it if needed) and mark it most recently used"""
+        now = self.clock()
+        shard = self._shard(session_id)
+        with shard.lock:
+            session = shard.sessions.get(session_id)
+            if session is None or now - session.last_active > self.ttl:
+                if session is not None:
+                    shard.expirations += 1
+                else:
+                    size = self._resize(1)
+                    if size > self.max_sessions and shard.pop_oldest_idle(session_id):
+                        self._resize(-1)
+                        shard.evictions += 1
+                session = self.new_session(session_id, now)
+                shard.sessions[session_id] = session
+                shard.created += 1
+            session.last_active = now
+            shard.sessions.move_to_end(session_id)
+            return session
+
+    def save(self, session):
+        """Sessions are mutated in place; nothing to persist"""
+        return True
+
+    def discard(self, session_id):
+        shard = self._shard(session_id)
+        with shard.lock:
+            if shard.sessions.pop(session_id, None) is not None:
+                self._resize(-1)
+
+    def sweep(self, limit=256):
+        """Expire up to `limit` idle sessions, from the old end of each shard; returns how many"""
+        expired = 0
+        cutoff = self.clock() - self.ttl
+        for shard in self._shards:
+            with shard.lock:
+                sessions = shard.sessions
+                skipped = 0
+                count = 0
+                while expired + count < limit and len(sessions) > skipped:
+                    session_id, session = next(iter(sessions.items()))
+                    if session.last_active >= cutoff:
+                        break
+                    if session_id in shard.turns:
+                        # A turn is using it right now, so it is not idle
+                        sessions.move_to_end(session_id)
+                        skipped += 1
+                        continue
+                    del sessions[session_id]
+                    count += 1
+                shard.expirations += count
+            if count:
+                self._resize(-count)
+            expired += count
+        return expired
+
+    def start_sweeper(self, interval=30, batch=256):
+        """Expire idle sessions from a daemon thread, off the request path"""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return self._sweeper
+
+        def run():
+            while not self._stop.wait(interval):
+                # Small batches so a large backlog never holds a shard lock for long
+                while self.sweep(batch) == batch:
+                    pass
+
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=run, name='session-sweeper', daemon=True)
+        self._sweeper.start()
+        return self._sweeper
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+    def stats(self):
+        messages = 0
+        for shard in self._shards:
+            with shard.lock:
+                messages += sum(len(session.history) for session in shard.sessions.values())
+        return {
+            'sessions': len(self),
+            'messages': messages,
+            'max_sessions': self.max_sessions,
+            'created': self.created,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'shards': len(self._shards),
+        }
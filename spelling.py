@@ -0,0 +1,201 @@
+"""Typo-tolerant keyword matching: a SymSpell-style deletion index over the keyword vocabularies.
+
+Every vocabulary word is indexed under each string obtained by deleting up
+to two of its characters. A misspelt token is corrected by generating its
+own deletes and checking only the few words that share one, so the cost of
+a lookup depends on the token's length, not on the size of the vocabulary.
+
+Real English words from a word list (see `WordList`) are never corrected:
+"weeding" is a gardening word, not a typo of "wedding".
+"""
+from functools import lru_cache
+import mmap
+import os
+import re
+
+TOKEN = re.compile('[a-zà-ÿಀ-೿\u200c\u200d]+')
+MIN_WORD_LENGTH = 4  # Shorter vocabulary words are too easy to hit by accident
+MAX_TOKEN_LENGTH = 24
+INDEX_DISTANCE = 2
+
+
+def max_distance(length):
+    """Edits allowed for a token of this length: none below 5 characters, 2 from 10.
+
+    Two edits on shorter words turn ordinary words into keywords
+    ("organize" -> "organza").
+    """
+    if length < 5:
+        return 0
+    return 1 if length < 10 else 2
+
+
+def deletes(word, distance):
+    """Every string made by deleting up to `distance` characters of `word`"""
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        found |= frontier
+    return found
+
+
+def edit_distance(first, second, limit):
+    """Optimal string alignment distance, or limit + 1 as soon as it must exceed `limit`"""
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous_row = None
+    row = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        current = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = first[i - 1] != second[j - 1]
+            current[j] = min(row[j] + 1, current[j - 1] + 1, row[j - 1] + cost)
+            if (previous_row is not None and j > 1 and first[i - 1] == second[j - 2]
+                    and first[i - 2] == second[j - 1]):
+                current[j] = min(current[j], previous_row[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous_row, row = row, current
+    return row[-1]
+
+
+class WordList:
+    """A sorted file of words, one per line, memory-mapped and binary-searched in place.
+
+    Lines starting with "#" at the top are a header and skipped. The pages
+    are shared by every worker process that maps the same file.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._start = 0
+        while self._mmap[self._start:self._start + 1] == b'#':
+            end = self._mmap.find(b'\n', self._start)
+            self._start = len(self._mmap) if end < 0 else end + 1
+
+    def __contains__(self, word):
+        key = word.encode('utf-8')
+        data = self._mmap
+        low, high = self._start, len(data)  # Both always at the start of a line
+        while low < high:
+            middle = (low + high) // 2
+            start = data.rfind(b'\n', low, middle) + 1 or low
+            end = data.find(b'\n', start, high)
+            if end < 0:
+                end = high
+            line = data[start:end].rstrip(b'\r')
+            if line == key:
+                return True
+            if line < key:
+                low = end + 1
+            else:
+                high = start
+        return False
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+
+
+class SpellingCorrector:
+    """Replaces misspelt vocabulary words in lowercased text.
+
+    Vocabulary words, `known` words (real words that only look like a typo,
+    such as "sleep" next to "sleek") and tokens for which `contains_word`
+    is true ("weddings") are left alone, and so is any token in
+    `dictionary` (a `WordList` or set of real words). `aliases` maps other spellings
+    ("kanjeevaram") to the vocabulary word they stand for; they are
+    corrected exactly and with typos like any other word.
+
+    A correction must be the only vocabulary word at the smallest distance
+    and start with the same letter as the token.
+    """
+
+    def __init__(self, words, known=(), aliases=None, contains_word=None, dictionary=None, max_lookups=32,
+                 memo_size=4096):
+        self._targets = {}  # Indexed spelling -> word it is corrected to
+        vocabulary = set()
+        for word in words:
+            for part in word.lower().split():
+                vocabulary.add(part)
+                if len(part) >= MIN_WORD_LENGTH and TOKEN.fullmatch(part):
+                    self._targets[part] = part
+        for alias, word in (aliases or {}).items():
+            self._targets[alias] = word
+        self._skip = frozenset(vocabulary | set(known)) - frozenset(aliases or ())
+        # Skipped words that are whole tokens, for the early exit in correct()
+        self._plain = frozenset(word for word in self._skip if TOKEN.fullmatch(word))
+        self._deletes = {}
+        for spelling in self._targets:
+            for variant in deletes(spelling, INDEX_DISTANCE):
+                self._deletes.setdefault(variant, []).append(spelling)
+        self._contains_word = contains_word
+        self._dictionary = dictionary
+        self.max_lookups = max_lookups  # Per message, so a wall of gibberish costs a bounded time
+        self.counts = {'corrected': 0, 'unknown': 0}
+        self.lookup = lru_cache(maxsize=memo_size)(self._lookup)
+
+    def __len__(self):
+        return len(self._targets)
+
+    def _lookup(self, token):
+        """The word `token` is a misspelling of, or None"""
+        target = self._targets.get(token)
+        if target is not None:
+            return target
+        limit = max_distance(len(token))
+        if not limit or len(token) > MAX_TOKEN_LENGTH:
+            return None
+        if self._contains_word is not None and self._contains_word(token):
+            return None
+        if self._dictionary is not None and token in self._dictionary:
+            return None
+        best = None
+        best_distance = limit + 1
+        tied = False
+        checked = set()
+        for variant in deletes(token, limit):
+            for spelling in self._deletes.get(variant, ()):
+                if spelling in checked or spelling[0] != token[0]:
+                    continue
+                checked.add(spelling)
+                # Words further away than the best so far cannot win
+                distance = edit_distance(token, spelling, best_distance if best is not None else limit)
+                target = self._targets[spelling]
+                if distance < best_distance:
+                    best, best_distance, tied = target, distance, False
+                elif distance == best_distance and target != best:
+                    tied = True
+        return None if tied else best
+
+    def correct(self, text):
+        """`text` with misspelt vocabulary words replaced (the same string if there were none)"""
+        if all(piece in self._plain for piece in text.split()):
+            return text  # Only known words, as most short messages are
+        pieces = None
+        last = 0
+        lookups = self.max_lookups
+        for match in TOKEN.finditer(text):
+            token = match.group()
+            if token in self._skip:
+                continue
+            if not lookups:
+                break
+            lookups -= 1
+            word = self.lookup(token)
+            if word is None:
+                self.counts['unknown'] += 1
+                continue
+            self.counts['corrected'] += 1
+            if pieces is None:
+                pieces = []
+            pieces.append(text[last:match.start()])
+            pieces.append(word)
+            last = match.end()
+        if pieces is None:
+            return text
+        pieces.append(text[last:])
+        return ''.join(pieces)
@@ -0,0 +1,392 @@
+"""SQLite (WAL) session backend shared by every worker process on a host."""
+from collections import OrderedDict
+import json
+import sqlite3
+import threading
+import time
+
+from session_store import Session, SessionBackend, SessionTurns
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        context TEXT NOT NULL,
+        shown_images TEXT NOT NULL,
+        last_active REAL NOT NULL,
+        version INTEGER NOT NULL,
+        total INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS messages (
+        session_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        message TEXT NOT NULL,
+        topics INTEGER NOT NULL,
+        PRIMARY KEY (session_id, seq)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions (last_active)",
+)
+
+# Statements are kept as constants so sqlite3's per-connection statement cache
+# reuses the prepared form
+SELECT_VERSION = "SELECT version, last_active FROM sessions WHERE session_id = ?"
+SELECT_SESSION = "SELECT context, shown_images, last_active, version, total FROM sessions WHERE session_id = ?"
+SELECT_RECENT = "SELECT message, topics FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?"
+# Compare-and-swap: an existing row is only replaced from the version the
+# save started from, so two processes saving the same session cannot both win
+UPSERT_SESSION = """INSERT INTO sessions (session_id, context, shown_images, last_active, version, total)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (session_id) DO UPDATE SET context = excluded.context,
+        shown_images = excluded.shown_images, last_active = excluded.last_active,
+        version = excluded.version, total = excluded.total
+    WHERE sessions.version = ?"""
+INSERT_MESSAGE = "INSERT OR REPLACE INTO messages (session_id, seq, message, topics) VALUES (?, ?, ?, ?)"
+TRIM_MESSAGES = "DELETE FROM messages WHERE session_id = ? AND seq <= ?"
+DELETE_SESSION = "DELETE FROM sessions WHERE session_id = ?"
+DELETE_MESSAGES = "DELETE FROM messages WHERE session_id = ?"
+SELECT_EXPIRED = "SELECT session_id FROM sessions WHERE last_active < ? ORDER BY last_active LIMIT ?"
+
+
+class SqliteSessionStore(SessionBackend):
+    """Sessions persisted in a WAL-mode SQLite file.
+
+    Each process keeps a small LRU of Session objects as a read-through cache;
+    a one-row version lookup on touch() detects turns written by another
+    process. Saves are compare-and-swap on that version: a save that finds
+    the row changed since the session was read is not written, and the
+    caller reloads the session and runs the turn again.
+
+    By default save() returns only once its turn is committed, so the next
+    turn finds it whichever worker serves it; saves of concurrent turns are
+    committed together in one transaction. With `write_through=False` saves
+    are instead written by a background thread every `flush_interval`
+    seconds and other processes can miss a turn made in that window, so
+    only use it when a single process uses the file.
+    """
+
+    def __init__(self, path, max_sessions, ttl, max_messages, window, write_through=True,
+                 flush_interval=0.02, batch_size=256, clock=time.time, context_codec=None):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.window = window
+        self.write_through = write_through
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.clock = clock
+        self.context_codec = context_codec  # Converts Session.context to/from its stored dict
+        self._cache = OrderedDict()
+        self._persisted = {}  # session_id -> history.total already in the database
+        self._lock = threading.RLock()
+        self._turns = SessionTurns(self._lock)
+        self._local = threading.local()
+        self._queue = []
+        self._pending = {}  # session_id -> version queued but not yet written
+        self._queued = threading.Condition(threading.Lock())
+        # One flush at a time: two could otherwise commit an older batch last
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()  # Stops the writer thread
+        self._stop_sweeper = threading.Event()
+        self._writer = None
+        self._sweeper = None
+        self.created = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.reloads = 0
+        self.flushes = 0
+        self.conflicts = 0
+        self._conflicted = set()  # (session_id, version) saves lost to another process, until save() sees them
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+        if not write_through and flush_interval:
+            self._writer = threading.Thread(target=self._write_loop, name='session-writer', daemon=True)
+            self._writer.start()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, cached_statements=64)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def turns_for(self, session_id):
+        # Orders turns within this process; other processes are reconciled by version
+        return self._turns
+
+    def __contains__(self, session_id):
+        with self._lock:
+            if session_id in self._cache:
+                return True
+        return self._connection().execute(SELECT_VERSION, (session_id,)).fetchone() is not None
+
+    def get(self, session_id):
+        """Look up a session without marking it active"""
+        with self._lock:
+            session = self._cache.get(session_id)
+        if session is not None and session_id in self._pending:
+            return session
+        row = self._connection().execute(SELECT_VERSION, (session_id,)).fetchone()
+        if row is None:
+            return None
+        if session is not None and session.version == row[0]:
+            return session
+        return self._load(session_id)
+
+    def _load(self, session_id):
+        conn = self._connection()
+        row = conn.execute(SELECT_SESSION, (session_id,)).fetchone()
+        if row is None:
+            return None
+        context, shown_images, last_active, version, total = row
+        context = json.loads(context)
+        if self.context_codec is not None:
+            context = self.context_codec.from_dict(context)
+        session = Session(session_id, last_active, self.max_messages, self.window, context)
+        try:
+            session.shown_images = bytearray.fromhex(shown_images)
+        except ValueError:
+            # Rows from older versions hold a list or a decimal int; those
+            # sessions just start over on which images they have seen
+            pass
+        session.version = version
+        # Only the context window is needed to continue the conversation
+        recent = conn.execute(SELECT_RECENT, (session_id, self.window)).fetchall()
+        history = session.history
+        for message, topics in reversed(recent):
+            history.append(message, topics)
+        history.total = total
+        with self._lock:
+            self._persisted[session_id] = total
+        self.reloads += 1
+        return session
+
+    def touch(self, session_id):
+        """Return the current session (re-reading it if another process changed it)"""
+        now = self.clock()
+        session = self.get(session_id)
+        if session is not None and now - session.last_active > self.ttl:
+            # Expired but not swept yet: drop the old rows before starting over
+            self.discard(session_id)
+            self.expirations += 1
+            session = None
+        with self._lock:
+            if session is None:
+                session = self.new_session(session_id, now)
+                # Versions must never repeat for an id, or another process could
+                # mistake this new session for its cached copy of an old one
+                session.version = time.time_ns() // 1000
+                self._persisted[session_id] = 0
+                self.created += 1
+            session.last_active = now
+            self._cache[session_id] = session
+            self._cache.move_to_end(session_id)
+            if len(self._cache) > self.max_sessions:
+                # Only the cached copy goes. Sessions with a turn in flight stay, and
+                # so do those whose last save is still queued: the database does
+                # not have it yet
+                for evicted in self._cache:
+                    if evicted != session_id and evicted not in self._turns and evicted not in self._pending:
+                        del self._cache[evicted]
+                        self._persisted.pop(evicted, None)
+                        self.evictions += 1
+                        break
+        return session
+
+    def save(self, session):
+        """Write the turn, or queue it for the writer thread.
+
+        False if another process saved the session since it was read: the
+        turn is not written and the next touch() reloads the session. A
+        queued save that loses is only counted in `conflicts`.
+        """
+        session_id = session.session_id
+        history = session.history
+        with self._lock:
+            session.version += 1
+            persisted = self._persisted.get(session_id, 0)
+            self._persisted[session_id] = history.total
+        rows = []
+        for offset in range(min(history.total - persisted, len(history.messages)), 0, -1):
+            topics = history.window[-offset] if offset <= len(history.window) else 0
+            rows.append((session_id, history.total - offset + 1, history.messages[-offset], topics))
+        context = session.context
+        if self.context_codec is not None:
+            context = self.context_codec.to_dict(context)
+        # The last value is the version this save replaces
+        record = (session_id, json.dumps(context, ensure_ascii=False),
+                  session.shown_images.hex(), session.last_active, session.version,
+                  history.total, session.version - 1)
+        if not self.write_through and not self.flush_interval:
+            return not self._lost(self._write([(record, rows)]))
+        with self._queued:
+            self._pending[session_id] = session.version
+            self._queue.append((record, rows))
+            if len(self._queue) >= self.batch_size:
+                self._queued.notify()
+        if not self.write_through:
+            return True
+        # Whichever flush takes this record from the queue holds the flush
+        # lock until it is committed, so this returns after the commit
+        self.flush()
+        with self._lock:
+            if (session_id, session.version) in self._conflicted:
+                self._conflicted.discard((session_id, session.version))
+                return False
+        return True
+
+    def _write(self, records):
+        """Write saves in one transaction; returns the records another process got to first"""
+        conn = self._connection()
+        conflicts = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for record, rows in records:
+                if not conn.execute(UPSERT_SESSION, record).rowcount:
+                    conflicts.append(record)
+                    continue
+                conn.executemany(INSERT_MESSAGE, rows)
+                if record[5] > self.max_messages:
+                    conn.execute(TRIM_MESSAGES, (record[0], record[5] - self.max_messages))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.flushes += 1
+        return conflicts
+
+    def _lost(self, conflicts):
+        """Forget the cached copies of sessions whose saves lost, so they are reloaded"""
+        with self._lock:
+            for session_id, _, _, _, version, _, _ in conflicts:
+                self.conflicts += 1
+                cached = self._cache.get(session_id)
+                if cached is not None and cached.version == version:
+                    del self._cache[session_id]
+                    self._persisted.pop(session_id, None)
+                if self.write_through:
+                    self._conflicted.add((session_id, version))
+        return conflicts
+
+    def flush(self):
+        """Write every queued save now"""
+        with self._flush_lock:
+            with self._queued:
+                records, self._queue = self._queue, []
+            if not records:
+                return 0
+            self._lost(self._write(records))
+            with self._queued:
+                for (session_id, _, _, _, version, _, _), _ in records:
+                    if self._pending.get(session_id) == version:
+                        del self._pending[session_id]
+            return len(records)
+
+    def _write_loop(self):
+        while not self._stop.is_set():
+            with self._queued:
+                if not self._queue:
+                    self._queued.wait(self.flush_interval)
+            self.flush()
+        self.flush()
+
+    def discard(self, session_id):
+        self.flush()
+        with self._lock:
+            self._cache.pop(session_id, None)
+            self._persisted.pop(session_id, None)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(DELETE_SESSION, (session_id,))
+            conn.execute(DELETE_MESSAGES, (session_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def sweep(self, limit=256):
+        """Delete up to `limit` expired sessions; returns how many"""
+        conn = self._connection()
+        cutoff = self.clock() - self.ttl
+        expired = [row[0] for row in conn.execute(SELECT_EXPIRED, (cutoff, limit))]
+        if not expired:
+            return 0
+        # Held while deleting so no turn can start on a session being removed
+        with self._lock:
+            # The database lags this process by the queued writes: a session
+            # with a turn in flight, a pending save or a recent cached copy is
+            # not idle
+            idle = []
+            for session_id in expired:
+                cached = self._cache.get(session_id)
+                if session_id in self._turns or session_id in self._pending:
+                    continue
+                if cached is not None and cached.last_active >= cutoff:
+                    continue
+                idle.append(session_id)
+            if idle:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(DELETE_SESSION, [(session_id,) for session_id in idle])
+                    conn.executemany(DELETE_MESSAGES, [(session_id,) for session_id in idle])
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            for session_id in idle:
+                self._cache.pop(session_id, None)
+                self._persisted.pop(session_id, None)
+        self.expirations += len(idle)
+        return len(idle)
+
+    def start_sweeper(self, interval=30, batch=256):
+        """Expire idle sessions from a daemon thread, off the request path"""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return self._sweeper
+
+        def run():
+            while not self._stop_sweeper.wait(interval):
+                while self.sweep(batch) == batch:
+                    pass
+
+        self._stop_sweeper.clear()
+        self._sweeper = threading.Thread(target=run, name='session-sweeper', daemon=True)
+        self._sweeper.start()
+        return self._sweeper
+
+    def stop_sweeper(self):
+        self._stop_sweeper.set()
+
+    def close(self):
+        """Stop background threads and write anything still queued"""
+        self._stop_sweeper.set()
+        self._stop.set()
+        with self._queued:
+            self._queued.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush()
+
+    def stats(self):
+        return {
+            'sessions': len(self),
+            'messages': self._connection().execute("SELECT COUNT(*) FROM messages").fetchone()[0],
+            'cached_sessions': len(self._cache),
+            'max_sessions': self.max_sessions,
+            'created': self.created,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'reloads': self.reloads,
+            'flushes': self.flushes,
+            'conflicts': self.conflicts,
+            'queued_writes': len(self._queue),
+        }
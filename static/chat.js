@@ -0,0 +1,299 @@
+const chatMessages = document.getElementById('chatMessages');
+const userInput = document.getElementById('userInput');
+const sendBtn = document.getElementById('sendBtn');
+const voiceBtn = document.getElementById('voiceBtn');
+const typingIndicator = document.getElementById('typingIndicator');
+
+// Generate unique session ID
+const sessionId = 'session_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9);
+
+// Voice recognition setup
+let recognition = null;
+let isRecording = false;
+
+if ('webkitSpeechRecognition' in window || 'SpeechRecognition' in window) {
+    const SpeechRecognition = window.SpeechRecognition || window.webkitSpeechRecognition;
+    recognition = new SpeechRecognition();
+    recognition.continuous = false;
+    recognition.interimResults = false;
+    recognition.lang = 'en-US';
+
+    recognition.onresult = (event) => {
+        const transcript = event.results[0][0].transcript;
+        userInput.value = transcript;
+        isRecording = false;
+        voiceBtn.classList.remove('recording');
+        voiceBtn.textContent = '🎤';
+    };
+
+    recognition.onerror = (event) => {
+        console.error('Speech recognition error:', event.error);
+        isRecording = false;
+        voiceBtn.classList.remove('recording');
+        voiceBtn.textContent = '🎤';
+        if (event.error === 'no-speech') {
+            addMessage('No speech detected. Please try again.', false);
+        }
+    };
+
+    recognition.onend = () => {
+        isRecording = false;
+        voiceBtn.classList.remove('recording');
+        voiceBtn.textContent = '🎤';
+    };
+}
+
+voiceBtn.addEventListener('click', () => {
+    if (!recognition) {
+        addMessage('Voice input is not supported in your browser. Please use Chrome, Edge, or Safari.', false);
+        return;
+    }
+
+    if (isRecording) {
+        recognition.stop();
+        isRecording = false;
+        voiceBtn.classList.remove('recording');
+        voiceBtn.textContent = '🎤';
+    } else {
+        try {
+            recognition.start();
+            isRecording = true;
+            voiceBtn.classList.add('recording');
+            voiceBtn.textContent = '🔴';
+        } catch (error) {
+            console.error('Error starting recognition:', error);
+        }
+    }
+});
+
+function formatBotText(content) {
+    // Format bot messages with better structure
+    return content
+        .replace(/\n\n/g, '<br><br>')  // Double line breaks
+        .replace(/\n/g, '<br>')  // Single line breaks
+        .replace(/•/g, '<br>•')  // Bullet points
+        .replace(/\*\*(.+?)\*\*/g, '<strong>$1</strong>')  // Bold text
+        .replace(/🎨|💄|👗|✨|💃|🌍|📱|🚀/g, '<span style="font-size: 1.2em;">$&</span>');  // Larger emojis
+}
+
+function appendImages(contentDiv, images) {
+    // Add images if provided
+    if (images && images.length > 0) {
+        const imageContainer = document.createElement('div');
+        imageContainer.className = images.length > 2 ? 'image-grid' : '';
+
+        images.forEach(image => {
+            // Catalog images come as {src, srcset}; plain URLs are still accepted
+            const img = document.createElement('img');
+            if (typeof image === 'string') {
+                img.src = image;
+            } else {
+                img.src = image.src;
+                if (image.srcset) {
+                    img.srcset = image.srcset;
+                    img.sizes = images.length > 2 ? '(max-width: 600px) 33vw, 200px' : '(max-width: 600px) 50vw, 320px';
+                }
+            }
+            img.alt = 'Fashion inspiration';
+            img.loading = 'lazy';
+            imageContainer.appendChild(img);
+        });
+
+        contentDiv.appendChild(imageContainer);
+    }
+}
+
+function addMessage(content, isUser, images = []) {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message ${isUser ? 'user' : 'bot'}`;
+
+    const contentDiv = document.createElement('div');
+    contentDiv.className = 'message-content';
+
+    if (!isUser) {
+        contentDiv.innerHTML = formatBotText(content);
+        appendImages(contentDiv, images);
+    } else {
+        contentDiv.textContent = content;
+    }
+
+    messageDiv.appendChild(contentDiv);
+    chatMessages.insertBefore(messageDiv, typingIndicator);
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+function addStreamingMessage() {
+    // Bot message filled in chunk by chunk. Chunks end on line boundaries, so
+    // formatting each one on its own gives the same HTML as formatting the
+    // whole text; new markup is appended rather than re-rendering the message.
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'message bot';
+    const contentDiv = document.createElement('div');
+    contentDiv.className = 'message-content';
+    messageDiv.appendChild(contentDiv);
+    chatMessages.insertBefore(messageDiv, typingIndicator);
+
+    let scrollPending = false;
+    function scrollToBottom() {
+        if (scrollPending) return;
+        scrollPending = true;
+        requestAnimationFrame(() => {
+            scrollPending = false;
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+        });
+    }
+
+    return {
+        append(chunk) {
+            contentDiv.insertAdjacentHTML('beforeend', formatBotText(chunk));
+            scrollToBottom();
+        },
+        finish(images) {
+            appendImages(contentDiv, images);
+            scrollToBottom();
+        }
+    };
+}
+
+async function readEventStream(response) {
+    // fetch() + SSE framing: EventSource cannot POST a body
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let message = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            const payload = JSON.parse(data);
+
+            if (!message) {
+                hideTyping();
+                message = addStreamingMessage();
+            }
+            if (event === 'done') {
+                message.finish(payload.images || []);
+            } else {
+                message.append(payload.delta);
+            }
+        }
+    }
+    hideTyping();
+}
+
+function showTyping() {
+    typingIndicator.style.display = 'block';
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+function hideTyping() {
+    typingIndicator.style.display = 'none';
+}
+
+const streamingSupported = !!(window.ReadableStream && window.TextDecoder);
+
+async function sendMessage() {
+    const message = userInput.value.trim();
+    if (!message) return;
+
+    addMessage(message, true);
+    userInput.value = '';
+    showTyping();
+
+    try {
+        const response = await fetch('/chat', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ 
+                message: message,
+                session_id: sessionId,
+                stream: streamingSupported
+            })
+        });
+
+        if ((response.headers.get('Content-Type') || '').startsWith('text/event-stream')) {
+            await readEventStream(response);
+            return;
+        }
+
+        const data = await response.json();
+        hideTyping();
+        addMessage(data.response, false, data.images || []);
+    } catch (error) {
+        hideTyping();
+        addMessage('Sorry, something went wrong. Please try again.', false);
+    }
+}
+
+sendBtn.addEventListener('click', sendMessage);
+userInput.addEventListener('keypress', (e) => {
+    if (e.key === 'Enter') sendMessage();
+});
+
+function enterChat() {
+    const welcomeScreen = document.getElementById('welcomeScreen');
+    welcomeScreen.classList.add('fade-out');
+    setTimeout(() => {
+        welcomeScreen.style.display = 'none';
+    }, 800);
+}
+
+let selectedLanguage = 'en';
+
+function toggleLanguages() {
+    const dropdown = document.getElementById('langDropdown');
+    dropdown.classList.toggle('show');
+}
+
+function selectLanguage(code, flag, name) {
+    selectedLanguage = code;
+    document.getElementById('currentFlag').textContent = flag;
+    document.getElementById('currentLang').textContent = name;
+
+    // Update active state
+    document.querySelectorAll('.lang-option').forEach(opt => {
+        opt.classList.remove('active');
+    });
+    event.target.closest('.lang-option').classList.add('active');
+
+    // Update voice recognition language
+    if (recognition) {
+        const langMap = {
+            'en': 'en-US', 'kn': 'kn-IN'
+        };
+        recognition.lang = langMap[code] || 'en-US';
+    }
+
+    toggleLanguages();
+
+    // Update placeholder
+    const placeholders = {
+        'en': 'Ask about fashion, makeup, or beauty...',
+        'kn': 'ಫ್ಯಾಷನ್, ಮೇಕಪ್ ಅಥವಾ ಸೌಂದರ್ಯದ ಬಗ್ಗೆ ಕೇಳಿ...'
+    };
+    userInput.placeholder = placeholders[code] || placeholders['en'];
+}
+
+// Close dropdown when clicking outside
+document.addEventListener('click', (e) => {
+    const langSelector = document.querySelector('.language-selector');
+    const dropdown = document.getElementById('langDropdown');
+    if (!langSelector.contains(e.target)) {
+        dropdown.classList.remove('show');
+    }
+});
@@ -0,0 +1,120 @@
+"""Pre-rendered pages and static files held in memory with precompressed variants and strong ETags."""
+from functools import lru_cache
+import gzip
+import hashlib
+import os
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip and identity are offered
+    brotli = None
+
+# Hashed asset URLs never change content, so browsers may keep them for a year
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Pages keep their URL across deploys: always revalidate (cheap 304 via ETag)
+REVALIDATE = 'no-cache'
+
+CONTENT_TYPES = {
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+    '.html': 'text/html; charset=utf-8',
+}
+
+
+def _compress(body):
+    variants = {'identity': body}
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(compressed) < len(body):
+        variants['gzip'] = compressed
+    if brotli is not None:
+        compressed = brotli.compress(body, quality=11)
+        if len(compressed) < len(body):
+            variants['br'] = compressed
+    return variants
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match uses weak comparison, so W/"x" matches "x" """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+class StaticAsset:
+    """One response body, compressed once, with a strong ETag per encoding"""
+
+    def __init__(self, body, content_type, cache_control):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.variants = _compress(body)
+        self.etags = {coding: '"%s%s"' % (self.digest, '' if coding == 'identity' else '-' + coding)
+                      for coding in self.variants}
+        # Browsers send a handful of distinct Accept-Encoding values
+        self.choose = lru_cache(maxsize=64)(self._choose)
+
+    def _choose(self, accept_encoding):
+        """The smallest variant the client accepts (identity unless it is refused)"""
+        accepted = accepted_encodings(accept_encoding)
+        wildcard = accepted.get('*', 0.0)
+        best = 'identity'
+        for coding in ('br', 'gzip'):
+            if coding in self.variants and accepted.get(coding, wildcard) > 0 \
+                    and len(self.variants[coding]) < len(self.variants[best]):
+                best = coding
+        return best
+
+    def response(self, request):
+        coding = self.choose(request.headers.get('Accept-Encoding'))
+        etag = self.etags[coding]
+        headers = {
+            'ETag': etag,
+            'Cache-Control': self.cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=304, headers=headers)
+        if coding != 'identity':
+            headers['Content-Encoding'] = coding
+        return Response(self.variants[coding], headers=headers, content_type=self.content_type)
+
+
+def load_static(directory):
+    """{hashed name: StaticAsset} for every file in `directory`, plus {name: hashed name}"""
+    assets = {}
+    urls = {}
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        root, ext = os.path.splitext(name)
+        if not os.path.isfile(path) or ext not in CONTENT_TYPES:
+            continue
+        with open(path, 'rb') as f:
+            asset = StaticAsset(f.read(), CONTENT_TYPES[ext], IMMUTABLE)
+        hashed = '%s.%s%s' % (root, asset.digest[:10], ext)
+        assets[hashed] = asset
+        urls[name] = hashed
+    return assets, urls